@@ -4,24 +4,39 @@ Enhanced version with better state management and routing
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence, List
+from typing import TypedDict, Annotated, List
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
 from langchain.tools import tool
+from agent_factory import get_agent_runnable
+from context_window import fit_context
+from message_state import append_messages, last_reply, turn_input
+from rolling_summary import RollingSummarizer
+from summary_queue import create_summary_queue
+from ticket_store import create_ticket
+from tool_executor import execute_tool_calls
+from tool_registry import ToolRegistry
+from knowledge_base import get_knowledge_base_index
+from customer_store import get_customer_repository
+from order_store import get_order_backend
+from support_data import get_support_data
 import json
+import uuid
 
 # Load environment variables
 load_dotenv()
 
 # Define the state schema
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], "The messages in the conversation"]
+    messages: Annotated[List[BaseMessage], append_messages]
+    last_ai_message: AIMessage
     next: str
     customer_info: dict
     conversation_summary: str
+    summarized_count: int
+    session_id: str
 
 # Initialize the LLM with correct configuration
 llm = ChatOpenAI(
@@ -35,101 +50,49 @@ llm = ChatOpenAI(
 @tool
 def search_knowledge_base(query: str) -> str:
     """Search the knowledge base for relevant information about products and services."""
-    knowledge_base = {
-        "return policy": "Our return policy allows returns within 30 days of purchase with original receipt. Items must be in original condition.",
-        "shipping": "Standard shipping takes 3-5 business days. Express shipping (1-2 days) is available for $15.99. Free shipping on orders over $50.",
-        "warranty": "All products come with a 1-year manufacturer warranty. Extended warranties are available for purchase.",
-        "payment": "We accept all major credit cards, PayPal, Apple Pay, and Google Pay. Payment plans available for orders over $200.",
-        "account": "You can create an account on our website to track orders, save payment information, and access exclusive deals.",
-        "refund": "Refunds are processed within 5-7 business days after we receive your return. You'll receive an email confirmation.",
-        "tracking": "You can track your order using the tracking number provided in your confirmation email or in your account dashboard.",
-        "contact": "You can reach our customer service team at support@company.com or call 1-800-123-4567. Live chat available 24/7.",
-        "hours": "Our customer service is available Monday-Friday 8AM-8PM EST, Saturday 9AM-6PM EST, and Sunday 10AM-6PM EST.",
-        "cancellation": "You can cancel your order within 1 hour of placing it. After that, contact customer service immediately."
-    }
-    
-    query_lower = query.lower()
-    for key, value in knowledge_base.items():
-        if key in query_lower:
-            return value
+    # Shared index built once per process from the preloaded knowledge base
+    results = get_knowledge_base_index().search(query, top_k=1)
+    if results:
+        return results[0].article
     
     return "I couldn't find specific information about that topic. Please contact our support team for assistance."
 
 @tool
 def create_support_ticket(issue: str, customer_email: str, priority: str = "medium") -> str:
     """Create a support ticket for complex issues that require human intervention."""
-    ticket_id = f"TICKET-{len(issue) + len(customer_email)}"
-    priority_levels = {"low": "24-48 hours", "medium": "12-24 hours", "high": "4-8 hours", "urgent": "1-2 hours"}
-    response_time = priority_levels.get(priority.lower(), "12-24 hours")
+    # Unique, time-ordered ID; the ticket is persisted in the background
+    ticket_id = create_ticket(issue, customer_email, priority)
+    response_time = get_support_data().priority_levels.get(priority.lower(), "12-24 hours")
     
     return f"Support ticket {ticket_id} has been created with {priority} priority. A representative will contact you at {customer_email} within {response_time}."
 
 @tool
 def check_order_status(order_number: str) -> str:
     """Check the status of an order using the order number."""
+    # Simulated order status check
     if not order_number or len(order_number) < 6:
         return "Invalid order number. Please provide a valid order number (minimum 6 characters)."
     
-    # Simulated order statuses
-    order_statuses = {
-        "processing": "Your order is being processed and will ship within 2-3 business days.",
-        "shipped": "Your order has been shipped! You should receive a tracking number shortly.",
-        "delivered": "Your order has been delivered. Please check your doorstep or mailbox.",
-        "returned": "Your order has been returned and a refund is being processed."
-    }
-    
-    # Simple hash to determine status
-    status_key = list(order_statuses.keys())[hash(order_number) % len(order_statuses)]
-    return f"Order {order_number}: {order_statuses[status_key]}"
+    # Look up the order backend (deterministic across processes; statuses are preloaded once)
+    status_key = get_order_backend().get_status(order_number)
+    if status_key is None:
+        return f"Order {order_number} was not found. Please verify the order number."
+    status_message = get_support_data().order_statuses.get(status_key, f"Current status: {status_key}.")
+    return f"Order {order_number}: {status_message}"
 
 @tool
 def get_customer_info(customer_email: str) -> str:
     """Retrieve customer information and order history."""
-    # Simulated customer data
-    customer_data = {
-        "john@example.com": {
-            "name": "John Smith",
-            "orders": 5,
-            "total_spent": "$450.00",
-            "last_order": "2024-01-15"
-        },
-        "jane@example.com": {
-            "name": "Jane Doe", 
-            "orders": 12,
-            "total_spent": "$1,200.00",
-            "last_order": "2024-01-20"
-        }
-    }
+    # Customer repository lookup by normalized email
+    customer = get_customer_repository().get(customer_email)
     
-    if customer_email in customer_data:
-        data = customer_data[customer_email]
-        return f"Customer: {data['name']}, Orders: {data['orders']}, Total Spent: {data['total_spent']}, Last Order: {data['last_order']}"
+    if customer is not None:
+        return f"Customer: {customer.name}, Orders: {customer.orders}, Total Spent: {customer.total_spent}, Last Order: {customer.last_order}"
     else:
         return f"No customer record found for {customer_email}. Please verify the email address."
 
-# Create list of tools
-tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
-
-# Define the agent nodes
-def should_continue(state: AgentState) -> str:
-    """Determine if the conversation should continue or end."""
-    messages = state["messages"]
-    last_message = messages[-1]
-    
-    if isinstance(last_message, HumanMessage):
-        content = last_message.content.lower()
-        if any(phrase in content for phrase in ["goodbye", "bye", "end", "stop", "thank you", "thanks", "that's all"]):
-            return "end"
-    
-    return "continue"
-
-def call_model(state: AgentState) -> AgentState:
-    """Call the LLM to generate a response."""
-    messages = state["messages"]
-    
-    # Create the prompt template
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a helpful and professional customer support agent for an e-commerce company. 
+# System prompt for the agent (built once per process)
+AGENT_SYSTEM_PROMPT = """You are a helpful and professional customer support agent for an e-commerce company. 
         
         Your capabilities:
         - Answer questions about products, services, policies, and procedures
@@ -150,24 +113,54 @@ def call_model(state: AgentState) -> AgentState:
         - create_support_ticket: For complex issues requiring human help
         - get_customer_info: To retrieve customer data with email
         
-        Use tools when appropriate to provide accurate information."""),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+        Use tools when appropriate to provide accurate information."""
+
+# System prompt for conversation summaries
+SUMMARY_SYSTEM_PROMPT = "Summarize this customer support conversation in 2-3 sentences, highlighting the main issue and resolution."
+
+# System prompt for incremental summary updates ({summary} is the previous summary)
+SUMMARY_UPDATE_PROMPT = """Update the running summary of this customer support conversation with the new messages.
+Keep it to 2-3 sentences, highlighting the main issue, key details (order numbers, emails, tickets) and resolution.
+
+Current summary: {summary}"""
+
+# Create list of tools
+tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
+
+# Register tools for O(1) dispatch by name
+tool_registry = ToolRegistry(tools)
+
+# Rolling summary, updated incrementally from the new messages only
+summarizer = RollingSummarizer(llm, SUMMARY_SYSTEM_PROMPT, SUMMARY_UPDATE_PROMPT)
+
+# Define the agent nodes
+def should_continue(state: AgentState) -> str:
+    """Determine if the conversation should continue or end."""
+    messages = state["messages"]
+    last_message = messages[-1]
+    
+    if isinstance(last_message, HumanMessage):
+        content = last_message.content.lower()
+        if any(phrase in content for phrase in ["goodbye", "bye", "end", "stop", "thank you", "thanks", "that's all"]):
+            return "end"
+    
+    return "continue"
+
+def call_model(state: AgentState) -> AgentState:
+    """Call the LLM to generate a response."""
+    messages = state["messages"]
     
-    # Create the agent
-    agent = prompt | llm.bind_tools(tools)
+    # Get the agent with tools (prompt and bind_tools cached per process)
+    agent = get_agent_runnable(llm, tools, AGENT_SYSTEM_PROMPT)
     
     # Get the response
     response = agent.invoke({
-        "messages": messages,
+        "messages": fit_context(messages),
         "agent_scratchpad": []
     })
     
-    # Add the response to the messages
-    new_messages = list(messages) + [response]
-    
-    return {"messages": new_messages}
+    # Only the response is returned; the reducer appends it to the history
+    return {"messages": [response], "last_ai_message": response}
 
 def call_tool(state: AgentState) -> AgentState:
     """Call a tool and add the result to the messages."""
@@ -177,53 +170,21 @@ def call_tool(state: AgentState) -> AgentState:
     # Extract tool calls from the last message
     tool_calls = last_message.tool_calls
     
-    # Execute each tool call
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        
-        # Find and execute the tool
-        tool_func = None
-        for tool in tools:
-            if tool.name == tool_name:
-                tool_func = tool
-                break
-        
-        if tool_func:
-            try:
-                result = tool_func.invoke(tool_args)
-                # Add tool result to messages
-                messages.append(ToolMessage(
-                    content=str(result),
-                    tool_call_id=tool_call["id"]
-                ))
-            except Exception as e:
-                messages.append(ToolMessage(
-                    content=f"Error executing {tool_name}: {str(e)}",
-                    tool_call_id=tool_call["id"]
-                ))
-        else:
-            messages.append(ToolMessage(
-                content=f"Tool {tool_name} not found",
-                tool_call_id=tool_call["id"]
-            ))
-    
-    return {"messages": messages}
+    # Execute the tool calls concurrently, keeping their order
+    return {"messages": execute_tool_calls(tool_calls, tool_registry)}
 
 def generate_summary(state: AgentState) -> AgentState:
     """Generate a summary of the conversation when ending."""
-    messages = state["messages"]
-    
-    # Create a summary prompt
-    summary_prompt = ChatPromptTemplate.from_messages([
-        ("system", "Summarize this customer support conversation in 2-3 sentences, highlighting the main issue and resolution."),
-        MessagesPlaceholder(variable_name="messages")
-    ])
-    
-    summary_chain = summary_prompt | llm
-    summary = summary_chain.invoke({"messages": messages})
-    
-    return {"conversation_summary": summary.content}
+    # Only the messages added since the last update are sent to the LLM
+    return summarizer.summarize(state)
+
+# Background summary queue: ending the conversation does not wait for the LLM
+summary_queue = create_summary_queue(generate_summary)
+
+def queue_summary(state: AgentState) -> AgentState:
+    """Queue the conversation summary; it is computed and stored in the background."""
+    summary_queue.submit(state["session_id"], state)
+    return {}
 
 # Create the workflow
 workflow = StateGraph(AgentState)
@@ -231,7 +192,7 @@ workflow = StateGraph(AgentState)
 # Add nodes
 workflow.add_node("agent", call_model)
 workflow.add_node("tools", call_tool)
-workflow.add_node("summary", generate_summary)
+workflow.add_node("summary", queue_summary)
 
 # Add edges
 workflow.add_edge("agent", should_continue)
@@ -270,7 +231,9 @@ def run_chatbot():
     state = {
         "messages": [],
         "customer_info": {},
-        "conversation_summary": ""
+        "conversation_summary": "",
+        "summarized_count": 0,
+        "session_id": uuid.uuid4().hex
     }
     
     while True:
@@ -281,18 +244,16 @@ def run_chatbot():
             print("🤖 Thank you for using our customer support! Goodbye!")
             break
         
-        # Add user message to state
-        state["messages"].append(HumanMessage(content=user_input))
+        # Add user message to the turn input
+        turn = turn_input(app, state, [HumanMessage(content=user_input)])
         
         try:
             # Run the workflow
-            result = app.invoke(state)
+            result = app.invoke(turn)
             
-            # Get the last AI message
-            ai_messages = [msg for msg in result["messages"] if isinstance(msg, AIMessage)]
-            if ai_messages:
-                last_ai_message = ai_messages[-1]
-                print(f"🤖 Assistant: {last_ai_message.content}")
+            # The last reply is kept in the state, no need to scan the history
+            if result.get("last_ai_message") is not None:
+                print(f"🤖 Assistant: {last_reply(result)}")
             
             # Update state for next iteration
             state = result
@@ -0,0 +1,161 @@
+"""
+Fábrica de runnables del agente
+Construye el prompt y el LLM con herramientas una sola vez por proceso
+"""
+
+import json
+import threading
+from typing import Any, Dict, Hashable, Sequence, Tuple, Union
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from config import CACHE_CONFIG
+from response_cache import (CachedRunnable, ResponseCache, get_response_cache, get_semantic_cache, hash_text,
+                            semantic_cache_enabled)
+
+# Variables que todos los prompts del agente esperan recibir en invoke()
+AGENT_INPUT_VARIABLES = {"messages", "agent_scratchpad"}
+
+# Caché de runnables por proceso: clave -> prompt | llm.bind_tools(tools)
+_agent_cache: Dict[Tuple[Hashable, ...], Any] = {}
+_summary_cache: Dict[Tuple[Hashable, ...], Any] = {}
+# Runnables envueltos con la caché de respuestas: (clave, id de la caché) -> CachedRunnable
+_cached_agent_cache: Dict[Tuple[Hashable, ...], CachedRunnable] = {}
+# Hash de esquemas por conjunto de herramientas (ids -> (herramientas, hash)); se guardan
+# las herramientas para que sus ids no se reutilicen mientras la entrada exista
+_schema_hash_cache: Dict[Tuple[int, ...], Tuple[Tuple[Any, ...], str]] = {}
+_cache_lock = threading.Lock()
+
+
+def _llm_key(llm) -> Tuple[Hashable, ...]:
+    """Obtiene la parte de la clave que identifica la configuración del LLM."""
+    return (
+        type(llm).__name__,
+        getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        getattr(llm, "temperature", None),
+        getattr(llm, "max_tokens", None),
+    )
+
+
+def _tools_key(tools: Sequence[Any]) -> Tuple[Hashable, ...]:
+    """Obtiene la parte de la clave que identifica el conjunto de herramientas (nombres y esquemas)."""
+    names = tuple(tool.name for tool in tools)
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate tool names in agent tool set: {names}")
+    return names + (_cached_schema_hash(tools),)
+
+
+def _cached_schema_hash(tools: Sequence[Any]) -> str:
+    """tools_schema_hash calculado una vez por conjunto de herramientas."""
+    ids = tuple(id(tool) for tool in tools)
+    entry = _schema_hash_cache.get(ids)
+    if entry is None:
+        entry = (tuple(tools), tools_schema_hash(tools))
+        with _cache_lock:
+            _schema_hash_cache[ids] = entry
+    return entry[1]
+
+
+def tools_schema_hash(tools: Sequence[Any]) -> str:
+    """Hash de los esquemas JSON de las herramientas tal como se envían al modelo."""
+    schemas = [convert_to_openai_tool(tool) for tool in tools]
+    return hash_text(json.dumps(schemas, sort_keys=True, ensure_ascii=False))
+
+
+def response_cache_namespace(llm, tools: Sequence[Any], system_prompt: str) -> str:
+    """Espacio de claves de la caché: modelo, hash del prompt y hash de las herramientas."""
+    model = ":".join(str(part) for part in _llm_key(llm))
+    return f"{model}|{hash_text(system_prompt)}|{_cached_schema_hash(tools)}"
+
+
+def build_agent_prompt(system_prompt: str) -> ChatPromptTemplate:
+    """Construir el prompt del agente y verificar sus variables de entrada."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        MessagesPlaceholder(variable_name="messages"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+    # Un prompt con llaves sin escapar añadiría variables que nadie rellena
+    unexpected = set(prompt.input_variables) - AGENT_INPUT_VARIABLES
+    if unexpected:
+        raise ValueError(f"System prompt declares unexpected variables: {sorted(unexpected)}")
+
+    return prompt
+
+
+def get_agent_runnable(llm, tools: Sequence[Any], system_prompt: str,
+                       cache: Union[ResponseCache, bool, None] = None):
+    """
+    Obtener el runnable `prompt | llm.bind_tools(tools)` para esta configuración.
+
+    Se construye en la primera llamada y se reutiliza en todos los turnos
+    siguientes, de modo que los esquemas JSON de las herramientas solo se
+    serializan una vez por proceso. La clave incluye la instancia del LLM y
+    el hash de los esquemas: dos variantes con herramientas del mismo nombre
+    pero distinto esquema, o con su propio LLM, no comparten el runnable.
+
+    Si se pasa `cache` (o CACHE_CONFIG["enabled"] está activo y no se pasa
+    ninguna), el runnable devuelto consulta la caché de respuestas antes de
+    llamar al LLM. `cache=False` devuelve siempre el runnable sin caché.
+    """
+    key = _llm_key(llm) + (id(llm), _tools_key(tools), system_prompt)
+    if cache is None:
+        cache = get_response_cache() if CACHE_CONFIG["enabled"] else False
+    if cache is False:
+        return _get_uncached_agent_runnable(key, llm, tools, system_prompt)
+
+    cached_key = key + (id(cache),)
+    cached = _cached_agent_cache.get(cached_key)
+    if cached is None:
+        agent = _get_uncached_agent_runnable(key, llm, tools, system_prompt)
+        with _cache_lock:
+            cached = _cached_agent_cache.get(cached_key)
+            if cached is None:
+                semantic_cache = get_semantic_cache() if semantic_cache_enabled() else None
+                cached = CachedRunnable(agent, cache, response_cache_namespace(llm, tools, system_prompt),
+                                        semantic_cache, CACHE_CONFIG["semantic_safe_tools"])
+                _cached_agent_cache[cached_key] = cached
+    return cached
+
+
+def _get_uncached_agent_runnable(key: Tuple[Hashable, ...], llm, tools: Sequence[Any], system_prompt: str):
+    """Obtener o construir el runnable sin caché de respuestas."""
+
+    agent = _agent_cache.get(key)
+    if agent is None:
+        with _cache_lock:
+            agent = _agent_cache.get(key)
+            if agent is None:
+                prompt = build_agent_prompt(system_prompt)
+                agent = prompt | llm.bind_tools(list(tools))
+                _agent_cache[key] = agent
+    return agent
+
+
+def get_summary_runnable(llm, system_prompt: str):
+    """Obtener el runnable `prompt | llm` usado para resumir conversaciones."""
+    key = _llm_key(llm) + (id(llm), system_prompt)
+
+    chain = _summary_cache.get(key)
+    if chain is None:
+        with _cache_lock:
+            chain = _summary_cache.get(key)
+            if chain is None:
+                summary_prompt = ChatPromptTemplate.from_messages([
+                    ("system", system_prompt),
+                    MessagesPlaceholder(variable_name="messages")
+                ])
+                chain = summary_prompt | llm
+                _summary_cache[key] = chain
+    return chain
+
+
+def clear_agent_cache() -> None:
+    """Vaciar la caché de runnables (útil en pruebas o al recargar configuración)."""
+    with _cache_lock:
+        _agent_cache.clear()
+        _summary_cache.clear()
+        _cached_agent_cache.clear()
+        _schema_hash_cache.clear()
@@ -0,0 +1,219 @@
+"""
+Customer Support Chatbot - Versión Asíncrona
+Grafo LangGraph con asyncio de extremo a extremo: LLM, herramientas y grafo con ainvoke
+Un solo proceso puede atender cientos de conversaciones concurrentes mientras espera a OpenAI
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, List
+
+from langchain_core.messages import HumanMessage
+from langgraph.graph import StateGraph, END
+
+from agent_factory import get_agent_runnable
+from checkpointing import get_checkpointer, resume_state, thread_config
+from context_window import fit_context
+from intent_router import get_faq_router, needs_model
+from message_state import last_reply, turn_input
+from config import SYSTEM_PROMPTS
+from streaming import aprint_stream, astream_turn
+from tool_executor import aexecute_tool_calls, count_tool_usage
+
+# Reutilizar estado, LLM, herramientas y configuración de la versión moderna
+from modern_customer_support import (
+    AgentState,
+    config,
+    env_config,
+    llm,
+    logger,
+    summarizer,
+    summary_queue,
+    tool_registry,
+    tools,
+)
+
+
+# Definir nodos del agente
+async def acall_model(state: AgentState) -> AgentState:
+    """Call the LLM asynchronously and handle tools internally."""
+    messages = state["messages"]
+
+    # Obtener agente con herramientas (prompt y bind_tools cacheados por proceso)
+    agent = get_agent_runnable(llm, tools, SYSTEM_PROMPTS["main_agent"])
+
+    # Obtener respuesta sin bloquear el event loop
+    response = await agent.ainvoke({
+        "messages": fit_context(messages),
+        "agent_scratchpad": []
+    })
+
+    # Solo los mensajes nuevos: el reductor los añade a la historia
+    new_messages = [response]
+    tool_usage_count = dict(state.get("tool_usage_count") or {})
+
+    # Si hay llamadas a herramientas, ejecutarlas concurrentemente
+    if getattr(response, "tool_calls", None):
+        new_messages.extend(await aexecute_tool_calls(response.tool_calls, tool_registry))
+
+        # Actualizar contador de uso de herramientas
+        tool_usage_count = count_tool_usage(response.tool_calls, tool_usage_count)
+
+    logger.info(f"Async LLM response generated for message: {messages[-1].content[:50]}...")
+
+    return {"messages": new_messages, "last_ai_message": response, "tool_usage_count": tool_usage_count}
+
+
+# Crear workflow asíncrono
+workflow = StateGraph(AgentState)
+
+# Enrutador de preguntas frecuentes antes del LLM
+faq_router = get_faq_router()
+workflow.add_node("router", faq_router.route)
+
+# Agregar el nodo principal (corrutina)
+workflow.add_node("agent", faq_router.timed(acall_model))
+
+# Definir punto de entrada
+workflow.set_entry_point("router")
+
+# Compactar la historia antigua en el resumen antes de llamar al agente
+workflow.add_node("compact", summarizer.acompact)
+
+# Pasar al agente solo si el enrutador no respondió
+workflow.add_conditional_edges("router", needs_model, {"agent": "compact", END: END})
+workflow.add_edge("compact", "agent")
+
+# Agregar edge directo al final
+workflow.add_edge("agent", END)
+
+# Compilar grafo con checkpoints por thread_id (cualquier proceso puede reanudar la conversación)
+app = workflow.compile(checkpointer=get_checkpointer())
+
+
+def new_session_state() -> Dict[str, Any]:
+    """Crear el estado inicial de una conversación."""
+    return {
+        "messages": [],
+        "customer_info": {},
+        "conversation_summary": "",
+        "summarized_count": 0,
+        "tool_usage_count": {}
+    }
+
+
+async def arun_turn(state: Dict[str, Any], user_input: str, session_id: str) -> Dict[str, Any]:
+    """Procesar un turno de usuario y devolver el nuevo estado de la sesión."""
+    turn_state = turn_input(app, state, [HumanMessage(content=user_input)])
+    return await app.ainvoke(turn_state, thread_config(session_id))
+
+
+async def astream_reply(state: Dict[str, Any], user_input: str, session_id: str):
+    """
+    Procesar un turno de usuario emitiendo la respuesta token a token.
+
+    Genera ("token", delta) según llegan del modelo y termina con
+    ("state", nuevo_estado).
+    """
+    turn_state = turn_input(app, state, [HumanMessage(content=user_input)])
+    async for event in astream_turn(app, turn_state, config=thread_config(session_id)):
+        yield event
+
+
+async def arun_conversations(conversations: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecutar varias conversaciones concurrentemente en un mismo event loop.
+
+    Cada conversación procesa sus turnos en orden; las distintas
+    conversaciones se intercalan mientras esperan la respuesta del LLM.
+    Las claves del diccionario se usan como thread_id de los checkpoints.
+    """
+    async def run_session(session_id: str, turns: List[str]) -> Dict[str, Any]:
+        state = new_session_state()
+        for user_input in turns:
+            state = await arun_turn(state, user_input, session_id)
+        return state
+
+    session_ids = list(conversations)
+    results = await asyncio.gather(*(run_session(sid, conversations[sid]) for sid in session_ids))
+    return dict(zip(session_ids, results))
+
+
+# Función para ejecutar el chatbot
+async def run_chatbot(session_id: str = None):
+    """Ejecutar el chatbot de soporte al cliente asíncrono; con `session_id` se reanuda esa conversación."""
+    print(f"{config['ui']['welcome_message']} (Versión Asíncrona - LangGraph 0.5.x)")
+    print("Type 'quit' to exit")
+    print("=" * 60)
+    print("I can help you with:")
+    print("• Order status and tracking")
+    print("• Return and refund policies")
+    print("• Shipping information")
+    print("• Payment and account questions")
+    print("• Creating support tickets")
+    print("• Customer information")
+    print("=" * 60)
+
+    # Identificador de la sesión: thread_id de los checkpoints y clave de su resumen
+    session_id = session_id or uuid.uuid4().hex
+
+    # Inicializar estado (o recuperar el último checkpoint de la sesión)
+    state = resume_state(app, session_id) or new_session_state()
+    conversation_length = 0
+
+    while True:
+        # Verificar longitud máxima de conversación
+        if conversation_length >= config["ui"]["max_conversation_length"]:
+            print("🤖 Maximum conversation length reached. Thank you for using our support!")
+            break
+
+        # Leer la entrada sin bloquear el event loop
+        user_input = (await asyncio.to_thread(input, "\n👤 You: ")).strip()
+
+        if user_input.lower() in config["ui"]["exit_commands"]:
+            print("🤖 Thank you for using our customer support! Goodbye!")
+            logger.info(f"FAQ router stats: {faq_router.stats()}")
+            break
+
+        conversation_length += 1
+
+        try:
+            if config["ui"]["stream_responses"]:
+                # Ejecutar workflow mostrando los tokens según llegan
+                result = await aprint_stream(astream_reply(state, user_input, session_id))
+            else:
+                # Ejecutar workflow
+                result = await arun_turn(state, user_input, session_id)
+
+                reply = last_reply(result)
+                if reply:
+                    print(f"🤖 Assistant: {reply}")
+
+            # Mostrar uso de herramientas si está habilitado
+            if config["ui"]["show_tool_usage"] and result.get("tool_usage_count"):
+                tool_count = result["tool_usage_count"]
+                print(f"🔧 Tools used: {', '.join([f'{tool}: {count}' for tool, count in tool_count.items()])}")
+
+            # Actualizar estado para siguiente iteración
+            state = result
+
+        except Exception as e:
+            logger.error(f"Error in conversation: {str(e)}")
+            print(f"🤖 I apologize, but I encountered an error: {str(e)}")
+            print("Please try rephrasing your question or contact our support team directly.")
+
+    # Resumir al terminar la sesión, fuera del camino de la respuesta
+    if state["messages"]:
+        summary_queue.submit(session_id, state)
+        logger.info(f"Summary queued for session {session_id} (pending: {len(summary_queue)})")
+
+
+if __name__ == "__main__":
+    # Verificar configuración
+    if not env_config["openai_api_key"]:
+        print("❌ Error: OPENAI_API_KEY environment variable not set.")
+        print("Please create a .env file with your OpenAI API key:")
+        print("OPENAI_API_KEY=your_api_key_here")
+    else:
+        logger.info("Starting async customer support chatbot")
+        asyncio.run(run_chatbot())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del coste por turno de construir el agente
+Compara reconstruir prompt + bind_tools en cada turno frente a la fábrica cacheada
+"""
+
+import os
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from agent_factory import clear_agent_cache, get_agent_runnable
+from config import SYSTEM_PROMPTS
+from modern_customer_support import llm, tools
+
+TURNS = 2000
+
+
+def build_per_turn():
+    """Construcción original: prompt y bind_tools en cada llamada a call_model."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPTS["main_agent"]),
+        MessagesPlaceholder(variable_name="messages"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+    return prompt | llm.bind_tools(tools)
+
+
+def build_cached():
+    """Construcción con la fábrica: solo el primer turno paga el coste."""
+    return get_agent_runnable(llm, tools, SYSTEM_PROMPTS["main_agent"], cache=False)
+
+
+def run(label, build):
+    """Medir el coste medio por turno de obtener el agente y formatear el prompt."""
+    messages = [HumanMessage(content="What is your return policy?")]
+    start = time.perf_counter()
+    for _ in range(TURNS):
+        agent = build()
+        # Formatear el prompt forma parte del trabajo local de cada turno
+        agent.first.invoke({"messages": messages, "agent_scratchpad": []})
+    elapsed = time.perf_counter() - start
+    per_turn_us = elapsed / TURNS * 1e6
+    print(f"{label:<28} {per_turn_us:10.1f} µs/turn")
+    return per_turn_us
+
+
+if __name__ == "__main__":
+    print(f"🚀 Agent runnable overhead ({TURNS} turns, {len(tools)} tools)")
+    print("=" * 50)
+    clear_agent_cache()
+    before = run("rebuild every turn", build_per_turn)
+    after = run("cached agent factory", build_cached)
+    print("=" * 50)
+    print(f"Speedup: {before / after:.1f}x")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los checkpoints de conversación
+Compara los bytes escritos por turno al guardar la lista completa de mensajes y al guardar solo los deltas
+"""
+
+import os
+import tempfile
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+
+import modern_customer_support
+from checkpointing import DeltaCheckpointSaver, SQLiteCheckpointStore, resume_state, thread_config
+from message_state import HistorySerializer, turn_input
+
+TURNS = 100
+CHECKPOINTS = (1, 10, 50, 100)
+
+
+class CountingSerializer(HistorySerializer):
+    """Serializador que cuenta los bytes que el checkpointer manda guardar."""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+
+    def dumps_typed(self, obj):
+        typed = super().dumps_typed(obj)
+        self.bytes_written += len(typed[1])
+        return typed
+
+
+def fake_agent(inputs):
+    """Agente simulado con una respuesta de longitud típica."""
+    return AIMessage(content="Thanks for reaching out! Your order is on its way and should arrive within 3-5 business days.")
+
+
+def run(app, serde, thread_id: str) -> dict:
+    """Ejecutar TURNS turnos y devolver los bytes escritos en los turnos de CHECKPOINTS."""
+    state = {"messages": [], "customer_info": {}, "conversation_summary": "", "summarized_count": 0,
+             "tool_usage_count": {}}
+    written = {}
+    for turn in range(1, TURNS + 1):
+        question = HumanMessage(content=f"Hello, I have another question about my order number {100000000 + turn}")
+        before = serde.bytes_written
+        state = app.invoke(turn_input(app, state, [question]), thread_config(thread_id))
+        if turn in CHECKPOINTS:
+            written[turn] = serde.bytes_written - before
+    return written
+
+
+if __name__ == "__main__":
+    modern_customer_support.get_agent_runnable = lambda *args, **kwargs: RunnableLambda(fake_agent)
+    # Sin compactación: se mide solo el coste de guardar la historia
+    modern_customer_support.summarizer.compaction = False
+    workflow = modern_customer_support.workflow
+
+    full_serde = CountingSerializer()
+    full = run(workflow.compile(checkpointer=InMemorySaver(serde=full_serde)), full_serde, "full")
+
+    path = os.path.join(tempfile.mkdtemp(), "checkpoints.db")
+    delta_serde = CountingSerializer()
+    start = time.perf_counter()
+    delta = run(workflow.compile(checkpointer=DeltaCheckpointSaver(SQLiteCheckpointStore(path), serde=delta_serde)),
+                delta_serde, "delta")
+    elapsed = time.perf_counter() - start
+
+    print(f"🚀 Checkpoint bytes written per turn ({TURNS} turns)")
+    print("=" * 70)
+    print(f"{'turn':>6} {'full message list':>20} {'per-turn deltas':>18}")
+    for turn in CHECKPOINTS:
+        print(f"{turn:>6} {full[turn]:>20} {delta[turn]:>18}")
+    print("=" * 70)
+
+    # Un proceso nuevo reanuda la conversación desde el fichero
+    resumed = modern_customer_support.workflow.compile(
+        checkpointer=DeltaCheckpointSaver(SQLiteCheckpointStore(path)))
+    state = resume_state(resumed, "delta")
+    assert len(state["messages"]) == 2 * TURNS, "resumed conversation is incomplete"
+    print(f"SQLite: {elapsed / TURNS * 1000:.2f} ms per turn, resumed {len(state['messages'])} messages from disk")
+    print("✅ Bytes written per turn stay flat with per-turn deltas")
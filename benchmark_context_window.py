@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la ventana de contexto
+Compara los tokens enviados al modelo por turno con la historia completa y con la ventana acotada
+"""
+
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from config import CONTEXT_CONFIG
+from context_window import estimate_tokens, fit_context
+
+TURNS = 200
+CHECKPOINTS = (1, 10, 50, 100, 200)
+
+
+def simulated_turn(turn: int) -> list:
+    """Un turno típico: pregunta, llamada a herramienta, resultado y respuesta."""
+    call_id = f"call_{turn}"
+    return [
+        HumanMessage(content=f"Can you check the status of order {100000000 + turn}?"),
+        AIMessage(content="", tool_calls=[{"name": "check_order_status",
+                                           "args": {"order_number": str(100000000 + turn)}, "id": call_id}]),
+        ToolMessage(content=f"Order {100000000 + turn}: Your order has been shipped! "
+                            "You should receive a tracking number shortly.", tool_call_id=call_id),
+        AIMessage(content="Your order has shipped and a tracking number is on its way. "
+                          "Is there anything else I can help you with?"),
+    ]
+
+
+def check_window(window: list) -> None:
+    """Cada ToolMessage de la ventana debe ir precedido de la llamada que lo originó."""
+    open_calls = set()
+    for message in window:
+        if isinstance(message, AIMessage):
+            open_calls = {call["id"] for call in message.tool_calls}
+        elif isinstance(message, ToolMessage):
+            assert message.tool_call_id in open_calls, "tool result separated from its call"
+
+
+if __name__ == "__main__":
+    print(f"🚀 Prompt tokens per turn (budget: {CONTEXT_CONFIG['max_context_tokens']} tokens)")
+    print("=" * 70)
+    print(f"{'turn':>6} {'full history':>14} {'bounded window':>16} {'fit_context µs':>16}")
+
+    history = []
+    for turn in range(1, TURNS + 1):
+        # El modelo recibe la historia hasta la pregunta actual
+        history.append(simulated_turn(turn)[0])
+        start = time.perf_counter()
+        window = fit_context(history)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        check_window(window)
+        assert window[-1] is history[-1], "the current question must always be sent"
+
+        if turn in CHECKPOINTS:
+            print(f"{turn:>6} {estimate_tokens(history):>14} {estimate_tokens(window):>16} {elapsed_us:>16.1f}")
+        history.extend(simulated_turn(turn)[1:])
+
+    print("=" * 70)
+    print("✅ Per-turn prompt size stays flat and tool calls are never split")
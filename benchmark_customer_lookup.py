@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark del repositorio de clientes
+Latencia de búsqueda y memoria residente al crecer la base de clientes (SQLite + caché LRU)
+"""
+
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from customer_store import CustomerRecord, SQLiteCustomerRepository
+
+SIZES = (10_000, 100_000, 1_000_000)
+LOOKUPS = 20_000
+CACHE_SIZE = 10_000
+TIERS = ("bronze", "silver", "gold", "platinum")
+
+
+def profiles(start: int, stop: int):
+    """Perfiles sintéticos; los emails llevan mayúsculas para ejercitar la normalización."""
+    for i in range(start, stop):
+        yield CustomerRecord(f"Customer{i}@Example.com", f"Customer {i}", i % 40, f"${i % 5000}.00",
+                             "2024-01-20", TIERS[i % len(TIERS)], ("electronics", "books"))
+
+
+def lookup_us(repository: SQLiteCustomerRepository, emails) -> float:
+    """Microsegundos medios por búsqueda."""
+    start = time.perf_counter()
+    for email in emails:
+        repository.get(email)
+    return (time.perf_counter() - start) / len(emails) * 1e6
+
+
+def rss_mb() -> float:
+    """Memoria residente máxima del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+if __name__ == "__main__":
+    record = next(profiles(0, 1))
+    as_dict = {field: getattr(record, field) for field in CustomerRecord.__slots__}
+    print("🚀 Customer repository lookups (SQLite, normalized-email primary key, LRU of hot profiles)")
+    print(f"   record: {sys.getsizeof(record)} bytes with __slots__ vs {sys.getsizeof(as_dict)} bytes as dict")
+    print("=" * 70)
+    print(f"{'customers':>10} {'cold lookup':>13} {'hot lookup':>12} {'cache hit':>10} {'max RSS':>10}")
+
+    repository = SQLiteCustomerRepository(os.path.join(tempfile.mkdtemp(), "customers.db"), CACHE_SIZE)
+    loaded = 0
+    rng = random.Random(42)
+    for size in SIZES:
+        repository.put_many(profiles(loaded, size))
+        loaded = size
+        # Frío: emails aleatorios de toda la base; caliente: un conjunto que cabe en la caché
+        cold = [f"  customer{rng.randrange(size)}@EXAMPLE.com " for _ in range(LOOKUPS)]
+        hot_set = [f"Customer{rng.randrange(size)}@Example.com" for _ in range(CACHE_SIZE // 2)]
+        hot = [rng.choice(hot_set) for _ in range(LOOKUPS)]
+        cold_us = lookup_us(repository, cold)
+        lookup_us(repository, hot_set)
+        repository.hits = repository.misses = 0
+        hot_us = lookup_us(repository, hot)
+        hit_rate = repository.hits / (repository.hits + repository.misses)
+        assert repository.get(f"CUSTOMER{size - 1}@example.com").name == f"Customer {size - 1}"
+        print(f"{size:>10,} {cold_us:>10.1f} µs {hot_us:>9.1f} µs {hit_rate:>9.0%} {rss_mb():>7.0f} MB")
+
+    print("=" * 70)
+    print(f"✅ Hot lookups stay in the cache and cold ones are one primary-key seek; at most {CACHE_SIZE:,} profiles stay in memory")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de una sesión larga
+Ejecuta 500 turnos sintéticos con el reductor anterior (copia de la lista) y con MessageHistory y compara el coste por turno,
+con checkpointer (modern_customer_support) y sin él (customer_support_bot, que recibe la historia completa en cada turno)
+"""
+
+import os
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.channels.binop import BinaryOperatorAggregate
+
+import customer_support_bot
+import modern_customer_support
+from checkpointing import create_checkpointer, thread_config
+from message_state import append_messages, last_reply, turn_input
+
+TURNS = 500
+BLOCK = 100
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+APPENDS = 1_000
+
+
+def copy_messages(left, right):
+    """Reductor anterior: cada escritura copia la historia completa en una lista nueva."""
+    if isinstance(right, BaseMessage):
+        right = [right]
+    left = left if isinstance(left, list) else list(left)
+    return left + list(right) if right else left
+
+
+def copy_turn_input(app, state, new_messages):
+    """Entrada anterior sin checkpointer: cada turno copia la historia completa en una lista nueva."""
+    if app.checkpointer is not None:
+        return {"messages": list(new_messages)}
+    return dict(state, messages=list(state["messages"]) + list(new_messages))
+
+
+def fake_agent(inputs):
+    """Agente simulado: responde al instante para medir solo el coste del grafo."""
+    return AIMessage(content=f"Answer to: {inputs['messages'][-1].content}")
+
+
+def run_session(module, reducer, make_input, label: str, checkpointed: bool) -> list:
+    """Ejecutar TURNS turnos del grafo de `module` con `reducer` en el canal messages y devolver el tiempo de cada bloque."""
+    workflow = module.workflow
+    workflow.channels["messages"] = BinaryOperatorAggregate(list, reducer)
+    app = workflow.compile(checkpointer=create_checkpointer() if checkpointed else None)
+    thread = thread_config(f"benchmark-long-session-{label}")
+    state = {"messages": [], "customer_info": {}, "conversation_summary": "", "summarized_count": 0,
+             "tool_usage_count": {}} if checkpointed else {"messages": [], "next": ""}
+    block_times = []
+    block_start = time.perf_counter()
+    for turn in range(1, TURNS + 1):
+        # Las preguntas llevan un número de pedido para que no las responda el enrutador
+        question = HumanMessage(content=f"Where is my order {100000000 + turn}?")
+        state = app.invoke(make_input(app, state, [question]), thread)
+        assert last_reply(state) == f"Answer to: {question.content}"
+        if turn % BLOCK == 0:
+            block_times.append(time.perf_counter() - block_start)
+            block_start = time.perf_counter()
+    assert len(state["messages"]) == 2 * TURNS
+    return block_times
+
+
+def print_session(title: str, baseline: list, current: list) -> None:
+    """Tabla de ms por turno de cada bloque, anterior frente a MessageHistory."""
+    print(title)
+    print(f"{'turns':>10} {'messages':>10} {'list copy ms/turn':>18} {'MessageHistory ms/turn':>24}")
+    for block, (old, new) in enumerate(zip(baseline, current), 1):
+        print(f"{(block - 1) * BLOCK + 1:>4}-{block * BLOCK:<5} {2 * block * BLOCK:>10} "
+              f"{old / BLOCK * 1000:>18.2f} {new / BLOCK * 1000:>24.2f}")
+    print(f"{'total s':>21} {sum(baseline):>18.2f} {sum(current):>24.2f}")
+
+
+def time_appends(reducer, size: int) -> float:
+    """Microsegundos por escritura de un mensaje sobre una historia de `size` mensajes."""
+    history = reducer([], [HumanMessage(content=f"message {i}") for i in range(size)])
+    message = AIMessage(content="reply")
+    start = time.perf_counter()
+    for _ in range(APPENDS):
+        history = reducer(history, [message])
+    return (time.perf_counter() - start) / APPENDS * 1e6
+
+
+if __name__ == "__main__":
+    fake_runnable = lambda *args, **kwargs: RunnableLambda(fake_agent)
+    modern_customer_support.get_agent_runnable = fake_runnable
+    customer_support_bot.get_agent_runnable = fake_runnable
+    # Sin compactación la historia crece sin límite: es el peor caso para el coste por turno
+    modern_customer_support.summarizer.compaction = False
+
+    print(f"🚀 {TURNS}-turn synthetic session (simulated LLM, compaction off)")
+    print("=" * 70)
+    baseline = run_session(modern_customer_support, copy_messages, copy_turn_input, "baseline", True)
+    current = run_session(modern_customer_support, append_messages, turn_input, "history", True)
+    print_session("With checkpointer (modern_customer_support)", baseline, current)
+
+    print("=" * 70)
+    stateless_baseline = run_session(customer_support_bot, copy_messages, copy_turn_input, "stateless-baseline", False)
+    stateless = run_session(customer_support_bot, append_messages, turn_input, "stateless", False)
+    print_session("Without checkpointer (customer_support_bot, full history sent each turn)", stateless_baseline, stateless)
+
+    print("=" * 70)
+    print(f"{'history':>10} {'list copy µs/write':>20} {'MessageHistory µs/write':>25}")
+    for size in HISTORY_SIZES:
+        print(f"{size:>10,} {time_appends(copy_messages, size):>20.2f} {time_appends(append_messages, size):>25.2f}")
+
+    print("=" * 70)
+    for label, times in (("with checkpointer", current), ("without checkpointer", stateless)):
+        print(f"Last block / first block {label}: {times[-1] / times[0]:.2f}x "
+              f"(quadratic growth would be ~{2 * TURNS // BLOCK - 1}x)")
+    print("✅ Writing to the history costs the same at any length: total time is linear in the number of turns")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark de consultas de pedidos
+Compara N consultas individuales frente a una sola consulta por lotes sobre el almacén SQLite indexado
+"""
+
+import os
+import tempfile
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from order_store import SQLiteOrderStore
+from support_data import get_support_data
+
+ORDERS = 200_000
+BATCH_SIZES = (1, 5, 20, 50)
+ROUNDS = 200
+
+
+def build_store(path: str) -> SQLiteOrderStore:
+    """Crear un almacén con ORDERS pedidos de estados variados."""
+    keys = get_support_data().order_status_keys
+    store = SQLiteOrderStore(path)
+    store.put_many((str(100_000_000 + i), keys[i % len(keys)]) for i in range(ORDERS))
+    return store
+
+
+def timed(func, batches) -> float:
+    """Milisegundos medios por lote."""
+    start = time.perf_counter()
+    for batch in batches:
+        func(batch)
+    return (time.perf_counter() - start) / len(batches) * 1000
+
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "orders.db")
+    start = time.perf_counter()
+    store = build_store(path)
+    print(f"🚀 Order lookups on an indexed SQLite store ({len(store):,} orders, "
+          f"loaded in {time.perf_counter() - start:.1f}s)")
+    print("=" * 70)
+    print(f"{'orders':>8} {'N single lookups':>18} {'1 batch lookup':>16} {'speedup':>9} {'tool calls':>12}")
+
+    stride = ORDERS // (ROUNDS * max(BATCH_SIZES))
+    for size in BATCH_SIZES:
+        batches = [[str(100_000_000 + (r * size + i) * stride) for i in range(size)] for r in range(ROUNDS)]
+        single = timed(lambda batch: [store.get_status(order) for order in batch], batches)
+        batched = timed(store.get_statuses, batches)
+        assert all(store.get_statuses(batch) == {order: store.get_status(order) for order in batch} for batch in batches[:5])
+        print(f"{size:>8} {single:>15.3f} ms {batched:>13.3f} ms {single / batched:>8.1f}x {size:>6} -> 1")
+
+    print("=" * 70)
+    print("✅ One indexed query (and one tool call / ToolMessage) resolves every order in the batch")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la caché de respuestas del LLM
+Mide el coste de responder una pregunta repetida (exacta o parafraseada) desde la caché
+"""
+
+import os
+import tempfile
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from response_cache import CachedRunnable, MemoryCacheBackend, ResponseCache, SemanticResponseCache, SQLiteCacheBackend
+from semantic_search import HashingEmbedder
+
+LOOKUPS = 5000
+ANSWER = AIMessage(content="You can return any item within 30 days of purchase for a full refund.")
+PARAPHRASES = ["what's your return policy", "What is your return policy ?", "WHAT IS YOUR RETURN POLICY!"]
+
+
+def run(label, backend):
+    """Medir el tiempo medio por pregunta repetida y comprobar que el LLM solo se llama una vez."""
+    llm_calls = 0
+
+    def fake_llm(inputs):
+        nonlocal llm_calls
+        llm_calls += 1
+        return ANSWER
+
+    agent = CachedRunnable(RunnableLambda(fake_llm), ResponseCache(backend), "benchmark")
+    inputs = {"messages": [HumanMessage(content="What is your return policy?")], "agent_scratchpad": []}
+    agent.invoke(inputs)  # Primera pregunta: fallo de caché
+
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        response = agent.invoke(inputs)
+    per_lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+    assert response.content == ANSWER.content
+    assert llm_calls == 1, "repeated questions must not reach the LLM"
+    print(f"{label:<20} {per_lookup_us:8.1f} µs/answer  {agent.cache.stats()}")
+
+
+def run_semantic():
+    """Medir las preguntas parafraseadas, que solo resuelve la caché semántica."""
+    llm_calls = 0
+
+    def fake_llm(inputs):
+        nonlocal llm_calls
+        llm_calls += 1
+        return ANSWER
+
+    semantic_cache = SemanticResponseCache(HashingEmbedder())
+    # Caché exacta sin capacidad: todas las búsquedas pasan por la capa semántica
+    agent = CachedRunnable(RunnableLambda(fake_llm), ResponseCache(MemoryCacheBackend(max_entries=0)), "benchmark",
+                           semantic_cache, ["search_knowledge_base"])
+    agent.invoke({"messages": [HumanMessage(content="What is your return policy?")], "agent_scratchpad": []})
+
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        question = PARAPHRASES[i % len(PARAPHRASES)]
+        response = agent.invoke({"messages": [HumanMessage(content=question)], "agent_scratchpad": []})
+    per_lookup_us = (time.perf_counter() - start) / LOOKUPS * 1e6
+
+    assert response.content == ANSWER.content
+    assert llm_calls == 1, "paraphrased questions must not reach the LLM"
+    print(f"{'semantic (paraphrase)':<20} {per_lookup_us:8.1f} µs/answer  {semantic_cache.stats()}")
+
+
+if __name__ == "__main__":
+    print(f"🚀 Repeated FAQ answered from cache ({LOOKUPS} lookups)")
+    print("=" * 70)
+    run("memory backend", MemoryCacheBackend())
+    with tempfile.TemporaryDirectory() as tmp:
+        run("sqlite backend", SQLiteCacheBackend(os.path.join(tmp, "cache.db")))
+    run_semantic()
+    print("=" * 70)
+    print("✅ Repeated questions are served without calling the LLM")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark del enrutador de preguntas frecuentes
+Mide la tasa de aciertos y la latencia ahorrada por turno sobre un tráfico de ejemplo
+"""
+
+import os
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+import modern_customer_support
+from checkpointing import thread_config
+
+# Latencia simulada de una completion del LLM (el benchmark no llama a la API)
+SIMULATED_LLM_SECONDS = 0.05
+
+# Tráfico de ejemplo: (pregunta, tema esperado o None si debe llegar al LLM)
+TRAFFIC = [
+    ("What is your return policy?", "return policy"),
+    ("How long does shipping take?", "shipping"),
+    ("Do you sell gift cards?", "gift cards"),
+    ("Can I pay with PayPal?", "payment"),
+    ("What are your customer service hours?", "hours"),
+    ("How do I track my package?", "tracking"),
+    ("Is there a warranty on electronics?", "warranty"),
+    ("Do you ship internationally?", "international"),
+    ("How do I cancel my order?", "cancellation"),
+    ("Where can I find the size guide?", "size guide"),
+    ("Can you check order 123456789?", None),
+    ("My email is jane@example.com, what's my loyalty tier?", None),
+    ("My package never arrived", None),
+    ("I want to open a ticket about a billing problem", None),
+    ("What's your return policy and how long does shipping take?", None),
+    ("Hi there!", None),
+]
+
+
+def slow_llm(inputs):
+    """Agente simulado: tarda lo que tardaría una llamada real."""
+    time.sleep(SIMULATED_LLM_SECONDS)
+    return AIMessage(content="LLM answer")
+
+
+if __name__ == "__main__":
+    modern_customer_support.get_agent_runnable = lambda *args, **kwargs: RunnableLambda(slow_llm)
+    router = modern_customer_support.faq_router
+    router.reset_stats()
+
+    print(f"🚀 FAQ router on {len(TRAFFIC)} sample turns (simulated LLM: {SIMULATED_LLM_SECONDS * 1000:.0f} ms)")
+    print("=" * 70)
+    for turn, (question, expected) in enumerate(TRAFFIC):
+        topic = router.classify(question)
+        assert topic == expected, f"{question!r}: expected {expected}, got {topic}"
+        state = {"messages": [HumanMessage(content=question)], "customer_info": {},
+                 "conversation_summary": "", "tool_usage_count": {}}
+        modern_customer_support.app.invoke(state, thread_config(f"benchmark-{turn}"))
+        print(f"{'router' if topic else 'llm':<7} {question}")
+
+    print("=" * 70)
+    for key, value in router.stats().items():
+        print(f"{key:<28} {value}")
+    print("✅ FAQ turns answered without calling the LLM")
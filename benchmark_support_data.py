@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de asignaciones por llamada a herramienta
+Compara reconstruir los diccionarios de datos en cada llamada frente a la capa de datos precargada
+"""
+
+import dis
+import os
+import time
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from support_data import get_support_data
+import customer_support_bot
+
+CALLS = 20000
+
+
+def inline_get_customer_info(customer_email: str) -> str:
+    """Versión original: el diccionario de clientes se construye en cada llamada."""
+    customer_data = {
+        "john@example.com": {"name": "John Smith", "orders": 5, "total_spent": "$450.00",
+                             "last_order": "2024-01-15", "loyalty_tier": "silver"},
+        "jane@example.com": {"name": "Jane Doe", "orders": 12, "total_spent": "$1,200.00",
+                             "last_order": "2024-01-20", "loyalty_tier": "gold"},
+        "mike@example.com": {"name": "Mike Johnson", "orders": 2, "total_spent": "$150.00",
+                             "last_order": "2024-01-10", "loyalty_tier": "bronze"}
+    }
+    if customer_email in customer_data:
+        data = customer_data[customer_email]
+        return (f"Customer: {data['name']}, Orders: {data['orders']}, "
+                f"Total Spent: {data['total_spent']}, Last Order: {data['last_order']}, "
+                f"Loyalty Tier: {data['loyalty_tier']}")
+    return f"No customer record found for {customer_email}. Please verify the email address."
+
+
+def inline_check_order_status(order_number: str) -> str:
+    """Versión original: el diccionario de estados y su lista de claves se construyen en cada llamada."""
+    statuses = {
+        "processing": "Your order is being processed and will ship within 2-3 business days.",
+        "shipped": "Your order has been shipped! You should receive a tracking number shortly.",
+        "delivered": "Your order has been delivered. Please check your doorstep or mailbox.",
+        "returned": "Your order has been returned and a refund is being processed.",
+        "cancelled": "Your order has been cancelled. If you were charged, a refund will be processed within 5-7 business days."
+    }
+    status_key = list(statuses.keys())[hash(order_number) % len(statuses)]
+    return f"Order {order_number}: {statuses[status_key]}"
+
+
+# Instrucciones que construyen un contenedor nuevo en cada ejecución
+CONTAINER_OPS = {"BUILD_MAP", "BUILD_CONST_KEY_MAP", "BUILD_LIST", "BUILD_SET", "LIST_EXTEND", "DICT_UPDATE"}
+
+
+def containers_built(func) -> int:
+    """
+    Contar los contenedores que la función construye en cada llamada.
+
+    Los diccionarios pequeños se reciclan desde la free list de CPython y no
+    aparecen en tracemalloc, así que se cuentan las instrucciones que los
+    crean. list(...) sobre un dict también cuenta como reconstrucción.
+    """
+    count = 0
+    for instruction in dis.get_instructions(func):
+        if instruction.opname in CONTAINER_OPS:
+            count += 1
+        elif instruction.opname in ("LOAD_GLOBAL", "LOAD_NAME") and instruction.argval == "list":
+            count += 1
+    return count
+
+
+def measure(label, func, arg):
+    """Medir contenedores construidos y tiempo por llamada."""
+    func(arg)  # Calentar cachés y carga perezosa
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func(arg)
+    per_call_us = (time.perf_counter() - start) / CALLS * 1e6
+
+    built = containers_built(func)
+    print(f"{label:<34} {built:3d} containers/call {per_call_us:8.2f} µs/call")
+    return built
+
+
+if __name__ == "__main__":
+    print(f"🚀 Tool data rebuilds per call ({CALLS} calls)")
+    print("=" * 70)
+
+    # Las funciones decoradas con @tool exponen la función original en .func
+    measure("get_customer_info (inline dict)", inline_get_customer_info, "jane@example.com")
+    rebuilt = measure("get_customer_info (data layer)", customer_support_bot.get_customer_info.func, "jane@example.com")
+    measure("check_order_status (inline dict)", inline_check_order_status, "123456789")
+    rebuilt += measure("check_order_status (data layer)", customer_support_bot.check_order_status.func, "123456789")
+    assert rebuilt == 0, "data-layer tools must not rebuild containers per call"
+
+    # Los datos son los mismos objetos en todas las llamadas: no se reconstruyen
+    first, second = get_support_data(), get_support_data()
+    assert first is second
+    assert first.customers is second.customers
+    assert first.order_status_keys is second.order_status_keys
+    print("=" * 70)
+    print("✅ Support data is loaded once and shared by every call")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark de tickets de soporte
+IDs únicos entre hilos y procesos, latencia de create_ticket y tickets por segundo escritos en SQLite
+"""
+
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# El benchmark no llama a la API; basta con una clave ficticia para crear el cliente
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import ticket_store
+from ticket_store import TicketQueue, TicketStore, new_ticket_id
+
+THREADS = 8
+PROCESSES = 4
+TICKETS_PER_WORKER = 5_000
+ISSUES = ("Refund not received", "Cannot log in", "Package arrived damaged", "Wrong size delivered")
+
+
+def create_tickets(count: int) -> list:
+    """Crear `count` tickets con create_ticket y devolver sus IDs."""
+    rng = random.Random()
+    return [ticket_store.create_ticket(rng.choice(ISSUES), f"customer{rng.randrange(10_000)}@example.com", "medium")
+            for _ in range(count)]
+
+
+def process_worker(path: str, count: int) -> list:
+    """Proceso independiente escribiendo en el mismo fichero SQLite."""
+    ticket_store._queue = TicketQueue(TicketStore(path), batch_size=500)
+    ids = create_tickets(count)
+    ticket_store._queue.join()
+    return ids
+
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "tickets.db")
+    queue = ticket_store._queue = TicketQueue(TicketStore(path), batch_size=500)
+    total = THREADS * TICKETS_PER_WORKER
+    print("🚀 Support tickets: ULID-style IDs + background SQLite writer with batched commits")
+    print("=" * 70)
+
+    old_ids = {f"TICKET-{len(issue) + len(f'customer{i}@example.com')}" for i in range(total) for issue in ISSUES[:1]}
+    print(f"old TICKET-{{len(issue)+len(email)}}: {len(old_ids):>6,} distinct IDs for {total:,} tickets")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        ids = [ticket_id for chunk in pool.map(create_tickets, [TICKETS_PER_WORKER] * THREADS) for ticket_id in chunk]
+    submitted = time.perf_counter() - start
+    queue.join()
+    persisted = time.perf_counter() - start
+    assert len(set(ids)) == total and len(queue.store) == total
+    stats = queue.stats()
+    print(f"{THREADS} threads:  {total:,} unique IDs, create_ticket {submitted / total * 1e6:.1f} µs/ticket, "
+          f"{total / persisted:,.0f} tickets/s persisted in {stats['batches']} commits")
+
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with context.Pool(PROCESSES) as pool:
+        results = pool.starmap(process_worker, [(path, TICKETS_PER_WORKER)] * PROCESSES)
+    elapsed = time.perf_counter() - start
+    process_ids = [ticket_id for chunk in results for ticket_id in chunk]
+    assert len(set(process_ids) | set(ids)) == total + len(process_ids)
+    assert len(TicketStore(path)) == total + len(process_ids)
+    assert all(chunk == sorted(chunk) for chunk in results)
+    print(f"{PROCESSES} processes: {len(process_ids):,} unique, per-process monotonic IDs in one tickets.db "
+          f"({len(process_ids) / elapsed:,.0f} tickets/s incl. startup)")
+    print(f"sample ID: {new_ticket_id()}")
+
+    print("=" * 70)
+    print("✅ No collisions observed; the agent turn only enqueues the ticket and one fsync covers a whole batch")
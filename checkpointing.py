@@ -0,0 +1,628 @@
+"""
+Checkpoints de conversación por thread_id
+Guarda el estado del grafo en memoria (LRU) o en SQLite para que cualquier proceso pueda reanudar una conversación;
+los mensajes se guardan como deltas por turno en lugar de reescribir la lista completa
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from config import CHECKPOINT_CONFIG
+from message_state import MessageHistory
+
+# Valor serializado: (tipo, bytes), como lo devuelve serde.dumps_typed
+Typed = Tuple[str, bytes]
+
+# Canal con la historia de la conversación
+MESSAGES_CHANNEL = "messages"
+
+# Marcador que sustituye a la historia: tramos [inicio, fin) del registro de mensajes del thread
+MESSAGE_SEGMENTS_KEY = "__message_segments__"
+
+# Fila de checkpoint: (thread_id, checkpoint_ns, checkpoint_id, checkpoint, metadata, parent_checkpoint_id)
+CheckpointRow = Tuple[str, str, str, Typed, Typed, Optional[str]]
+
+# Fila de escritura pendiente: (task_id, idx, channel, valor, task_path)
+WriteRow = Tuple[str, int, str, Typed, str]
+
+# Valor de un canal en una versión: (channel, version, valor)
+BlobRow = Tuple[str, str, Typed]
+
+
+def thread_config(thread_id: str) -> RunnableConfig:
+    """Configuración de invoke/stream para una conversación."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def resume_state(app, thread_id: str) -> Optional[Dict[str, Any]]:
+    """Estado guardado de una conversación, o None si el thread no tiene checkpoints."""
+    if app.checkpointer is None:
+        return None
+    snapshot = app.get_state(thread_config(thread_id))
+    return dict(snapshot.values) if snapshot.values else None
+
+
+async def aresume_state(app, thread_id: str) -> Optional[Dict[str, Any]]:
+    """Versión asíncrona de resume_state basada en app.aget_state."""
+    if app.checkpointer is None:
+        return None
+    snapshot = await app.aget_state(thread_config(thread_id))
+    return dict(snapshot.values) if snapshot.values else None
+
+
+def _is_message_list(value: Any) -> bool:
+    # Las listas del estado son homogéneas: basta con mirar los extremos, sin recorrer la historia
+    return isinstance(value, (list, tuple, MessageHistory)) and bool(value) and isinstance(value[0], BaseMessage) \
+        and isinstance(value[-1], BaseMessage)
+
+
+class MemoryCheckpointStore:
+    """
+    Almacén en memoria con expulsión LRU por conversación.
+
+    Al superar `max_threads` se descarta completa la conversación usada
+    hace más tiempo.
+    """
+
+    def __init__(self, max_threads: int = 1000):
+        self.max_threads = max_threads
+        self.on_evict: Optional[Callable[[str], None]] = None
+        self._threads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _thread(self, thread_id: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        data = self._threads.get(thread_id)
+        if data is None:
+            if not create:
+                return None
+            data = {"checkpoints": {}, "blobs": {}, "writes": {}, "messages": {}}
+            self._threads[thread_id] = data
+            while len(self._threads) > self.max_threads:
+                evicted, _ = self._threads.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(evicted)
+        self._threads.move_to_end(thread_id)
+        return data
+
+    def put_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, checkpoint: Typed,
+                       metadata: Typed, parent_checkpoint_id: Optional[str], blobs: Sequence[BlobRow] = ()) -> None:
+        """Guardar un checkpoint junto con los valores de sus canales nuevos."""
+        with self._lock:
+            data = self._thread(thread_id, create=True)
+            for channel, version, value in blobs:
+                data["blobs"][(checkpoint_ns, channel, version)] = value
+            checkpoints = data["checkpoints"].setdefault(checkpoint_ns, {})
+            checkpoints[checkpoint_id] = (checkpoint, metadata, parent_checkpoint_id)
+
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str,
+                       checkpoint_id: Optional[str] = None) -> Optional[CheckpointRow]:
+        with self._lock:
+            data = self._thread(thread_id)
+            checkpoints = data["checkpoints"].get(checkpoint_ns) if data else None
+            if not checkpoints:
+                return None
+            checkpoint_id = checkpoint_id or max(checkpoints)
+            if checkpoint_id not in checkpoints:
+                return None
+            return (thread_id, checkpoint_ns, checkpoint_id) + checkpoints[checkpoint_id]
+
+    def list_checkpoints(self, thread_id: Optional[str], checkpoint_ns: Optional[str]) -> List[CheckpointRow]:
+        with self._lock:
+            thread_ids = [thread_id] if thread_id is not None else list(self._threads)
+            rows = []
+            for tid in thread_ids:
+                data = self._threads.get(tid)
+                for ns, checkpoints in (data["checkpoints"].items() if data else ()):
+                    if checkpoint_ns is not None and ns != checkpoint_ns:
+                        continue
+                    for checkpoint_id in sorted(checkpoints, reverse=True):
+                        rows.append((tid, ns, checkpoint_id) + checkpoints[checkpoint_id])
+            return rows
+
+    def get_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Optional[Typed]:
+        with self._lock:
+            data = self._threads.get(thread_id)
+            return data["blobs"].get((checkpoint_ns, channel, version)) if data else None
+
+    def put_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, rows: Sequence[WriteRow]) -> None:
+        with self._lock:
+            writes = self._thread(thread_id, create=True)["writes"].setdefault((checkpoint_ns, checkpoint_id), {})
+            for task_id, idx, channel, value, task_path in rows:
+                # Las escrituras con índice positivo ya guardadas no se sobrescriben
+                if idx >= 0 and (task_id, idx) in writes:
+                    continue
+                writes[(task_id, idx)] = (channel, value, task_path)
+
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[WriteRow]:
+        with self._lock:
+            data = self._threads.get(thread_id)
+            writes = data["writes"].get((checkpoint_ns, checkpoint_id), {}) if data else {}
+            return [(task_id, idx) + entry for (task_id, idx), entry in writes.items()]
+
+    def append_messages(self, thread_id: str, checkpoint_ns: str, messages: Sequence[Typed]) -> int:
+        """Añadir mensajes al registro del thread y devolver la posición del primero."""
+        with self._lock:
+            log = self._thread(thread_id, create=True)["messages"].setdefault(checkpoint_ns, [])
+            start = len(log)
+            log.extend(messages)
+            return start
+
+    def read_messages(self, thread_id: str, checkpoint_ns: str, start: int, end: int) -> List[Typed]:
+        with self._lock:
+            data = self._threads.get(thread_id)
+            return data["messages"].get(checkpoint_ns, [])[start:end] if data else []
+
+    def message_count(self, thread_id: str, checkpoint_ns: str) -> int:
+        with self._lock:
+            data = self._threads.get(thread_id)
+            return len(data["messages"].get(checkpoint_ns, [])) if data else 0
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+
+class SQLiteCheckpointStore:
+    """Almacén persistente en SQLite, compartido por todos los procesos que abren el mismo fichero."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.on_evict: Optional[Callable[[str], None]] = None   # SQLite no expulsa conversaciones
+        self._lock = threading.Lock()
+        # Con varios procesos escribiendo, se espera al bloqueo en lugar de fallar con "database is locked"
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "parent_checkpoint_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS checkpoint_blobs ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL, "
+            "type TEXT NOT NULL, blob BLOB NOT NULL, PRIMARY KEY (thread_id, checkpoint_ns, channel, version));"
+            "CREATE TABLE IF NOT EXISTS checkpoint_writes ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT NOT NULL, "
+            "value BLOB NOT NULL, task_path TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+            "CREATE TABLE IF NOT EXISTS checkpoint_messages ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, seq INTEGER NOT NULL, "
+            "type TEXT NOT NULL, message BLOB NOT NULL, PRIMARY KEY (thread_id, checkpoint_ns, seq));"
+        )
+        self._conn.commit()
+
+    def put_checkpoint(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, checkpoint: Typed,
+                       metadata: Typed, parent_checkpoint_id: Optional[str], blobs: Sequence[BlobRow] = ()) -> None:
+        """Guardar un checkpoint junto con los valores de sus canales nuevos, en una sola transacción."""
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(thread_id, checkpoint_ns, channel, version, value[0], value[1])
+                     for channel, version, value in blobs]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                    "parent_checkpoint_id, type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                     checkpoint[0], checkpoint[1], metadata[0], metadata[1])
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    @staticmethod
+    def _checkpoint_row(row: tuple) -> CheckpointRow:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return thread_id, checkpoint_ns, checkpoint_id, (type_, checkpoint), (metadata_type, metadata), parent_checkpoint_id
+
+    def get_checkpoint(self, thread_id: str, checkpoint_ns: str,
+                       checkpoint_id: Optional[str] = None) -> Optional[CheckpointRow]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(query + " AND checkpoint_id = ?",
+                                         (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1",
+                                         (thread_id, checkpoint_ns)).fetchone()
+        return self._checkpoint_row(row) if row else None
+
+    def list_checkpoints(self, thread_id: Optional[str], checkpoint_ns: Optional[str]) -> List[CheckpointRow]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        conditions, params = [], []
+        if thread_id is not None:
+            conditions.append("thread_id = ?")
+            params.append(thread_id)
+        if checkpoint_ns is not None:
+            conditions.append("checkpoint_ns = ?")
+            params.append(checkpoint_ns)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._checkpoint_row(row) for row in rows]
+
+    def get_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> Optional[Typed]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT type, blob FROM checkpoint_blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, version)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, rows: Sequence[WriteRow]) -> None:
+        with self._lock:
+            for task_id, idx, channel, value, task_path in rows:
+                # Las escrituras con índice positivo ya guardadas no se sobrescriben
+                verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+                self._conn.execute(
+                    f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                    "channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, value[0], value[1], task_path)
+                )
+            self._conn.commit()
+
+    def get_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[WriteRow]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM checkpoint_writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchall()
+        return [(task_id, idx, channel, (type_, value), task_path)
+                for task_id, idx, channel, type_, value, task_path in rows]
+
+    def append_messages(self, thread_id: str, checkpoint_ns: str, messages: Sequence[Typed]) -> int:
+        """Añadir mensajes al registro del thread y devolver la posición del primero."""
+        with self._lock:
+            # El bloqueo de escritura se toma antes de leer MAX(seq): otro proceso con el
+            # mismo fichero no puede asignar las mismas posiciones entre la lectura y el INSERT
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._message_count(thread_id, checkpoint_ns)
+                self._conn.executemany(
+                    "INSERT INTO checkpoint_messages (thread_id, checkpoint_ns, seq, type, message) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(thread_id, checkpoint_ns, start + i, type_, data) for i, (type_, data) in enumerate(messages)]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            return start
+
+    def read_messages(self, thread_id: str, checkpoint_ns: str, start: int, end: int) -> List[Typed]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT type, message FROM checkpoint_messages "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (thread_id, checkpoint_ns, start, end)
+            ).fetchall()
+        return [(type_, data) for type_, data in rows]
+
+    def _message_count(self, thread_id: str, checkpoint_ns: str) -> int:
+        row = self._conn.execute(
+            "SELECT MAX(seq) FROM checkpoint_messages WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def message_count(self, thread_id: str, checkpoint_ns: str) -> int:
+        with self._lock:
+            return self._message_count(thread_id, checkpoint_ns)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes", "checkpoint_messages"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+
+
+class DeltaCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer de LangGraph que guarda los mensajes como deltas.
+
+    El canal `messages` se guarda como tramos de un registro de mensajes
+    por thread, al que solo se añaden los mensajes nuevos. Si la lista no
+    extiende la última guardada (p. ej. tras compactar la historia), se
+    añade completa una vez. Las escrituras de los nodos ya son solo los
+    mensajes nuevos (reductor append_messages) y, como el resto de canales,
+    se guardan como en InMemorySaver.
+    """
+
+    def __init__(self, store, max_heads: Optional[int] = None, serde=None):
+        super().__init__(serde=serde)
+        self.store = store
+        self.max_heads = CHECKPOINT_CONFIG["max_threads"] if max_heads is None else max_heads
+        # Última lista de mensajes guardada por (thread_id, checkpoint_ns):
+        # (tramos, fin del registro, lista, longitud). La lista no se copia: es
+        # un MessageHistory y el reductor devuelve vistas nuevas sin modificarla.
+        self._heads: "OrderedDict[Tuple[str, str], Tuple[List[List[int]], int, List[BaseMessage], int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Si el almacén descarta una conversación, su registro deja de ser válido
+        store.on_evict = self._forget
+
+    # Codificación de listas de mensajes
+
+    def _set_head(self, key: Tuple[str, str], segments: List[List[int]], end: int,
+                  messages: Sequence[BaseMessage]) -> None:
+        self._heads[key] = (segments, end, messages, len(messages))
+        self._heads.move_to_end(key)
+        while len(self._heads) > self.max_heads:
+            self._heads.popitem(last=False)
+
+    def _forget(self, thread_id: str) -> None:
+        for key in [key for key in self._heads if key[0] == thread_id]:
+            del self._heads[key]
+
+    @staticmethod
+    def _same(a: BaseMessage, b: BaseMessage) -> bool:
+        return a is b or a == b
+
+    @staticmethod
+    def _truncate(segments: List[List[int]], count: int) -> List[List[int]]:
+        """Tramos que cubren los primeros `count` mensajes."""
+        truncated = []
+        for start, end in segments:
+            if count <= 0:
+                break
+            truncated.append([start, min(end, start + count)])
+            count -= end - start
+        return truncated
+
+    def _encode_messages(self, thread_id: str, checkpoint_ns: str, messages: Sequence[BaseMessage]) -> Dict[str, Any]:
+        """
+        Guardar una lista de mensajes como tramos del registro del thread.
+
+        Se compara con la última lista guardada (solo el primer mensaje y el
+        del límite): si la extiende, se añaden solo los mensajes nuevos; si
+        es un prefijo suyo (p. ej. al reanudar desde un checkpoint anterior),
+        se reutilizan sus tramos. Si el registro cambió en otro proceso, la
+        lista se añade completa.
+        """
+        key = (thread_id, checkpoint_ns)
+        head = self._heads.get(key)
+        log_end = self.store.message_count(thread_id, checkpoint_ns)
+        if head is not None and head[1] == log_end and head[3] and self._same(messages[0], head[2][0]):
+            segments, _, previous, length = head
+            if len(messages) <= length and self._same(messages[-1], previous[len(messages) - 1]):
+                return {MESSAGE_SEGMENTS_KEY: self._truncate(segments, len(messages))}
+            if len(messages) > length and self._same(messages[length - 1], previous[length - 1]):
+                segments = [list(segment) for segment in segments]
+                new_messages = messages[length:]
+            else:
+                segments, new_messages = [], messages
+        else:
+            segments, new_messages = [], messages
+        start = self.store.append_messages(thread_id, checkpoint_ns, [self.serde.dumps_typed(m) for m in new_messages])
+        log_end = start + len(new_messages)
+        if segments and segments[-1][1] == start:
+            segments[-1][1] = log_end
+        else:
+            segments.append([start, log_end])
+        self._set_head(key, segments, log_end, messages)
+        return {MESSAGE_SEGMENTS_KEY: segments}
+
+    def _decode_messages(self, thread_id: str, checkpoint_ns: str, segments: List[List[int]]) -> MessageHistory:
+        # Los tramos de la última lista guardada se sirven sin leer ni deserializar la historia
+        head = self._heads.get((thread_id, checkpoint_ns))
+        if head is not None and head[0] == segments and len(head[2]) == head[3]:
+            return head[2]
+        messages = []
+        for start, end in segments:
+            messages.extend(self.serde.loads_typed(m)
+                            for m in self.store.read_messages(thread_id, checkpoint_ns, start, end))
+        return MessageHistory._view(messages, len(messages))
+
+    def _dumps(self, thread_id: str, checkpoint_ns: str, channel: str, value: Any) -> Typed:
+        if channel == MESSAGES_CHANNEL and _is_message_list(value):
+            value = self._encode_messages(thread_id, checkpoint_ns, value)
+        return self.serde.dumps_typed(value)
+
+    def _is_segments(self, value: Any) -> bool:
+        return isinstance(value, dict) and len(value) == 1 and MESSAGE_SEGMENTS_KEY in value
+
+    def _loads(self, thread_id: str, checkpoint_ns: str, typed: Typed) -> Any:
+        value = self.serde.loads_typed(typed)
+        if self._is_segments(value):
+            return self._decode_messages(thread_id, checkpoint_ns, value[MESSAGE_SEGMENTS_KEY])
+        return value
+
+    # Lectura
+
+    def _tuple(self, row: CheckpointRow, track_head: bool = False) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, checkpoint_typed, metadata_typed, parent_checkpoint_id = row
+        checkpoint: Checkpoint = self.serde.loads_typed(checkpoint_typed)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            typed = self.store.get_blob(thread_id, checkpoint_ns, channel, version)
+            if typed is None or typed[0] == "empty":
+                continue
+            channel_values[channel] = self._loads(thread_id, checkpoint_ns, typed)
+            if track_head and channel == MESSAGES_CHANNEL and isinstance(channel_values[channel], MessageHistory):
+                # Recordar la lista cargada para que el siguiente turno solo guarde los mensajes nuevos
+                segments = self.serde.loads_typed(typed)
+                head = self._heads.get((thread_id, checkpoint_ns))
+                if self._is_segments(segments) and (head is None or channel_values[channel] is not head[2]):
+                    self._set_head((thread_id, checkpoint_ns), segments[MESSAGE_SEGMENTS_KEY],
+                                   self.store.message_count(thread_id, checkpoint_ns), channel_values[channel])
+        writes = sorted(self.store.get_writes(thread_id, checkpoint_ns, checkpoint_id),
+                        key=lambda w: writes_sort_key(w[4], w[0], w[1]))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed(metadata_typed),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value))
+                            for task_id, _, channel, value, _ in writes]
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            row = self.store.get_checkpoint(thread_id, checkpoint_ns, checkpoint_id)
+            if row is None:
+                return None
+            return self._tuple(row, track_head=checkpoint_id is None)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"] if config else None
+        checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        checkpoint_id = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+        with self._lock:
+            rows = self.store.list_checkpoints(thread_id, checkpoint_ns)
+        for row in rows:
+            if checkpoint_id and row[2] != checkpoint_id:
+                continue
+            if before_id and row[2] >= before_id:
+                continue
+            if filter:
+                metadata = self.serde.loads_typed(row[4])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            with self._lock:
+                item = self._tuple(row)
+            yield item
+
+    # Escritura
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        with self._lock:
+            blobs = [(channel, version, self._dumps(thread_id, checkpoint_ns, channel, values[channel])
+                      if channel in values else ("empty", b""))
+                     for channel, version in new_versions.items()]
+            self.store.put_checkpoint(
+                thread_id, checkpoint_ns, checkpoint["id"],
+                self.serde.dumps_typed(stored),
+                self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                config["configurable"].get("checkpoint_id"),
+                blobs
+            )
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            rows = [(task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+                     self.serde.dumps_typed(value), task_path)
+                    for idx, (channel, value) in enumerate(writes)]
+            self.store.put_writes(thread_id, checkpoint_ns, checkpoint_id, rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.store.delete_thread(thread_id)
+            self._forget(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # Versiones asíncronas: las síncronas se ejecutan en un hilo para que una
+    # escritura lenta o en espera del bloqueo de SQLite no detenga el event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(list, self.list(config, filter=filter, before=before, limit=limit))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer(checkpoint_config: Dict[str, Any] = None) -> DeltaCheckpointSaver:
+    """Crear el checkpointer con el backend configurado ("memory" o "sqlite")."""
+    checkpoint_config = checkpoint_config or CHECKPOINT_CONFIG
+    if checkpoint_config["backend"] == "sqlite":
+        store = SQLiteCheckpointStore(checkpoint_config["sqlite_path"])
+    else:
+        store = MemoryCheckpointStore(checkpoint_config["max_threads"])
+    return DeltaCheckpointSaver(store, max_heads=checkpoint_config["max_threads"])
+
+
+_checkpointer: Optional[DeltaCheckpointSaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> Optional[DeltaCheckpointSaver]:
+    """Obtener el checkpointer compartido (None si está deshabilitado), creándolo la primera vez."""
+    global _checkpointer
+    if not CHECKPOINT_CONFIG["enabled"]:
+        return None
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = create_checkpointer()
+    return _checkpointer
@@ -32,6 +32,20 @@ KNOWLEDGE_BASE = {
     "gift cards": "Gift cards are available in denominations from $10 to $500. They never expire and can be used for any purchase."
 }
 
+# Formas alternativas de preguntar por cada tema (mejoran la búsqueda semántica)
+KNOWLEDGE_BASE_ALIASES = {
+    "return policy": ["send it back", "return an item", "give it back", "devolver un producto", "devolución"],
+    "refund": ["money back", "get my money", "reembolso"],
+    "shipping": ["how long until it arrives", "envío"],
+    "payment": ["pay with", "credit card", "formas de pago"],
+    "tracking": ["where is my package", "where is my order", "seguimiento"],
+    "contact": ["phone number", "talk to a human", "speak to someone", "contacto"],
+    "hours": ["opening hours", "when are you open", "horario"],
+    "cancellation": ["cancel my order", "cancelar pedido"],
+    "damaged": ["arrived broken", "broken item", "producto roto"],
+    "gift cards": ["gift certificate", "voucher", "tarjeta regalo"]
+}
+
 # Datos de clientes simulados
 CUSTOMER_DATA = {
     "john@example.com": {
@@ -69,7 +83,13 @@ TICKET_CONFIG = {
         "urgent": "1-2 hours"
     },
     "default_priority": "medium",
-    "ticket_prefix": "TICKET"
+    "ticket_prefix": "TICKET",
+    "store_path": "tickets.db",     # SQLite donde se guardan los tickets (ticket_store.py)
+    "batch_size": 500,              # Máximo de tickets por transacción (un fsync por lote)
+    "background": True,             # Escribir en un hilo aparte sin bloquear el turno del agente
+    "write_retries": 5,             # Reintentos de un lote al cerrar el proceso (antes se reintenta sin límite)
+    "retry_backoff": 0.2,           # Espera inicial entre reintentos (segundos, se duplica)
+    "max_retry_backoff": 5.0
 }
 
 # Configuración de estados de pedidos
@@ -81,12 +101,31 @@ ORDER_STATUSES = {
     "cancelled": "Your order has been cancelled. If you were charged, a refund will be processed within 5-7 business days."
 }
 
+# Backend de estados de pedido (order_store.py)
+ORDER_STORE_CONFIG = {
+    "backend": "simulated",                 # "simulated" (hash estable) o "sqlite" (tabla indexada)
+    "sqlite_path": "orders.db",
+    "simulate_missing": True,               # Con sqlite, simular los pedidos que no están en la tabla
+    "cache_entries": 10000,                 # 0 desactiva la caché
+    "cache_ttl_seconds": 60,                # El estado de un pedido cambia: caduca pronto
+    "max_batch_orders": 50                  # Pedidos por llamada a check_order_statuses
+}
+
+# Repositorio de perfiles de cliente (customer_store.py)
+CUSTOMER_STORE_CONFIG = {
+    "backend": "memory",                    # "memory" (CUSTOMER_DATA o SUPPORT_DATA_FILE) o "sqlite" (en disco)
+    "sqlite_path": "customers.db",
+    "cache_size": 10000,                    # Perfiles retenidos en memoria (LRU)
+    "import_file": None                     # CSV o JSONL con el que poblar la tabla si está vacía
+}
+
 # Configuración de la interfaz
 UI_CONFIG = {
     "welcome_message": "🤖 Customer Support Chatbot",
     "exit_commands": ["quit", "exit", "bye", "goodbye"],
     "max_conversation_length": 50,
-    "show_tool_usage": True
+    "show_tool_usage": True,
+    "stream_responses": True  # Mostrar la respuesta token a token
 }
 
 # Configuración de prompts del sistema
@@ -109,12 +148,18 @@ SYSTEM_PROMPTS = {
     Available tools:
     - search_knowledge_base: For policy and general information
     - check_order_status: To check order status with order number
+    - check_order_statuses: To check several orders at once (one call with all the order numbers)
     - create_support_ticket: For complex issues requiring human help
     - get_customer_info: To retrieve customer data with email
     
     Use tools when appropriate to provide accurate information.""",
     
-    "summary": "Summarize this customer support conversation in 2-3 sentences, highlighting the main issue and resolution."
+    "summary": "Summarize this customer support conversation in 2-3 sentences, highlighting the main issue and resolution.",
+
+    "summary_update": """Update the running summary of this customer support conversation with the new messages.
+    Keep it to 2-3 sentences, highlighting the main issue, key details (order numbers, emails, tickets) and resolution.
+
+    Current summary: {summary}"""
 }
 
 # Configuración de herramientas
@@ -122,8 +167,11 @@ TOOL_CONFIG = {
     "search_knowledge_base": {
         "description": "Search the knowledge base for relevant information about products and services.",
         "parameters": {
-            "query": "The search query to look up in the knowledge base"
-        }
+            "query": "The search query to look up in the knowledge base",
+            "top_k": "Maximum number of passages to return"
+        },
+        "progress": "Searching the knowledge base for \"{query}\"…",  # Evento de progreso mostrado al cliente
+        "memo_ttl": 300             # Segundos que se reutiliza el resultado dentro de la sesión (0 = nunca)
     },
     "create_support_ticket": {
         "description": "Create a support ticket for complex issues that require human intervention.",
@@ -131,22 +179,147 @@ TOOL_CONFIG = {
             "issue": "Description of the issue",
             "customer_email": "Customer's email address",
             "priority": "Priority level (low, medium, high, urgent)"
-        }
+        },
+        "progress": "Creating a support ticket…",
+        "memo_ttl": 0               # Tiene efectos secundarios: cada llamada crea un ticket
     },
     "check_order_status": {
         "description": "Check the status of an order using the order number.",
         "parameters": {
             "order_number": "The order number to check"
-        }
+        },
+        "progress": "Checking order {order_number}…",
+        "memo_ttl": 30              # El estado de un pedido cambia: TTL corto
+    },
+    "check_order_statuses": {
+        "description": "Check the status of several orders at once.",
+        "parameters": {
+            "order_numbers": "The order numbers to check"
+        },
+        "progress": "Checking orders {order_numbers}…",
+        "memo_ttl": 30
     },
     "get_customer_info": {
         "description": "Retrieve customer information and order history.",
         "parameters": {
             "customer_email": "Customer's email address"
-        }
+        },
+        "progress": "Looking up customer {customer_email}…",
+        "memo_ttl": 300
     }
 }
 
+# Configuración de búsqueda en la base de conocimientos (BM25)
+SEARCH_CONFIG = {
+    "bm25_k1": 1.2,             # Saturación de la frecuencia de términos
+    "bm25_b": 0.75,             # Normalización por longitud del artículo
+    "topic_weight": 3.0,        # Peso de los términos del tema frente al artículo
+    "default_top_k": 2,         # Pasajes devueltos al LLM por defecto
+    "max_top_k": 5,
+    "min_relative_score": 0.3,  # Descartar pasajes con menos del 30% de la puntuación del mejor
+    "semantic_fallback": True,  # Buscar por embeddings cuando BM25 no encuentra nada
+    "embedder": "hashing",      # "hashing" (local, sin coste) u "openai"
+    "embedding_model": "text-embedding-3-small",
+    "embedding_dim": 512,       # Dimensión del embedder local
+    "semantic_min_score": 0.15  # Similitud coseno mínima para aceptar un resultado
+}
+
+# Configuración de la caché de respuestas del LLM
+CACHE_CONFIG = {
+    "enabled": True,
+    "backend": "memory",                 # "memory" (LRU en proceso) o "sqlite" (persistente)
+    "max_entries": 1000,
+    "ttl_seconds": 3600,                 # Las respuestas caducan tras una hora
+    "sqlite_path": "response_cache.db",
+    # Caché semántica: reutiliza respuestas de preguntas parafraseadas (embedder de SEARCH_CONFIG)
+    # Solo se activa con un modelo de embeddings real (SEARCH_CONFIG["embedder"] = "openai"): el embedder
+    # "hashing" compara palabras, no significado ("open on Sunday?" ≈ "open on Monday?")
+    "semantic_enabled": False,
+    "semantic_threshold": 0.9,           # Similitud coseno mínima
+    "semantic_max_entries": 500,
+    # Herramientas cuyas respuestas no dependen del cliente
+    "semantic_safe_tools": ["search_knowledge_base"]
+}
+
+# Enrutador previo al LLM: responde desde la base de conocimientos las preguntas de una sola intención
+ROUTER_CONFIG = {
+    "enabled": True,
+    "max_words": 15,  # Las preguntas largas suelen mezclar varias intenciones
+    # Patrones por tema de KNOWLEDGE_BASE; la pregunta debe coincidir con un único tema
+    "intents": {
+        "return policy": [r"\breturn policy\b", r"\b(can|how do|how can) i return\b", r"\breturn window\b"],
+        "shipping": [r"\bhow long (does|will) shipping take\b", r"\bshipping (cost|costs|time|times|options?)\b", r"\bfree shipping\b"],
+        "warranty": [r"\bwarrant(y|ies)\b"],
+        "payment": [r"\bpayment (methods?|options|plans?)\b", r"\bforms of payment\b", r"\b(can i|do you accept) (pay with|paypal|apple pay|google pay|credit cards?)\b"],
+        "account": [r"\b(create|open|make) an account\b"],
+        "refund": [r"\bhow long (do|does|will) (a )?refunds? take\b", r"\brefund (time|processing)\b"],
+        "tracking": [r"\bhow (do|can) i track\b", r"\btracking number\b"],
+        "contact": [r"\bhow (do|can) i (contact|reach) (you|support|customer service)\b", r"\b(phone number|support email)\b"],
+        "hours": [r"\b(opening|business|support|customer service) hours\b", r"\bwhen are you open\b"],
+        "cancellation": [r"\bhow (do|can) i cancel\b", r"\bcancellation policy\b"],
+        "delivery": [r"\bsame[- ]day delivery\b", r"\bdelivery options\b"],
+        "international": [r"\b(ship|deliver) internationally\b", r"\binternational (shipping|delivery)\b"],
+        "damaged": [r"\b(arrives|arrived|is|was) damaged\b", r"\bdamaged (item|product)s?\b"],
+        "size guide": [r"\bsize guide\b", r"\bsizing\b"],
+        "gift cards": [r"\bgift cards?\b"]
+    },
+    # Señales de un caso concreto del cliente: se deja al LLM
+    "blockers": [r"\b(ticket|complaint|problem|issue|wrong|never|not)\b", r"n't\b"]
+}
+
+# Ventana de contexto enviada al modelo en cada turno
+CONTEXT_CONFIG = {
+    "max_context_tokens": 3000,  # Presupuesto para la historia (el prompt del sistema va aparte)
+    "chars_per_token": 4.0,      # Estimación local de tokens sin llamar al tokenizador del proveedor
+    # Compactación: al superar el umbral, los turnos antiguos pasan al resumen incremental
+    "compaction": True,
+    "compact_threshold_tokens": 3000,
+    "compact_keep_tokens": 1500   # Historia reciente que se conserva tras compactar
+}
+
+# Resúmenes de conversación calculados en segundo plano al terminar cada sesión
+SUMMARY_CONFIG = {
+    "background": True,                     # False: resumir en el hilo de la conversación
+    "workers": 1,
+    "store_path": "conversation_summaries.db"
+}
+
+# Configuración de los checkpoints de conversación (estado por thread_id)
+CHECKPOINT_CONFIG = {
+    "enabled": True,
+    "backend": "memory",                    # "memory" (LRU en proceso) o "sqlite" (compartido en disco)
+    "max_threads": 1000,                    # Conversaciones retenidas por el backend en memoria
+    "sqlite_path": "checkpoints.db"
+}
+
+# Configuración del servidor HTTP (http_server.py)
+SERVER_CONFIG = {
+    "host": "0.0.0.0",
+    "port": 8080,
+    "max_concurrent_turns": 256,            # Turnos ejecutándose a la vez (llamadas al LLM en vuelo)
+    "max_queued_turns": 4096,               # Turnos en espera; por encima se responde 503
+    "shutdown_timeout": 30,                 # Segundos para terminar los turnos en curso al apagar
+    "max_message_chars": 4000,
+    "ws_heartbeat_seconds": 20,             # Ping del WebSocket; sin pong se cierra la conexión
+    "ws_send_timeout": 10,                  # Cliente que no lee durante este tiempo se desconecta
+    "ws_max_pending_messages": 8            # Mensajes en cola por conexión antes de rechazar
+}
+
+# Configuración del supervisor multiproceso (worker_supervisor.py)
+SUPERVISOR_CONFIG = {
+    "workers": 0,                           # Procesos de trabajo; 0 = uno por núcleo
+    "worker_base_port": 8100,               # Puerto interno del worker i: worker_base_port + i (en 127.0.0.1)
+    "hash_replicas": 128,                   # Nodos virtuales por worker en el anillo de hash consistente
+    "health_interval": 2.0,                 # Segundos entre comprobaciones de salud
+    "health_timeout": 1.0,
+    "max_health_failures": 3,               # Fallos seguidos antes de reiniciar un worker colgado
+    "restart_backoff": 0.5,                 # Espera inicial antes de reiniciar; se duplica en fallos seguidos
+    "max_restart_backoff": 30.0,
+    "startup_timeout": 60.0,                # Espera máxima a que los workers arranquen
+    # Librerías cargadas una sola vez antes de crear los workers (páginas compartidas copy-on-write)
+    "preload_modules": ["langchain_core.messages", "langchain_openai", "langgraph.graph", "aiohttp.web", "numpy"]
+}
+
 # Configuración de validación
 VALIDATION_CONFIG = {
     "min_order_number_length": 6,
@@ -167,11 +340,21 @@ def get_config() -> Dict[str, Any]:
         "llm": LLM_CONFIG,
         "knowledge_base": KNOWLEDGE_BASE,
         "customer_data": CUSTOMER_DATA,
+        "customer_store": CUSTOMER_STORE_CONFIG,
         "ticket": TICKET_CONFIG,
         "order_statuses": ORDER_STATUSES,
+        "order_store": ORDER_STORE_CONFIG,
         "ui": UI_CONFIG,
         "prompts": SYSTEM_PROMPTS,
         "tools": TOOL_CONFIG,
+        "search": SEARCH_CONFIG,
+        "cache": CACHE_CONFIG,
+        "router": ROUTER_CONFIG,
+        "context": CONTEXT_CONFIG,
+        "summary": SUMMARY_CONFIG,
+        "checkpoint": CHECKPOINT_CONFIG,
+        "server": SERVER_CONFIG,
+        "supervisor": SUPERVISOR_CONFIG,
         "validation": VALIDATION_CONFIG,
         "logging": LOGGING_CONFIG
     }
@@ -0,0 +1,60 @@
+"""
+Ventana de contexto acotada por presupuesto de tokens
+Envía al modelo solo los mensajes más recientes que caben en el presupuesto, sin separar llamadas a herramientas de sus resultados
+"""
+
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from config import CONTEXT_CONFIG
+
+# Un contador recibe una lista de mensajes y devuelve su número estimado de tokens
+TokenCounter = Callable[[Sequence[BaseMessage]], int]
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Estimación local de tokens (caracteres por token más un coste fijo por mensaje)."""
+    return count_tokens_approximately(messages, chars_per_token=CONTEXT_CONFIG["chars_per_token"])
+
+
+def fit_context(messages: Sequence[BaseMessage], max_tokens: Optional[int] = None,
+                token_counter: Optional[TokenCounter] = None) -> List[BaseMessage]:
+    """
+    Devolver la ventana de mensajes que se envía al modelo.
+
+    Conserva los SystemMessage iniciales y, desde el final, tantos bloques
+    completos como quepan en `max_tokens`. Un AIMessage con tool_calls y los
+    ToolMessage que le responden forman un bloque indivisible. El bloque
+    más reciente (la pregunta actual) se incluye siempre. Se recorre la
+    conversación desde el final y se para al agotar el presupuesto, así que
+    el coste por turno no depende de la longitud de la sesión.
+    """
+    max_tokens = CONTEXT_CONFIG["max_context_tokens"] if max_tokens is None else max_tokens
+    token_counter = token_counter or estimate_tokens
+
+    start = 0
+    while start < len(messages) and isinstance(messages[start], SystemMessage):
+        start += 1
+    system_messages = list(messages[:start])
+    budget = max_tokens - (token_counter(system_messages) if system_messages else 0)
+
+    # Recorrer hacia atrás hasta el inicio del bloque, sin agrupar toda la historia
+    window: List[BaseMessage] = []
+    used = 0
+    end = len(messages)
+    while end > start:
+        block_start = end - 1
+        while block_start > start and isinstance(messages[block_start], ToolMessage):
+            block_start -= 1
+        block = list(messages[block_start:end])
+        cost = token_counter(block)
+        if window and used + cost > budget:
+            break
+        window[:0] = block
+        used += cost
+        end = block_start
+
+    return system_messages + window
+
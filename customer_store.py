@@ -0,0 +1,196 @@
+"""
+Repositorio de perfiles de cliente
+Índice por email normalizado, registros compactos con __slots__ y caché LRU acotada de los perfiles más consultados
+Con el backend SQLite los perfiles viven en disco: millones de clientes con memoria residente acotada
+"""
+
+import csv
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+from config import CUSTOMER_STORE_CONFIG
+from support_data import get_support_data
+
+# Columnas de la tabla y de los ficheros de importación (además de "email")
+PROFILE_FIELDS = ("name", "orders", "total_spent", "last_order", "loyalty_tier", "preferences")
+
+# Filas por transacción al importar
+IMPORT_BATCH_SIZE = 10000
+
+
+def normalize_email(email: str) -> str:
+    """Clave de búsqueda: el email sin espacios alrededor y en minúsculas."""
+    return email.strip().lower()
+
+
+class CustomerRecord:
+    """Perfil de cliente compacto: sin __dict__ por instancia."""
+
+    __slots__ = ("email", "name", "orders", "total_spent", "last_order", "loyalty_tier", "preferences")
+
+    def __init__(self, email: str, name: str, orders: int = 0, total_spent: str = "$0.00", last_order: str = "",
+                 loyalty_tier: str = "", preferences: Sequence[str] = ()):
+        self.email = email
+        self.name = name
+        self.orders = int(orders)
+        self.total_spent = total_spent
+        self.last_order = last_order
+        self.loyalty_tier = loyalty_tier
+        self.preferences: Tuple[str, ...] = tuple(preferences)
+
+    @classmethod
+    def from_mapping(cls, email: str, data: Mapping[str, Any]) -> "CustomerRecord":
+        """Crear un registro desde un diccionario de perfil (CUSTOMER_DATA, JSONL o CSV)."""
+        preferences = data.get("preferences") or ()
+        if isinstance(preferences, str):
+            # CSV: lista JSON (["email", "sms"]) o valores separados por comas
+            preferences = json.loads(preferences) if preferences.startswith("[") else \
+                [item for item in preferences.split(",") if item]
+        return cls(email, data.get("name", ""), data.get("orders") or 0, data.get("total_spent", "$0.00"),
+                   data.get("last_order", ""), data.get("loyalty_tier", ""), preferences)
+
+    def as_row(self) -> Tuple[Any, ...]:
+        """Fila para SQLite: clave normalizada, email y campos del perfil."""
+        return (normalize_email(self.email), self.email, self.name, self.orders, self.total_spent,
+                self.last_order, self.loyalty_tier, json.dumps(self.preferences))
+
+
+class CustomerRepository(ABC):
+    """Interfaz de los repositorios de clientes."""
+
+    @abstractmethod
+    def get(self, email: str) -> Optional[CustomerRecord]:
+        """Perfil del cliente con ese email (sin distinguir mayúsculas ni espacios) o None."""
+
+
+class InMemoryCustomerRepository(CustomerRepository):
+    """Perfiles en un diccionario indexado por email normalizado (datos de config.py o SUPPORT_DATA_FILE)."""
+
+    def __init__(self, customers: Mapping[str, Mapping[str, Any]]):
+        self._index: Dict[str, CustomerRecord] = {
+            normalize_email(email): CustomerRecord.from_mapping(email, data) for email, data in customers.items()
+        }
+
+    def get(self, email: str) -> Optional[CustomerRecord]:
+        return self._index.get(normalize_email(email))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class SQLiteCustomerRepository(CustomerRepository):
+    """
+    Perfiles en SQLite con clave primaria por email normalizado.
+
+    Cada búsqueda es un acceso al índice de la clave primaria, así que su
+    coste apenas varía con el número de clientes. En memoria solo se
+    guardan los `cache_size` perfiles usados más recientemente. Los emails
+    que no existen no se recuerdan: el cliente puede darse de alta en otro
+    proceso, y un None en caché lo ocultaría hasta que se expulsara.
+    """
+
+    def __init__(self, path: str, cache_size: int = 10000):
+        self.path = path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, CustomerRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS customers ("
+            "email_key TEXT PRIMARY KEY, email TEXT NOT NULL, name TEXT NOT NULL, orders INTEGER NOT NULL, "
+            "total_spent TEXT NOT NULL, last_order TEXT NOT NULL, loyalty_tier TEXT NOT NULL, "
+            "preferences TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get(self, email: str) -> Optional[CustomerRecord]:
+        key = normalize_email(email)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            row = self._conn.execute(
+                "SELECT email, name, orders, total_spent, last_order, loyalty_tier, preferences "
+                "FROM customers WHERE email_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            record = CustomerRecord(*row[:6], json.loads(row[6]))
+            if self.cache_size > 0:
+                self._cache[key] = record
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return record
+
+    def put_many(self, records: Iterable[CustomerRecord]) -> int:
+        """Guardar (o actualizar) perfiles en transacciones de IMPORT_BATCH_SIZE filas; devuelve cuántos."""
+        count = 0
+        iterator = iter(records)
+        while True:
+            rows = [record.as_row() for record in islice(iterator, IMPORT_BATCH_SIZE)]
+            if not rows:
+                return count
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO customers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+                for row in rows:
+                    self._cache.pop(row[0], None)
+            count += len(rows)
+
+    def import_file(self, path: str) -> int:
+        """Importar perfiles desde un CSV (con cabecera) o un JSONL, leyendo el fichero por tramos."""
+        return self.put_many(read_customer_file(path))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+
+def read_customer_file(path: str) -> Iterator[CustomerRecord]:
+    """
+    Leer perfiles de un fichero sin cargarlo entero en memoria.
+
+    `.csv`: columnas email + PROFILE_FIELDS (preferences como lista JSON
+    o separadas por comas). Cualquier otra extensión se lee como JSONL, un objeto con
+    "email" por línea.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if path.endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield CustomerRecord.from_mapping(row["email"], row)
+
+
+def create_customer_repository(customer_config: Dict[str, Any] = None) -> CustomerRepository:
+    """Crear el repositorio configurado ("memory" o "sqlite")."""
+    customer_config = customer_config or CUSTOMER_STORE_CONFIG
+    if customer_config["backend"] != "sqlite":
+        return InMemoryCustomerRepository(get_support_data().customers)
+    repository = SQLiteCustomerRepository(customer_config["sqlite_path"], customer_config["cache_size"])
+    # Primera ejecución: poblar la tabla desde el fichero configurado
+    if customer_config.get("import_file") and len(repository) == 0:
+        repository.import_file(customer_config["import_file"])
+    return repository
+
+
+_repository: Optional[CustomerRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_customer_repository() -> CustomerRepository:
+    """Obtener el repositorio de clientes compartido, creándolo la primera vez."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = create_customer_repository()
+    return _repository
@@ -4,24 +4,35 @@ Usando GPT-4o-mini con LangGraph 0.5.x y mejor manejo de respuestas
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence, List, Dict, Any
+from typing import TypedDict, Annotated, List, Dict, Any
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
 from langchain.tools import tool
+from agent_factory import get_agent_runnable
+from checkpointing import get_checkpointer, resume_state, thread_config
+from context_window import fit_context
+from intent_router import get_faq_router, needs_model
+from message_state import append_messages, last_reply, turn_input
+from ticket_store import create_ticket
+from tool_executor import count_tool_usage, execute_tool_calls
+from tool_registry import ToolRegistry
+from knowledge_base import clamp_top_k, format_results, get_knowledge_base_index
+from semantic_search import get_embedding_index
+from customer_store import get_customer_repository
+from order_store import describe_order_statuses, get_order_backend
+from support_data import get_support_data
 import json
 import logging
+import uuid
 
 # Importar configuración
 from config import (
     get_config, 
     get_environment_config,
-    KNOWLEDGE_BASE,
-    CUSTOMER_DATA,
     TICKET_CONFIG,
-    ORDER_STATUSES,
     SYSTEM_PROMPTS,
     VALIDATION_CONFIG
 )
@@ -39,7 +50,8 @@ logger = logging.getLogger(__name__)
 
 # Definir el estado del agente
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], "The messages in the conversation"]
+    messages: Annotated[List[BaseMessage], append_messages]
+    last_ai_message: AIMessage
     customer_info: dict
     conversation_summary: str
     tool_usage_count: dict
@@ -59,21 +71,28 @@ llm = ChatOpenAI(
 
 # Definir herramientas usando configuración
 @tool
-def search_knowledge_base(query: str) -> str:
-    """Search the knowledge base for relevant information about products and services."""
-    query_lower = query.lower()
+def search_knowledge_base(query: str, top_k: int = None) -> str:
+    """Search the knowledge base for relevant information about products and services. Returns up to top_k passages, most relevant first."""
+    # Buscar con BM25 en el índice invertido (construido una vez por proceso)
+    results = get_knowledge_base_index().search(
+        query,
+        top_k=clamp_top_k(top_k),
+        min_relative_score=config["search"]["min_relative_score"]
+    )
+    if results:
+        logger.info(f"Knowledge base search: '{query}' -> found {[result.topic for result in results]}")
+        return format_results(results)
     
-    # Buscar coincidencias exactas
-    for key, value in KNOWLEDGE_BASE.items():
-        if key in query_lower:
-            logger.info(f"Knowledge base search: '{query}' -> found '{key}'")
-            return value
-    
-    # Buscar coincidencias parciales
-    for key, value in KNOWLEDGE_BASE.items():
-        if any(word in query_lower for word in key.split()):
-            logger.info(f"Knowledge base search: '{query}' -> partial match '{key}'")
-            return value
+    # Sin coincidencias de términos: buscar paráfrasis por similitud de embeddings
+    if config["search"]["semantic_fallback"]:
+        results = get_embedding_index().search(
+            query,
+            top_k=clamp_top_k(top_k),
+            min_score=config["search"]["semantic_min_score"]
+        )
+        if results:
+            logger.info(f"Knowledge base search: '{query}' -> semantic match {[result.topic for result in results]}")
+            return format_results(results)
     
     logger.warning(f"Knowledge base search: '{query}' -> no matches found")
     return "I couldn't find specific information about that topic. Please contact our support team for assistance."
@@ -88,7 +107,8 @@ def create_support_ticket(issue: str, customer_email: str, priority: str = None)
         priority = TICKET_CONFIG["default_priority"]
     
     response_time = TICKET_CONFIG["priority_levels"][priority]
-    ticket_id = f"{TICKET_CONFIG['ticket_prefix']}-{len(issue) + len(customer_email)}"
+    # ID único y ordenado en el tiempo; el ticket se guarda en segundo plano
+    ticket_id = create_ticket(issue, customer_email, priority)
     
     logger.info(f"Support ticket created: {ticket_id} with priority {priority}")
     
@@ -101,48 +121,42 @@ def check_order_status(order_number: str) -> str:
         logger.warning(f"Invalid order number: '{order_number}'")
         return f"Invalid order number. Please provide a valid order number (minimum {VALIDATION_CONFIG['min_order_number_length']} characters)."
     
-    # Determinar estado basado en el hash del número de pedido
-    status_key = list(ORDER_STATUSES.keys())[hash(order_number) % len(ORDER_STATUSES)]
-    status_message = ORDER_STATUSES[status_key]
+    # Consultar el backend de pedidos (determinista en todos los procesos; estados precargados)
+    status_key = get_order_backend().get_status(order_number)
+    if status_key is None:
+        logger.warning(f"Order not found: '{order_number}'")
+        return f"Order {order_number} was not found. Please verify the order number."
+    status_message = get_support_data().order_statuses.get(status_key, f"Current status: {status_key}.")
     
     logger.info(f"Order status checked: {order_number} -> {status_key}")
     
     return f"Order {order_number}: {status_message}"
 
+@tool
+def check_order_statuses(order_numbers: List[str]) -> str:
+    """Check the status of several orders at once. Use it instead of calling check_order_status once per order."""
+    # Una sola consulta al backend de pedidos y un único ToolMessage para todos los pedidos
+    result = describe_order_statuses(order_numbers, VALIDATION_CONFIG["min_order_number_length"])
+    logger.info(f"Order statuses checked: {len(order_numbers)} orders in one lookup")
+    return result
+
 @tool
 def get_customer_info(customer_email: str) -> str:
     """Retrieve customer information and order history."""
-    if customer_email in CUSTOMER_DATA:
-        data = CUSTOMER_DATA[customer_email]
+    # Búsqueda por email normalizado en el repositorio de clientes
+    customer = get_customer_repository().get(customer_email)
+    if customer is not None:
         logger.info(f"Customer info retrieved: {customer_email}")
         
-        return (f"Customer: {data['name']}, Orders: {data['orders']}, "
-                f"Total Spent: {data['total_spent']}, Last Order: {data['last_order']}, "
-                f"Loyalty Tier: {data['loyalty_tier']}")
+        return (f"Customer: {customer.name}, Orders: {customer.orders}, "
+                f"Total Spent: {customer.total_spent}, Last Order: {customer.last_order}, "
+                f"Loyalty Tier: {customer.loyalty_tier}")
     else:
         logger.warning(f"Customer not found: {customer_email}")
         return f"No customer record found for {customer_email}. Please verify the email address."
 
-# Crear lista de herramientas
-tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
-
-# Definir nodo principal del agente
-def call_model(state: AgentState) -> AgentState:
-    """Call the LLM to generate a response."""
-    messages = state["messages"]
-    
-    # Verificar si el usuario quiere salir
-    last_message = messages[-1]
-    if isinstance(last_message, HumanMessage):
-        content = last_message.content.lower()
-        exit_commands = config["ui"]["exit_commands"]
-        if any(phrase in content for phrase in exit_commands):
-            logger.info("Conversation ending - user requested exit")
-            return {"conversation_summary": "User requested to end the conversation."}
-    
-    # Crear template de prompt optimizado para GPT-4o-mini
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a helpful and professional customer support agent for an e-commerce company. 
+# Prompt del sistema del agente (se construye una vez por proceso)
+AGENT_SYSTEM_PROMPT = """You are a helpful and professional customer support agent for an e-commerce company. 
 
 Your capabilities:
 - Answer questions about products, services, policies, and procedures
@@ -161,110 +175,112 @@ Guidelines:
 Available tools:
 - search_knowledge_base: For policy and general information
 - check_order_status: To check order status with order number
+- check_order_statuses: To check several orders at once (one call with all the order numbers)
 - create_support_ticket: For complex issues requiring human help
 - get_customer_info: To retrieve customer data with email
 
-Use tools when appropriate to provide accurate information. Always provide a helpful response after using tools."""),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+Use tools when appropriate to provide accurate information. Always provide a helpful response after using tools."""
+
+# Prompt de respuesta final tras usar herramientas (se construye una vez por proceso)
+FINAL_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a customer support agent. Based on the tool results, provide a helpful and complete response to the user's question. Be informative and professional."),
+    ("user", "User question: {question}\n\nTool results:\n{tool_results}\n\nPlease provide a complete and helpful response.")
+])
+final_response_chain = FINAL_RESPONSE_PROMPT | llm
+
+# Crear lista de herramientas
+tools = [search_knowledge_base, create_support_ticket, check_order_status, check_order_statuses, get_customer_info]
+
+# Registrar herramientas para despacho O(1) por nombre
+tool_registry = ToolRegistry(tools)
+
+# Definir nodo principal del agente
+def call_model(state: AgentState) -> AgentState:
+    """Call the LLM to generate a response."""
+    messages = state["messages"]
+    
+    # Verificar si el usuario quiere salir
+    last_message = messages[-1]
+    if isinstance(last_message, HumanMessage):
+        content = last_message.content.lower()
+        exit_commands = config["ui"]["exit_commands"]
+        if any(phrase in content for phrase in exit_commands):
+            logger.info("Conversation ending - user requested exit")
+            return {"conversation_summary": "User requested to end the conversation."}
     
-    # Crear agente con herramientas
-    agent = prompt | llm.bind_tools(tools)
+    # Obtener agente con herramientas (prompt y bind_tools cacheados por proceso)
+    agent = get_agent_runnable(llm, tools, AGENT_SYSTEM_PROMPT)
     
     # Obtener respuesta
     response = agent.invoke({
-        "messages": messages,
+        "messages": fit_context(messages),
         "agent_scratchpad": []
     })
     
-    # Agregar respuesta a los mensajes
-    new_messages = list(messages) + [response]
+    # Solo los mensajes nuevos: el reductor los añade a la historia
+    new_messages = [response]
+    tool_usage_count = dict(state.get("tool_usage_count") or {})
     
     logger.info(f"LLM response generated for message: {messages[-1].content[:50]}...")
     
     # Si hay llamadas a herramientas, ejecutarlas y generar respuesta final
     if hasattr(response, 'tool_calls') and response.tool_calls:
+        # Ejecutar las herramientas concurrentemente, conservando el orden de las llamadas
+        tool_messages = execute_tool_calls(response.tool_calls, tool_registry)
+        new_messages.extend(tool_messages)
+        
         tool_results = []
-        for tool_call in response.tool_calls:
+        succeeded = []
+        for tool_call, tool_message in zip(response.tool_calls, tool_messages):
             tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            
-            logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-            
-            # Encontrar y ejecutar la herramienta
-            tool_func = None
-            for tool in tools:
-                if tool.name == tool_name:
-                    tool_func = tool
-                    break
+            if tool_message.status == "error":
+                tool_results.append(tool_message.content)
+                continue
             
-            if tool_func:
-                try:
-                    result = tool_func.invoke(tool_args)
-                    tool_results.append(f"Tool {tool_name} result: {result}")
-                    
-                    # Agregar resultado de herramienta a mensajes
-                    new_messages.append(ToolMessage(
-                        content=str(result),
-                        tool_call_id=tool_call["id"]
-                    ))
-                    
-                    # Actualizar contador de uso de herramientas
-                    if "tool_usage_count" not in state:
-                        state["tool_usage_count"] = {}
-                    state["tool_usage_count"][tool_name] = state["tool_usage_count"].get(tool_name, 0) + 1
-                    
-                except Exception as e:
-                    logger.error(f"Error executing tool {tool_name}: {e}")
-                    error_msg = f"Error executing {tool_name}: {str(e)}"
-                    tool_results.append(error_msg)
-                    new_messages.append(ToolMessage(
-                        content=error_msg,
-                        tool_call_id=tool_call["id"]
-                    ))
-            else:
-                logger.error(f"Tool {tool_name} not found")
-                error_msg = f"Tool {tool_name} not found"
-                tool_results.append(error_msg)
-                new_messages.append(ToolMessage(
-                    content=error_msg,
-                    tool_call_id=tool_call["id"]
-                ))
+            tool_results.append(f"Tool {tool_name} result: {tool_message.content}")
+            succeeded.append(tool_call)
+        
+        # Actualizar contador de uso de herramientas (solo las que terminaron bien)
+        tool_usage_count = count_tool_usage(succeeded, tool_usage_count)
         
         # Generar respuesta final basada en los resultados de las herramientas
         if tool_results:
-            final_prompt = ChatPromptTemplate.from_messages([
-                ("system", "You are a customer support agent. Based on the tool results, provide a helpful and complete response to the user's question. Be informative and professional."),
-                ("user", f"User question: {messages[-1].content}\n\nTool results:\n" + "\n".join(tool_results) + "\n\nPlease provide a complete and helpful response.")
-            ])
-            
-            final_response = final_prompt | llm
-            final_result = final_response.invoke({})
+            final_result = final_response_chain.invoke({
+                "question": messages[-1].content,
+                "tool_results": "\n".join(tool_results)
+            })
             
             # Agregar respuesta final
-            new_messages.append(AIMessage(content=final_result.content))
+            response = AIMessage(content=final_result.content)
+            new_messages.append(response)
     
-    return {"messages": new_messages}
+    return {"messages": new_messages, "last_ai_message": response, "tool_usage_count": tool_usage_count}
 
 # Crear workflow simplificado
 workflow = StateGraph(AgentState)
 
+# Enrutador de preguntas frecuentes antes del LLM
+faq_router = get_faq_router()
+workflow.add_node("router", faq_router.route)
+
 # Agregar nodo principal
-workflow.add_node("agent", call_model)
+workflow.add_node("agent", faq_router.timed(call_model))
 
 # Definir punto de entrada
-workflow.set_entry_point("agent")
+workflow.set_entry_point("router")
+
+# Pasar al agente solo si el enrutador no respondió
+workflow.add_conditional_edges("router", needs_model, {"agent": "agent", END: END})
 
 # Agregar edge directo al final
 workflow.add_edge("agent", END)
 
-# Compilar grafo
-app = workflow.compile()
+# Compilar grafo con checkpoints por thread_id (cualquier proceso puede reanudar la conversación)
+app = workflow.compile(checkpointer=get_checkpointer())
 
 # Función para ejecutar el chatbot
-def run_chatbot():
-    """Ejecutar el chatbot de soporte al cliente mejorado."""
+def run_chatbot(session_id: str = None):
+    """Ejecutar el chatbot de soporte al cliente mejorado; con `session_id` se reanuda esa conversación."""
     print(f"{config['ui']['welcome_message']} (Versión Mejorada - GPT-4o-mini + LangGraph 0.5.x)")
     print("Type 'quit' to exit")
     print("=" * 60)
@@ -277,8 +293,12 @@ def run_chatbot():
     print("• Customer information")
     print("=" * 60)
     
-    # Inicializar estado
-    state = {
+    # Identificador de la sesión: thread_id de los checkpoints
+    session_id = session_id or uuid.uuid4().hex
+    thread = thread_config(session_id)
+
+    # Inicializar estado (o recuperar el último checkpoint de la sesión)
+    state = resume_state(app, session_id) or {
         "messages": [],
         "customer_info": {},
         "conversation_summary": "",
@@ -298,21 +318,20 @@ def run_chatbot():
         
         if user_input.lower() in config["ui"]["exit_commands"]:
             print("🤖 Thank you for using our customer support! Goodbye!")
+            logger.info(f"FAQ router stats: {faq_router.stats()}")
             break
         
-        # Agregar mensaje del usuario al estado
-        state["messages"].append(HumanMessage(content=user_input))
+        # Entrada del turno: solo el mensaje nuevo (el reductor lo añade a la historia)
+        turn = turn_input(app, state, [HumanMessage(content=user_input)])
         conversation_length += 1
         
         try:
             # Ejecutar workflow
-            result = app.invoke(state)
+            result = app.invoke(turn, thread)
             
-            # Obtener último mensaje del asistente
-            ai_messages = [msg for msg in result["messages"] if isinstance(msg, AIMessage)]
-            if ai_messages:
-                last_ai_message = ai_messages[-1]
-                print(f"🤖 Assistant: {last_ai_message.content}")
+            # Último mensaje del asistente, guardado en el estado sin recorrer la historia
+            if result.get("last_ai_message") is not None:
+                print(f"🤖 Assistant: {last_reply(result)}")
             
             # Mostrar uso de herramientas si está habilitado
             if config["ui"]["show_tool_usage"] and result.get("tool_usage_count"):
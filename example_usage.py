@@ -7,6 +7,7 @@ import os
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
 from advanced_customer_support import app
+from message_state import last_reply, turn_input
 
 # Cargar variables de entorno
 load_dotenv()
@@ -43,18 +44,16 @@ def test_conversation():
         print(f"\n--- Test Case {i} ---")
         print(f"👤 Usuario: {user_input}")
         
-        # Agregar mensaje del usuario
-        state["messages"].append(HumanMessage(content=user_input))
+        # Agregar mensaje del usuario a la entrada del turno
+        turn = turn_input(app, state, [HumanMessage(content=user_input)])
         
         try:
             # Ejecutar el workflow
-            result = app.invoke(state)
+            result = app.invoke(turn)
             
-            # Obtener la respuesta del asistente
-            ai_messages = [msg for msg in result["messages"] if hasattr(msg, 'content') and msg.content]
-            if ai_messages:
-                last_ai_message = ai_messages[-1]
-                print(f"🤖 Asistente: {last_ai_message.content}")
+            # Obtener la respuesta del asistente (guardada en el estado, sin recorrer la historia)
+            if last_reply(result):
+                print(f"🤖 Asistente: {last_reply(result)}")
             
             # Actualizar estado para la siguiente iteración
             state = result
@@ -114,9 +113,8 @@ def test_specific_scenarios():
             result = app.invoke(state)
             
             # Obtener respuesta
-            ai_messages = [msg for msg in result["messages"] if hasattr(msg, 'content') and msg.content]
-            if ai_messages:
-                response = ai_messages[-1].content.lower()
+            response = last_reply(result).lower()
+            if response:
                 print(f"Respuesta: {response}")
                 
                 # Verificar palabras clave esperadas
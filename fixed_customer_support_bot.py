@@ -5,13 +5,22 @@ Updated for LangGraph 0.5.x and GPT-4o-mini
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence
+from typing import TypedDict, Annotated, List
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
 from langchain.tools import tool
+from agent_factory import get_agent_runnable
+from context_window import fit_context
+from message_state import append_messages, last_reply, turn_input
+from ticket_store import create_ticket
+from tool_executor import execute_tool_calls
+from tool_registry import ToolRegistry
+from knowledge_base import get_knowledge_base_index
+from customer_store import get_customer_repository
+from order_store import get_order_backend
+from support_data import get_support_data
 import json
 
 # Load environment variables
@@ -19,7 +28,8 @@ load_dotenv()
 
 # Define the state schema
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], "The messages in the conversation"]
+    messages: Annotated[List[BaseMessage], append_messages]
+    last_ai_message: AIMessage
     next: str
 
 # Initialize the LLM with correct configuration
@@ -34,45 +44,19 @@ llm = ChatOpenAI(
 @tool
 def search_knowledge_base(query: str) -> str:
     """Search the knowledge base for relevant information about products and services."""
-    # Simulated knowledge base - in a real implementation, this would connect to a database
-    knowledge_base = {
-        "return policy": "Our return policy allows returns within 30 days of purchase with original receipt. Items must be in original condition.",
-        "shipping": "Standard shipping takes 3-5 business days. Express shipping (1-2 days) is available for $15.99. Free shipping on orders over $50.",
-        "warranty": "All products come with a 1-year manufacturer warranty. Extended warranties are available for purchase.",
-        "payment": "We accept all major credit cards, PayPal, Apple Pay, and Google Pay. Payment plans available for orders over $200.",
-        "account": "You can create an account on our website to track orders, save payment information, and access exclusive deals.",
-        "refund": "Refunds are processed within 5-7 business days after we receive your return. You'll receive an email confirmation.",
-        "tracking": "You can track your order using the tracking number provided in your confirmation email or in your account dashboard.",
-        "contact": "You can reach our customer service team at support@company.com or call 1-800-123-4567. Live chat available 24/7.",
-        "hours": "Our customer service is available Monday-Friday 8AM-8PM EST, Saturday 9AM-6PM EST, and Sunday 10AM-6PM EST.",
-        "cancellation": "You can cancel your order within 1 hour of placing it. After that, contact customer service immediately.",
-        "delivery": "We offer standard delivery (3-5 days), express delivery (1-2 days), and same-day delivery in select areas.",
-        "international": "We ship to most countries. International shipping takes 7-14 business days and may incur additional fees.",
-        "damaged": "If you receive a damaged item, please take photos and contact us within 48 hours. We'll arrange a replacement or refund.",
-        "size guide": "Our size guide is available on each product page. If you're unsure about sizing, we recommend ordering multiple sizes.",
-        "gift cards": "Gift cards are available in denominations from $10 to $500. They never expire and can be used for any purchase."
-    }
-    
-    query_lower = query.lower()
-    for key, value in knowledge_base.items():
-        if key in query_lower:
-            return value
+    # Shared index built once per process from the preloaded knowledge base
+    results = get_knowledge_base_index().search(query, top_k=1)
+    if results:
+        return results[0].article
     
     return "I couldn't find specific information about that topic. Please contact our support team for assistance."
 
 @tool
 def create_support_ticket(issue: str, customer_email: str, priority: str = "medium") -> str:
     """Create a support ticket for complex issues that require human intervention."""
-    # Simulated ticket creation
-    priority_levels = {
-        "low": "24-48 hours",
-        "medium": "12-24 hours", 
-        "high": "4-8 hours",
-        "urgent": "1-2 hours"
-    }
-    
-    response_time = priority_levels.get(priority, "12-24 hours")
-    ticket_id = f"TICKET-{len(issue) + len(customer_email)}"
+    response_time = get_support_data().priority_levels.get(priority, "12-24 hours")
+    # Unique, time-ordered ID; the ticket is persisted in the background
+    ticket_id = create_ticket(issue, customer_email, priority)
     return f"Support ticket {ticket_id} has been created with {priority} priority. A representative will contact you at {customer_email} within {response_time}."
 
 @tool
@@ -82,73 +66,28 @@ def check_order_status(order_number: str) -> str:
     if not order_number or len(order_number) < 6:
         return "Invalid order number. Please provide a valid order number (minimum 6 characters)."
     
-    # Simulate different order statuses based on order number
-    statuses = {
-        "processing": "Your order is being processed and will ship within 2-3 business days.",
-        "shipped": "Your order has been shipped! You should receive a tracking number shortly.",
-        "delivered": "Your order has been delivered. Please check your doorstep or mailbox.",
-        "returned": "Your order has been returned and a refund is being processed.",
-        "cancelled": "Your order has been cancelled. If you were charged, a refund will be processed within 5-7 business days."
-    }
-    
-    # Determine status based on order number hash
-    status_key = list(statuses.keys())[hash(order_number) % len(statuses)]
-    return f"Order {order_number}: {statuses[status_key]}"
+    # Look up the order backend (deterministic across processes; statuses are preloaded once)
+    status_key = get_order_backend().get_status(order_number)
+    if status_key is None:
+        return f"Order {order_number} was not found. Please verify the order number."
+    status_message = get_support_data().order_statuses.get(status_key, f"Current status: {status_key}.")
+    return f"Order {order_number}: {status_message}"
 
 @tool
 def get_customer_info(customer_email: str) -> str:
     """Retrieve customer information and order history."""
-    # Simulated customer data
-    customer_data = {
-        "john@example.com": {
-            "name": "John Smith",
-            "orders": 5,
-            "total_spent": "$450.00",
-            "last_order": "2024-01-15",
-            "loyalty_tier": "silver"
-        },
-        "jane@example.com": {
-            "name": "Jane Doe", 
-            "orders": 12,
-            "total_spent": "$1,200.00",
-            "last_order": "2024-01-20",
-            "loyalty_tier": "gold"
-        },
-        "mike@example.com": {
-            "name": "Mike Johnson",
-            "orders": 2,
-            "total_spent": "$150.00",
-            "last_order": "2024-01-10",
-            "loyalty_tier": "bronze"
-        }
-    }
+    # Customer repository lookup by normalized email
+    customer = get_customer_repository().get(customer_email)
     
-    if customer_email in customer_data:
-        data = customer_data[customer_email]
-        return (f"Customer: {data['name']}, Orders: {data['orders']}, "
-                f"Total Spent: {data['total_spent']}, Last Order: {data['last_order']}, "
-                f"Loyalty Tier: {data['loyalty_tier']}")
+    if customer is not None:
+        return (f"Customer: {customer.name}, Orders: {customer.orders}, "
+                f"Total Spent: {customer.total_spent}, Last Order: {customer.last_order}, "
+                f"Loyalty Tier: {customer.loyalty_tier}")
     else:
         return f"No customer record found for {customer_email}. Please verify the email address."
 
-# Create list of tools
-tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
-
-# Define the agent node
-def call_model(state: AgentState) -> AgentState:
-    """Call the LLM to generate a response."""
-    messages = state["messages"]
-    
-    # Check if user wants to exit
-    last_message = messages[-1]
-    if isinstance(last_message, HumanMessage):
-        content = last_message.content.lower()
-        if any(phrase in content for phrase in ["goodbye", "bye", "end", "stop", "thank you", "thanks", "quit", "exit"]):
-            return {"messages": messages}
-    
-    # Create the prompt template
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a helpful and professional customer support agent for an e-commerce company. 
+# System prompt for the agent (built once per process)
+AGENT_SYSTEM_PROMPT = """You are a helpful and professional customer support agent for an e-commerce company. 
         
         Your capabilities:
         - Answer questions about products, services, policies, and procedures
@@ -170,56 +109,43 @@ def call_model(state: AgentState) -> AgentState:
         - create_support_ticket: For complex issues requiring human help
         - get_customer_info: To retrieve customer data with email
         
-        Use tools when appropriate to provide accurate information."""),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+        Use tools when appropriate to provide accurate information."""
+
+# Create list of tools
+tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
+
+# Register tools for O(1) dispatch by name
+tool_registry = ToolRegistry(tools)
+
+# Define the agent node
+def call_model(state: AgentState) -> AgentState:
+    """Call the LLM to generate a response."""
+    messages = state["messages"]
     
-    # Create agent with tools
-    agent = prompt | llm.bind_tools(tools)
+    # Check if user wants to exit
+    last_message = messages[-1]
+    if isinstance(last_message, HumanMessage):
+        content = last_message.content.lower()
+        if any(phrase in content for phrase in ["goodbye", "bye", "end", "stop", "thank you", "thanks", "quit", "exit"]):
+            return {"last_ai_message": None}
+    
+    # Get the agent with tools (prompt and bind_tools cached per process)
+    agent = get_agent_runnable(llm, tools, AGENT_SYSTEM_PROMPT)
     
     # Get response
     response = agent.invoke({
-        "messages": messages,
+        "messages": fit_context(messages),
         "agent_scratchpad": []
     })
     
-    # Add response to messages
-    new_messages = list(messages) + [response]
+    # Only the new messages are returned; the reducer appends them to the history
+    new_messages = [response]
     
-    # If there are tool calls, execute them
+    # If there are tool calls, execute them concurrently
     if hasattr(response, 'tool_calls') and response.tool_calls:
-        for tool_call in response.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            
-            # Find and execute the tool
-            tool_func = None
-            for tool in tools:
-                if tool.name == tool_name:
-                    tool_func = tool
-                    break
-            
-            if tool_func:
-                try:
-                    result = tool_func.invoke(tool_args)
-                    # Add tool result to messages
-                    new_messages.append(ToolMessage(
-                        content=str(result),
-                        tool_call_id=tool_call["id"]
-                    ))
-                except Exception as e:
-                    new_messages.append(ToolMessage(
-                        content=f"Error executing {tool_name}: {str(e)}",
-                        tool_call_id=tool_call["id"]
-                    ))
-            else:
-                new_messages.append(ToolMessage(
-                    content=f"Tool {tool_name} not found",
-                    tool_call_id=tool_call["id"]
-                ))
+        new_messages.extend(execute_tool_calls(response.tool_calls, tool_registry))
     
-    return {"messages": new_messages}
+    return {"messages": new_messages, "last_ai_message": response}
 
 # Create workflow
 workflow = StateGraph(AgentState)
@@ -265,18 +191,16 @@ def run_chatbot():
             print("🤖 Thank you for using our customer support! Goodbye!")
             break
         
-        # Add user message to state
-        state["messages"].append(HumanMessage(content=user_input))
+        # Add user message to the turn input
+        turn = turn_input(app, state, [HumanMessage(content=user_input)])
         
         try:
             # Execute workflow
-            result = app.invoke(state)
+            result = app.invoke(turn)
             
-            # Get last AI message
-            ai_messages = [msg for msg in result["messages"] if isinstance(msg, AIMessage)]
-            if ai_messages:
-                last_ai_message = ai_messages[-1]
-                print(f"🤖 Assistant: {last_ai_message.content}")
+            # The last reply is kept in the state, no need to scan the history
+            if result.get("last_ai_message") is not None:
+                print(f"🤖 Assistant: {last_reply(result)}")
             
             # Update state for next iteration
             state = result
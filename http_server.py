@@ -0,0 +1,274 @@
+"""
+Servidor HTTP asíncrono del chatbot de soporte
+Expone el grafo asíncrono con POST /sessions/{id}/messages y respuestas en streaming (server-sent events)
+Cada sesión es un thread del checkpointer: miles de sesiones por proceso comparten un único event loop
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from langchain_core.messages import HumanMessage
+
+from async_customer_support import app, env_config, faq_router, logger, new_session_state, summary_queue
+from checkpointing import aresume_state, thread_config
+from config import SERVER_CONFIG
+from message_state import last_reply, turn_input
+from streaming import astream_turn
+from tool_executor import get_tool_memo
+
+
+# Mensaje de los errores inesperados: el detalle solo va al log, no al cliente
+INTERNAL_ERROR = "internal server error"
+
+
+class ServerBusyError(Exception):
+    """Hay demasiados turnos en espera (o el servidor se está apagando)."""
+
+
+class SessionPool:
+    """
+    Bloqueos por sesión y límite de turnos concurrentes.
+
+    Los turnos de una misma sesión se ejecutan en orden (el checkpoint de
+    un turno es la entrada del siguiente); los de sesiones distintas en
+    paralelo, hasta `max_concurrent`. Los bloqueos solo existen mientras
+    la sesión tiene turnos pendientes, así que la memoria no crece con el
+    número de sesiones atendidas.
+    """
+
+    def __init__(self, max_concurrent: int = 256, max_queued: int = 4096):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # session_id -> [lock, turnos que lo usan]
+        self._locks: Dict[str, List[Any]] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.closing = False
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        """Reservar el turno de una sesión; lanza ServerBusyError si no se admite."""
+        if self.closing or self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise ServerBusyError("server is shutting down" if self.closing else "too many queued turns")
+
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        self.waiting += 1
+        queued = True
+        self._idle.clear()
+        try:
+            async with entry[0], self._semaphore:
+                self.waiting -= 1
+                queued = False
+                self.active += 1
+                try:
+                    yield
+                finally:
+                    self.active -= 1
+                    self.completed += 1
+        finally:
+            if queued:
+                self.waiting -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+            if self.active == 0 and self.waiting == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Dejar de admitir turnos y esperar a los que están en curso; False si vence el plazo."""
+        self.closing = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del pool para /health."""
+        return {
+            "active_turns": self.active,
+            "queued_turns": self.waiting,
+            "sessions_in_flight": len(self._locks),
+            "completed_turns": self.completed,
+            "rejected_turns": self.rejected,
+            "max_concurrent_turns": self.max_concurrent,
+        }
+
+
+def _json_error(status: int, message: str, **headers) -> web.Response:
+    return web.json_response({"error": message}, status=status, headers=headers or None)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Codificar un server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _wants_stream(request: web.Request) -> bool:
+    return "text/event-stream" in request.headers.get("Accept", "") or \
+        request.query.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def reply_payload(session_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "reply": last_reply(state),
+        "tool_usage_count": state.get("tool_usage_count") or {},
+    }
+
+
+async def _read_message(request: web.Request, max_chars: int) -> str:
+    """Extraer y validar el mensaje del cuerpo JSON ({"message": "..."})."""
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}), content_type="application/json")
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        raise web.HTTPBadRequest(text=json.dumps({"error": "'message' must be a non-empty string"}),
+                                 content_type="application/json")
+    if len(message) > max_chars:
+        raise web.HTTPRequestEntityTooLarge(max_size=max_chars, actual_size=len(message))
+    return message.strip()
+
+
+def session_turn_input(graph, message: str) -> Dict[str, Any]:
+    """Entrada del turno: solo el mensaje del usuario; el estado de la sesión ya está en su checkpoint."""
+    return turn_input(graph, new_session_state(), [HumanMessage(content=message)])
+
+
+async def post_message(request: web.Request) -> web.StreamResponse:
+    """POST /sessions/{id}/messages: procesar un turno; JSON o SSE según Accept / ?stream=1."""
+    server = request.app["support"]
+    session_id = request.match_info["session_id"]
+    message = await _read_message(request, server["config"]["max_message_chars"])
+    graph = server["graph"]
+
+    try:
+        async with server["pool"].turn(session_id):
+            turn_state = session_turn_input(graph, message)
+            if not _wants_stream(request):
+                result = await graph.ainvoke(turn_state, thread_config(session_id))
+                return web.json_response(reply_payload(session_id, result))
+
+            response = web.StreamResponse(headers={
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            })
+            await response.prepare(request)
+            try:
+                async for kind, payload in astream_turn(graph, turn_state, config=thread_config(session_id)):
+                    if kind == "token":
+                        await response.write(_sse("token", {"delta": payload}))
+                    elif kind == "progress":
+                        await response.write(_sse("progress", payload))
+                    else:
+                        await response.write(_sse("done", reply_payload(session_id, payload)))
+            except ConnectionResetError:
+                # El cliente se desconectó: se abandona el turno y se libera el bloqueo de la sesión
+                logger.info(f"Client disconnected while streaming session {session_id}")
+                return response
+            except Exception as e:
+                logger.error(f"Error streaming session {session_id}: {str(e)}")
+                await response.write(_sse("error", {"error": INTERNAL_ERROR}))
+            await response.write_eof()
+            return response
+    except ServerBusyError as e:
+        return _json_error(503, str(e), **{"Retry-After": "1"})
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in session {session_id}: {str(e)}")
+        return _json_error(500, INTERNAL_ERROR)
+
+
+async def end_session(request: web.Request) -> web.Response:
+    """DELETE /sessions/{id}: cerrar la sesión y encolar su resumen (el checkpoint se conserva)."""
+    server = request.app["support"]
+    session_id = request.match_info["session_id"]
+    try:
+        async with server["pool"].turn(session_id):
+            state = await aresume_state(server["graph"], session_id)
+    except ServerBusyError as e:
+        return _json_error(503, str(e), **{"Retry-After": "1"})
+    if not state or not state.get("messages"):
+        return _json_error(404, f"unknown session {session_id}")
+    summary_queue.submit(session_id, state)
+    get_tool_memo().clear(session_id)
+    logger.info(f"Summary queued for session {session_id} (pending: {len(summary_queue)})")
+    return web.json_response({"session_id": session_id, "summary_queued": True}, status=202)
+
+
+async def health(request: web.Request) -> web.Response:
+    """GET /health: estado del servidor y carga actual."""
+    pool = request.app["support"]["pool"]
+    status = "draining" if pool.closing else "ok"
+    return web.json_response({"status": status, **pool.stats()}, status=503 if pool.closing else 200)
+
+
+async def _on_shutdown(web_app: web.Application) -> None:
+    """Apagado ordenado: rechazar turnos nuevos y esperar a los que están en curso."""
+    server = web_app["support"]
+    timeout = server["config"]["shutdown_timeout"]
+    logger.info(f"Shutting down: draining {server['pool'].active + server['pool'].waiting} turns")
+    if not await server["pool"].drain(timeout):
+        logger.warning(f"Shutdown timeout ({timeout}s) reached with turns still running")
+    logger.info(f"HTTP server stopped. Pool: {server['pool'].stats()} FAQ router: {faq_router.stats()}")
+
+
+def create_web_app(graph=None, server_config: Optional[Dict[str, Any]] = None) -> web.Application:
+    """
+    Crear la aplicación aiohttp que expone el grafo.
+
+    `graph` es el grafo compilado (por defecto el de la versión asíncrona);
+    debe tener checkpointer, porque la sesión se guarda en su thread_id.
+    """
+    graph = graph if graph is not None else app
+    if graph.checkpointer is None:
+        raise ValueError("The HTTP server needs a graph compiled with a checkpointer (CHECKPOINT_CONFIG['enabled'])")
+    cfg = dict(SERVER_CONFIG, **(server_config or {}))
+
+    web_app = web.Application(client_max_size=max(cfg["max_message_chars"] * 4 + 1024, 1024 ** 2))
+    web_app["support"] = {
+        "graph": graph,
+        "config": cfg,
+        "pool": SessionPool(cfg["max_concurrent_turns"], cfg["max_queued_turns"]),
+    }
+    web_app.router.add_post("/sessions/{session_id}/messages", post_message)
+    web_app.router.add_delete("/sessions/{session_id}", end_session)
+    web_app.router.add_get("/health", health)
+    web_app.on_shutdown.append(_on_shutdown)
+    return web_app
+
+
+def run_server(host: Optional[str] = None, port: Optional[int] = None,
+               web_app: Optional[web.Application] = None) -> None:
+    """Arrancar el servidor (por defecto create_web_app()); SIGINT/SIGTERM lo apagan de forma ordenada."""
+    web_app = web_app if web_app is not None else create_web_app()
+    cfg = web_app["support"]["config"]
+    host = host or cfg["host"]
+    port = port or cfg["port"]
+    logger.info(f"Starting HTTP server on {host}:{port}")
+    web.run_app(web_app, host=host, port=port, shutdown_timeout=cfg["shutdown_timeout"],
+                print=lambda message: print(f"🚀 {message}"))
+
+
+if __name__ == "__main__":
+    # Verificar configuración
+    if not env_config["openai_api_key"]:
+        print("❌ Error: OPENAI_API_KEY environment variable not set.")
+        print("Please create a .env file with your OpenAI API key:")
+        print("OPENAI_API_KEY=your_api_key_here")
+    else:
+        run_server()
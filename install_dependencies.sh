@@ -31,7 +31,7 @@ pip install python-dotenv openai
 
 # Instalar langchain-core primero
 echo "📦 Instalando langchain-core..."
-pip install "langchain-core>=0.2.0"
+pip install "langchain-core>=0.3.46"
 
 # Instalar langchain-openai
 echo "📦 Instalando langchain-openai..."
@@ -47,7 +47,7 @@ pip install "langchain>=0.2.0"
 
 # Instalar langgraph
 echo "📦 Instalando langgraph..."
-pip install "langgraph>=0.5.0"
+pip install "langgraph>=1.0.2"
 
 # Verificar instalación
 echo "🧪 Verificando instalación..."
@@ -0,0 +1,162 @@
+"""
+Enrutador de intenciones previo al LLM
+Responde directamente desde la base de conocimientos las preguntas frecuentes de una sola intención
+"""
+
+import asyncio
+import functools
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END
+
+from config import ROUTER_CONFIG
+from response_cache import PERSONAL_DATA_RE
+from support_data import get_support_data
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class FaqRouter:
+    """
+    Clasificador de intenciones por reglas delante del nodo del agente.
+
+    Cada tema de la base de conocimientos tiene una expresión regular
+    compilada. Una pregunta se responde sin LLM solo si es corta, no
+    contiene datos personales ni señales de un caso concreto (bloqueos) y
+    coincide exactamente con un tema; en cualquier otro caso pasa al agente.
+    """
+
+    def __init__(self, intents: Mapping[str, Sequence[str]], knowledge_base: Mapping[str, str],
+                 max_words: int = 15, blockers: Sequence[str] = (), enabled: bool = True):
+        self.enabled = enabled
+        self.max_words = max_words
+        self._knowledge_base = knowledge_base
+        # Se ignoran las intenciones sin artículo en la base de conocimientos
+        self._intents = {
+            topic: re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+            for topic, patterns in intents.items()
+            if topic in knowledge_base and patterns
+        }
+        self._blockers = re.compile("|".join(f"(?:{pattern})" for pattern in blockers), re.IGNORECASE) if blockers else None
+
+        self._lock = threading.Lock()
+        self._turns = 0
+        self._hits = 0
+        self._router_seconds = 0.0
+        self._model_calls = 0
+        self._model_seconds = 0.0
+
+    def classify(self, text: str) -> Optional[str]:
+        """Devolver el tema si la pregunta tiene una única intención con alta confianza."""
+        if len(_WORD_RE.findall(text)) > self.max_words or PERSONAL_DATA_RE.search(text):
+            return None
+        if self._blockers is not None and self._blockers.search(text):
+            return None
+        matches = [topic for topic, pattern in self._intents.items() if pattern.search(text)]
+        return matches[0] if len(matches) == 1 else None
+
+    def route(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Nodo del grafo: añade la respuesta de la base de conocimientos o no cambia nada."""
+        messages = state["messages"]
+        if not self.enabled or not messages or not isinstance(messages[-1], HumanMessage):
+            return {}
+
+        start = time.perf_counter()
+        content = messages[-1].content
+        topic = self.classify(content) if isinstance(content, str) else None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._turns += 1
+            self._router_seconds += elapsed
+            if topic is not None:
+                self._hits += 1
+
+        if topic is None:
+            return {}
+        answer = AIMessage(content=self._knowledge_base[topic], response_metadata={"router_intent": topic})
+        return {"messages": [answer], "last_ai_message": answer}
+
+    def record_model_latency(self, seconds: float) -> None:
+        """Registrar la duración de una llamada al nodo del agente."""
+        with self._lock:
+            self._model_calls += 1
+            self._model_seconds += seconds
+
+    def timed(self, node: Callable) -> Callable:
+        """Envolver el nodo del agente para medir la latencia que ahorra cada acierto."""
+        if asyncio.iscoroutinefunction(node):
+            @functools.wraps(node)
+            async def async_wrapper(state):
+                start = time.perf_counter()
+                try:
+                    return await node(state)
+                finally:
+                    self.record_model_latency(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(node)
+        def wrapper(state):
+            start = time.perf_counter()
+            try:
+                return node(state)
+            finally:
+                self.record_model_latency(time.perf_counter() - start)
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Tasa de aciertos y latencia ahorrada.
+
+        La latencia ahorrada por turno es lo que habrían costado los aciertos
+        al ritmo medio observado del agente, menos el coste del enrutador en
+        todos los turnos, repartido entre los turnos enrutados.
+        """
+        with self._lock:
+            turns, hits = self._turns, self._hits
+            avg_router_ms = self._router_seconds / turns * 1000 if turns else 0.0
+            avg_model_ms = self._model_seconds / self._model_calls * 1000 if self._model_calls else 0.0
+        saved_ms = (hits * avg_model_ms - turns * avg_router_ms) / turns if turns else 0.0
+        return {
+            "turns": turns,
+            "hits": hits,
+            "hit_rate": round(hits / turns, 3) if turns else 0.0,
+            "avg_router_ms": round(avg_router_ms, 4),
+            "avg_model_ms": round(avg_model_ms, 2),
+            "latency_saved_ms_per_turn": round(saved_ms, 2)
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._turns = self._hits = self._model_calls = 0
+            self._router_seconds = self._model_seconds = 0.0
+
+
+def needs_model(state: Dict[str, Any]) -> str:
+    """Arista condicional tras el enrutador: al agente si la pregunta sigue sin respuesta."""
+    messages = state["messages"]
+    return "agent" if messages and isinstance(messages[-1], HumanMessage) else END
+
+
+_router: Optional[FaqRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_faq_router() -> FaqRouter:
+    """Obtener el enrutador compartido, construyéndolo la primera vez."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = FaqRouter(
+                    ROUTER_CONFIG["intents"],
+                    get_support_data().knowledge_base,
+                    max_words=ROUTER_CONFIG["max_words"],
+                    blockers=ROUTER_CONFIG["blockers"],
+                    enabled=ROUTER_CONFIG["enabled"]
+                )
+    return _router
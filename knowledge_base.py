@@ -0,0 +1,193 @@
+"""
+Índice invertido de la base de conocimientos con ranking BM25
+Se construye una vez a partir de la capa de datos compartida y devuelve resultados ordenados por relevancia
+"""
+
+import math
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from config import SEARCH_CONFIG
+from support_data import get_support_data
+
+# Bonificación cuando la frase completa del tema aparece en la consulta
+PHRASE_BONUS = 5.0
+
+# Palabras vacías que no aportan a la búsqueda
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "our", "the", "to", "what", "when", "where", "which", "with", "you", "your"
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class KnowledgeBaseResult(NamedTuple):
+    """Resultado de una búsqueda en la base de conocimientos."""
+    topic: str
+    article: str
+    score: float
+
+
+def _normalize_term(term: str) -> str:
+    """Reducir plurales simples para que 'returns' coincida con 'return'."""
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> List[str]:
+    """Dividir un texto en términos normalizados, sin palabras vacías."""
+    return [_normalize_term(token) for token in _TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class KnowledgeBaseIndex:
+    """
+    Índice invertido con puntuación BM25 precalculada.
+
+    Las listas de cada término se guardan contiguas en dos arrays compactos
+    (artículo int32 y contribución BM25 float32) con un array de offsets por
+    término. Como k1, b, idf y la longitud de cada artículo son fijos, la
+    contribución de cada par (término, artículo) se calcula al construir el
+    índice; una consulta solo concatena las listas de sus términos y las
+    acumula sobre todo el corpus con un único np.bincount.
+    """
+
+    def __init__(self, entries: Dict[str, str], k1: float = None, b: float = None, topic_weight: float = None):
+        k1 = SEARCH_CONFIG["bm25_k1"] if k1 is None else k1
+        b = SEARCH_CONFIG["bm25_b"] if b is None else b
+        topic_weight = SEARCH_CONFIG["topic_weight"] if topic_weight is None else topic_weight
+
+        self._topics: List[str] = list(entries)
+        self._articles: List[str] = [entries[topic] for topic in self._topics]
+        self._topic_phrases: List[str] = [" ".join(_TOKEN_RE.findall(topic.lower())) for topic in self._topics]
+
+        # Frecuencias por artículo; los términos del tema cuentan `topic_weight` veces
+        postings: Dict[str, Dict[int, float]] = {}
+        doc_lengths = np.zeros(len(self._topics), dtype=np.float32)
+        for doc_id, (topic, article) in enumerate(zip(self._topics, self._articles)):
+            weighted_terms = [(term, topic_weight) for term in tokenize(topic)]
+            weighted_terms += [(term, 1.0) for term in tokenize(article)]
+            for term, weight in weighted_terms:
+                term_postings = postings.setdefault(term, {})
+                term_postings[doc_id] = term_postings.get(doc_id, 0.0) + weight
+                doc_lengths[doc_id] += weight
+
+        doc_count = len(self._topics)
+        avg_length = float(doc_lengths.mean()) if doc_count else 0.0
+        # Factor de normalización por longitud de cada artículo: k1 * (1 - b + b * dl / avgdl)
+        length_norms = k1 * (1.0 - b + b * doc_lengths / avg_length) if avg_length else np.full(doc_count, k1, dtype=np.float32)
+
+        self._term_ids: Dict[str, int] = {}
+        offsets = [0]
+        doc_ids: List[np.ndarray] = []
+        contributions: List[np.ndarray] = []
+        for term, term_postings in postings.items():
+            self._term_ids[term] = len(offsets) - 1
+            ids = np.fromiter(term_postings.keys(), dtype=np.int32, count=len(term_postings))
+            tfs = np.fromiter(term_postings.values(), dtype=np.float32, count=len(term_postings))
+            df = len(term_postings)
+            idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+            doc_ids.append(ids)
+            contributions.append((idf * tfs * (k1 + 1.0) / (tfs + length_norms[ids])).astype(np.float32))
+            offsets.append(offsets[-1] + df)
+
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        self._contributions = np.concatenate(contributions) if contributions else np.zeros(0, dtype=np.float32)
+
+        # Frases de tema indexadas por su primer término para detectar coincidencias exactas
+        self._phrases_by_first_term: Dict[str, List[int]] = {}
+        for doc_id, phrase in enumerate(self._topic_phrases):
+            words = phrase.split()
+            if words:
+                self._phrases_by_first_term.setdefault(words[0], []).append(doc_id)
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def score(self, query: str) -> np.ndarray:
+        """Puntuar todo el corpus para la consulta en una sola pasada."""
+        slices = []
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is not None:
+                slices.append(slice(self._offsets[term_id], self._offsets[term_id + 1]))
+
+        if slices:
+            ids = np.concatenate([self._doc_ids[s] for s in slices])
+            weights = np.concatenate([self._contributions[s] for s in slices])
+            scores = np.bincount(ids, weights=weights, minlength=len(self._topics))
+        else:
+            scores = np.zeros(len(self._topics), dtype=np.float64)
+
+        # Bonificar los temas cuya frase completa aparece en la consulta
+        query_words = _TOKEN_RE.findall(query.lower())
+        padded_query = f" {' '.join(query_words)} "
+        for word in set(query_words):
+            for doc_id in self._phrases_by_first_term.get(word, ()):
+                if f" {self._topic_phrases[doc_id]} " in padded_query:
+                    scores[doc_id] += PHRASE_BONUS
+
+        return scores
+
+    def search(self, query: str, top_k: int = 3, min_relative_score: float = 0.0) -> List[KnowledgeBaseResult]:
+        """
+        Devolver los `top_k` artículos más relevantes para la consulta.
+
+        Los resultados con menos de `min_relative_score` veces la puntuación
+        del mejor se descartan para no enviar pasajes poco relevantes al LLM.
+        """
+        if top_k <= 0 or not self._topics:
+            return []
+
+        scores = self.score(query)
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size == 0:
+            return []
+
+        if candidates.size > top_k:
+            top = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        else:
+            top = candidates
+        # Orden estable: mayor puntuación primero y, a igualdad, orden de la base
+        top = top[np.lexsort((top, -scores[top]))]
+
+        threshold = scores[top[0]] * min_relative_score
+        return [
+            KnowledgeBaseResult(self._topics[doc_id], self._articles[doc_id], float(scores[doc_id]))
+            for doc_id in top
+            if scores[doc_id] >= threshold
+        ]
+
+
+def format_results(results: List[KnowledgeBaseResult]) -> str:
+    """Formatear los pasajes encontrados como respuesta de la herramienta."""
+    if len(results) == 1:
+        return results[0].article
+    return "\n".join(f"[{result.topic}] {result.article}" for result in results)
+
+
+def clamp_top_k(top_k: Optional[int]) -> int:
+    """Limitar top_k al rango configurado."""
+    if top_k is None:
+        return SEARCH_CONFIG["default_top_k"]
+    return max(1, min(int(top_k), SEARCH_CONFIG["max_top_k"]))
+
+
+_index: Optional[KnowledgeBaseIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_base_index() -> KnowledgeBaseIndex:
+    """Obtener el índice compartido, construyéndolo la primera vez."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KnowledgeBaseIndex(get_support_data().knowledge_base)
+    return _index
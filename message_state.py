@@ -0,0 +1,144 @@
+"""
+Canal de mensajes del estado del agente
+Reductor de solo-añadir para `messages`: los nodos devuelven únicamente los mensajes nuevos
+"""
+
+import threading
+from collections.abc import Sequence as SequenceABC
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+_append_lock = threading.Lock()
+
+
+class MessageHistory(SequenceABC):
+    """
+    Historia de mensajes inmutable que se amplía sin copiarse.
+
+    Cada historia es una vista de longitud fija sobre una lista compartida.
+    `extended()` añade los mensajes al final de esa lista y devuelve una
+    vista más larga, así que un turno cuesta lo que sus mensajes nuevos y no
+    lo que la historia entera. Las vistas anteriores no cambian (siguen
+    viendo solo sus primeros mensajes), lo que necesita el checkpointer, que
+    guarda las listas en segundo plano. Si se amplía una vista que ya no es
+    la más larga (p. ej. al reanudar desde un checkpoint anterior), se copia
+    una vez su parte y la rama sigue por separado.
+
+    DeltaCheckpointSaver la guarda como tramos del registro de mensajes;
+    otros checkpointers de LangGraph necesitan HistorySerializer.
+    """
+
+    __slots__ = ("_items", "_length")
+    __hash__ = None
+
+    def __init__(self, messages: Iterable[BaseMessage] = ()):
+        self._items = list(messages)
+        self._length = len(self._items)
+
+    @classmethod
+    def _view(cls, items: List[BaseMessage], length: int) -> "MessageHistory":
+        view = cls.__new__(cls)
+        view._items = items
+        view._length = length
+        return view
+
+    def extended(self, messages: Sequence[BaseMessage]) -> "MessageHistory":
+        """Historia con `messages` añadidos al final; esta no se modifica."""
+        with _append_lock:
+            items = self._items
+            if len(items) != self._length:
+                items = items[:self._length]
+            items.extend(messages)
+            return self._view(items, len(items))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._items[slice(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message index out of range")
+        return self._items[index]
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        return islice(self._items, self._length)
+
+    def __reversed__(self) -> Iterator[BaseMessage]:
+        items = self._items
+        return (items[i] for i in range(self._length - 1, -1, -1))
+
+    def __add__(self, other: Sequence[BaseMessage]) -> List[BaseMessage]:
+        return list(self) + list(other)
+
+    def __radd__(self, other: Sequence[BaseMessage]) -> List[BaseMessage]:
+        return list(other) + list(self)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, tuple, MessageHistory)):
+            return len(other) == self._length and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MessageHistory({list(self)!r})"
+
+    def __reduce__(self):
+        return MessageHistory, (list(self),)
+
+
+class HistorySerializer(JsonPlusSerializer):
+    """Serializador de LangGraph que guarda un MessageHistory como lista (para InMemorySaver y similares)."""
+
+    def dumps_typed(self, obj: Any):
+        if isinstance(obj, MessageHistory):
+            obj = list(obj)
+        return super().dumps_typed(obj)
+
+
+def append_messages(left: Sequence[BaseMessage], right: Union[BaseMessage, Sequence[BaseMessage]]) -> MessageHistory:
+    """
+    Reductor del canal `messages`: añade los mensajes nuevos a la historia.
+
+    Los nodos devuelven solo sus mensajes, así que ya no copian ni recorren
+    la historia, y el reductor tampoco: la historia es un MessageHistory que
+    se amplía en su sitio (la lista de entrada solo se envuelve la primera
+    vez). Si el canal está vacío y llega un MessageHistory (la entrada de
+    `turn_input` sin checkpointer), se adopta tal cual. Para sustituir la
+    historia completa (compactación) se devuelve `Overwrite(lista)`.
+    """
+    if isinstance(right, BaseMessage):
+        right = [right]
+    if not isinstance(left, MessageHistory):
+        if not left and isinstance(right, MessageHistory):
+            return right
+        left = MessageHistory(left)
+    return left.extended(right) if right else left
+
+
+def turn_input(app, state: Dict[str, Any], new_messages: Sequence[BaseMessage]) -> Dict[str, Any]:
+    """
+    Entrada de un turno para `app.invoke`/`app.stream`.
+
+    Con checkpointer, la historia y el resto del estado ya están guardados
+    en el thread y solo se envían los mensajes nuevos (reenviar el estado
+    escribiría de nuevo todos sus canales en cada turno); sin él, el grafo
+    empieza vacío y recibe el estado con la historia completa, ampliada con
+    `extended()` para no copiarla en cada turno.
+    """
+    if app.checkpointer is not None:
+        return {"messages": list(new_messages)}
+    history = state["messages"]
+    if not isinstance(history, MessageHistory):
+        history = MessageHistory(history)
+    return dict(state, messages=history.extended(new_messages))
+
+
+def last_reply(state: Dict[str, Any]) -> str:
+    """Contenido de la última respuesta del asistente (campo `last_ai_message`)."""
+    message = state.get("last_ai_message")
+    return message.content if message is not None else ""
@@ -4,24 +4,37 @@ Usando LangGraph 0.5.x con las mejores prácticas actuales
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence, List, Dict, Any
+from typing import TypedDict, Annotated, List, Dict, Any
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
 from langchain.tools import tool
+from agent_factory import get_agent_runnable
+from checkpointing import get_checkpointer, resume_state, thread_config
+from context_window import fit_context
+from intent_router import get_faq_router, needs_model
+from message_state import append_messages, last_reply, turn_input
+from rolling_summary import RollingSummarizer
+from summary_queue import create_summary_queue
+from ticket_store import create_ticket
+from tool_executor import count_tool_usage, execute_tool_calls
+from tool_registry import ToolRegistry
+from knowledge_base import clamp_top_k, format_results, get_knowledge_base_index
+from semantic_search import get_embedding_index
+from customer_store import get_customer_repository
+from order_store import describe_order_statuses, get_order_backend
+from support_data import get_support_data
+from streaming import print_stream, stream_turn
 import json
 import logging
+import uuid
 
 # Importar configuración
 from config import (
     get_config, 
     get_environment_config,
-    KNOWLEDGE_BASE,
-    CUSTOMER_DATA,
     TICKET_CONFIG,
-    ORDER_STATUSES,
     SYSTEM_PROMPTS,
     VALIDATION_CONFIG
 )
@@ -39,10 +52,12 @@ logger = logging.getLogger(__name__)
 
 # Definir el estado del agente
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], "The messages in the conversation"]
+    messages: Annotated[List[BaseMessage], append_messages]
+    last_ai_message: AIMessage
     next: str
     customer_info: dict
     conversation_summary: str
+    summarized_count: int
     tool_usage_count: dict
 
 # Obtener configuración
@@ -58,21 +73,28 @@ llm = ChatOpenAI(
 
 # Definir herramientas usando configuración
 @tool
-def search_knowledge_base(query: str) -> str:
-    """Search the knowledge base for relevant information about products and services."""
-    query_lower = query.lower()
+def search_knowledge_base(query: str, top_k: int = None) -> str:
+    """Search the knowledge base for relevant information about products and services. Returns up to top_k passages, most relevant first."""
+    # Buscar con BM25 en el índice invertido (construido una vez por proceso)
+    results = get_knowledge_base_index().search(
+        query,
+        top_k=clamp_top_k(top_k),
+        min_relative_score=config["search"]["min_relative_score"]
+    )
+    if results:
+        logger.info(f"Knowledge base search: '{query}' -> found {[result.topic for result in results]}")
+        return format_results(results)
     
-    # Buscar coincidencias exactas
-    for key, value in KNOWLEDGE_BASE.items():
-        if key in query_lower:
-            logger.info(f"Knowledge base search: '{query}' -> found '{key}'")
-            return value
-    
-    # Buscar coincidencias parciales
-    for key, value in KNOWLEDGE_BASE.items():
-        if any(word in query_lower for word in key.split()):
-            logger.info(f"Knowledge base search: '{query}' -> partial match '{key}'")
-            return value
+    # Sin coincidencias de términos: buscar paráfrasis por similitud de embeddings
+    if config["search"]["semantic_fallback"]:
+        results = get_embedding_index().search(
+            query,
+            top_k=clamp_top_k(top_k),
+            min_score=config["search"]["semantic_min_score"]
+        )
+        if results:
+            logger.info(f"Knowledge base search: '{query}' -> semantic match {[result.topic for result in results]}")
+            return format_results(results)
     
     logger.warning(f"Knowledge base search: '{query}' -> no matches found")
     return "I couldn't find specific information about that topic. Please contact our support team for assistance."
@@ -87,7 +109,8 @@ def create_support_ticket(issue: str, customer_email: str, priority: str = None)
         priority = TICKET_CONFIG["default_priority"]
     
     response_time = TICKET_CONFIG["priority_levels"][priority]
-    ticket_id = f"{TICKET_CONFIG['ticket_prefix']}-{len(issue) + len(customer_email)}"
+    # ID único y ordenado en el tiempo; el ticket se guarda en segundo plano
+    ticket_id = create_ticket(issue, customer_email, priority)
     
     logger.info(f"Support ticket created: {ticket_id} with priority {priority}")
     
@@ -100,100 +123,77 @@ def check_order_status(order_number: str) -> str:
         logger.warning(f"Invalid order number: '{order_number}'")
         return f"Invalid order number. Please provide a valid order number (minimum {VALIDATION_CONFIG['min_order_number_length']} characters)."
     
-    # Determinar estado basado en el hash del número de pedido
-    status_key = list(ORDER_STATUSES.keys())[hash(order_number) % len(ORDER_STATUSES)]
-    status_message = ORDER_STATUSES[status_key]
+    # Consultar el backend de pedidos (determinista en todos los procesos; estados precargados)
+    status_key = get_order_backend().get_status(order_number)
+    if status_key is None:
+        logger.warning(f"Order not found: '{order_number}'")
+        return f"Order {order_number} was not found. Please verify the order number."
+    status_message = get_support_data().order_statuses.get(status_key, f"Current status: {status_key}.")
     
     logger.info(f"Order status checked: {order_number} -> {status_key}")
     
     return f"Order {order_number}: {status_message}"
 
+@tool
+def check_order_statuses(order_numbers: List[str]) -> str:
+    """Check the status of several orders at once. Use it instead of calling check_order_status once per order."""
+    # Una sola consulta al backend de pedidos y un único ToolMessage para todos los pedidos
+    result = describe_order_statuses(order_numbers, VALIDATION_CONFIG["min_order_number_length"])
+    logger.info(f"Order statuses checked: {len(order_numbers)} orders in one lookup")
+    return result
+
 @tool
 def get_customer_info(customer_email: str) -> str:
     """Retrieve customer information and order history."""
-    if customer_email in CUSTOMER_DATA:
-        data = CUSTOMER_DATA[customer_email]
+    # Búsqueda por email normalizado en el repositorio de clientes
+    customer = get_customer_repository().get(customer_email)
+    if customer is not None:
         logger.info(f"Customer info retrieved: {customer_email}")
         
-        return (f"Customer: {data['name']}, Orders: {data['orders']}, "
-                f"Total Spent: {data['total_spent']}, Last Order: {data['last_order']}, "
-                f"Loyalty Tier: {data['loyalty_tier']}")
+        return (f"Customer: {customer.name}, Orders: {customer.orders}, "
+                f"Total Spent: {customer.total_spent}, Last Order: {customer.last_order}, "
+                f"Loyalty Tier: {customer.loyalty_tier}")
     else:
         logger.warning(f"Customer not found: {customer_email}")
         return f"No customer record found for {customer_email}. Please verify the email address."
 
 # Crear lista de herramientas
-tools = [search_knowledge_base, create_support_ticket, check_order_status, get_customer_info]
+tools = [search_knowledge_base, create_support_ticket, check_order_status, check_order_statuses, get_customer_info]
+
+# Registrar herramientas para despacho O(1) por nombre
+tool_registry = ToolRegistry(tools)
+
+# Resumen incremental, también usado para compactar la historia antigua
+summarizer = RollingSummarizer(llm, SYSTEM_PROMPTS["summary"], SYSTEM_PROMPTS["summary_update"])
 
 # Definir nodos del agente
 def call_model(state: AgentState) -> AgentState:
     """Call the LLM to generate a response and handle tools internally."""
     messages = state["messages"]
     
-    # Crear template de prompt usando configuración
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPTS["main_agent"]),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
-    
-    # Crear agente con herramientas
-    agent = prompt | llm.bind_tools(tools)
+    # Obtener agente con herramientas (prompt y bind_tools cacheados por proceso)
+    agent = get_agent_runnable(llm, tools, SYSTEM_PROMPTS["main_agent"])
     
     # Obtener respuesta
     response = agent.invoke({
-        "messages": messages,
+        "messages": fit_context(messages),
         "agent_scratchpad": []
     })
     
-    # Agregar respuesta a los mensajes
-    new_messages = list(messages) + [response]
+    # Solo los mensajes nuevos: el reductor los añade a la historia
+    new_messages = [response]
+    tool_usage_count = dict(state.get("tool_usage_count") or {})
     
-    # Si hay llamadas a herramientas, ejecutarlas internamente
+    # Si hay llamadas a herramientas, ejecutarlas concurrentemente
     if hasattr(response, 'tool_calls') and response.tool_calls:
-        for tool_call in response.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            
-            logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-            
-            # Encontrar y ejecutar la herramienta
-            tool_func = None
-            for tool in tools:
-                if tool.name == tool_name:
-                    tool_func = tool
-                    break
-            
-            if tool_func:
-                try:
-                    result = tool_func.invoke(tool_args)
-                    # Agregar resultado de herramienta a mensajes
-                    new_messages.append(ToolMessage(
-                        content=str(result),
-                        tool_call_id=tool_call["id"]
-                    ))
-                    
-                    # Actualizar contador de uso de herramientas
-                    if "tool_usage_count" not in state:
-                        state["tool_usage_count"] = {}
-                    state["tool_usage_count"][tool_name] = state["tool_usage_count"].get(tool_name, 0) + 1
-                    
-                except Exception as e:
-                    logger.error(f"Error executing tool {tool_name}: {e}")
-                    new_messages.append(ToolMessage(
-                        content=f"Error executing {tool_name}: {str(e)}",
-                        tool_call_id=tool_call["id"]
-                    ))
-            else:
-                logger.error(f"Tool {tool_name} not found")
-                new_messages.append(ToolMessage(
-                    content=f"Tool {tool_name} not found",
-                    tool_call_id=tool_call["id"]
-                ))
+        new_messages.extend(execute_tool_calls(response.tool_calls, tool_registry))
+        
+        # Actualizar contador de uso de herramientas
+        tool_usage_count = count_tool_usage(response.tool_calls, tool_usage_count)
     
     logger.info(f"LLM response generated for message: {messages[-1].content[:50]}...")
     
-    return {"messages": new_messages}
+    return {"messages": new_messages, "last_ai_message": response, "tool_usage_count": tool_usage_count}
 
 def call_tool(state: AgentState) -> AgentState:
     """Call a tool and add the result to the messages."""
@@ -203,84 +203,55 @@ def call_tool(state: AgentState) -> AgentState:
     # Extraer llamadas a herramientas del último mensaje
     tool_calls = last_message.tool_calls
     
-    # Ejecutar cada llamada a herramienta
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        
-        logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-        
-        # Encontrar y ejecutar la herramienta
-        tool_func = None
-        for tool in tools:
-            if tool.name == tool_name:
-                tool_func = tool
-                break
-        
-        if tool_func:
-            try:
-                result = tool_func.invoke(tool_args)
-                # Agregar resultado de herramienta a mensajes
-                messages.append(ToolMessage(
-                    content=str(result),
-                    tool_call_id=tool_call["id"]
-                ))
-                
-                # Actualizar contador de uso de herramientas
-                if "tool_usage_count" not in state:
-                    state["tool_usage_count"] = {}
-                state["tool_usage_count"][tool_name] = state["tool_usage_count"].get(tool_name, 0) + 1
-                
-            except Exception as e:
-                logger.error(f"Error executing tool {tool_name}: {e}")
-                messages.append(ToolMessage(
-                    content=f"Error executing {tool_name}: {str(e)}",
-                    tool_call_id=tool_call["id"]
-                ))
-        else:
-            logger.error(f"Tool {tool_name} not found")
-            messages.append(ToolMessage(
-                content=f"Tool {tool_name} not found",
-                tool_call_id=tool_call["id"]
-            ))
+    # Ejecutar las llamadas a herramientas concurrentemente, conservando su orden
+    tool_messages = execute_tool_calls(tool_calls, tool_registry)
+    
+    # Actualizar contador de uso de herramientas
+    tool_usage_count = count_tool_usage(tool_calls, state.get("tool_usage_count"))
     
-    return {"messages": messages}
+    return {"messages": tool_messages, "tool_usage_count": tool_usage_count}
 
 def generate_summary(state: AgentState) -> AgentState:
     """Generate a summary of the conversation when ending."""
-    messages = state["messages"]
-    
-    # Crear prompt de resumen usando configuración
-    summary_prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPTS["summary"]),
-        MessagesPlaceholder(variable_name="messages")
-    ])
-    
-    summary_chain = summary_prompt | llm
-    summary = summary_chain.invoke({"messages": messages})
+    # Solo se envían al LLM los mensajes posteriores a la última actualización
+    update = summarizer.summarize(state)
     
     logger.info("Conversation summary generated")
     
-    return {"conversation_summary": summary.content}
+    return update
+
+# Cola de resúmenes en segundo plano: el final de la conversación no espera al LLM
+summary_queue = create_summary_queue(generate_summary)
 
 # Crear workflow simplificado
 workflow = StateGraph(AgentState)
 
-# Agregar solo el nodo principal
-workflow.add_node("agent", call_model)
+# Enrutador de preguntas frecuentes antes del LLM
+faq_router = get_faq_router()
+workflow.add_node("router", faq_router.route)
+
+# Agregar el nodo principal
+workflow.add_node("agent", faq_router.timed(call_model))
 
 # Definir punto de entrada
-workflow.set_entry_point("agent")
+workflow.set_entry_point("router")
+
+# Compactar la historia antigua en el resumen antes de llamar al agente
+workflow.add_node("compact", summarizer.compact)
+
+# Pasar al agente solo si el enrutador no respondió
+workflow.add_conditional_edges("router", needs_model, {"agent": "compact", END: END})
+workflow.add_edge("compact", "agent")
 
 # Agregar edge directo al final
 workflow.add_edge("agent", END)
 
-# Compilar grafo
-app = workflow.compile()
+# Compilar grafo con checkpoints por thread_id (cualquier proceso puede reanudar la conversación)
+app = workflow.compile(checkpointer=get_checkpointer())
 
 # Función para ejecutar el chatbot
-def run_chatbot():
-    """Ejecutar el chatbot de soporte al cliente moderno."""
+def run_chatbot(session_id: str = None):
+    """Ejecutar el chatbot de soporte al cliente moderno; con `session_id` se reanuda esa conversación."""
     print(f"{config['ui']['welcome_message']} (Versión Moderna - LangGraph 0.5.x)")
     print("Type 'quit' to exit")
     print("=" * 60)
@@ -293,11 +264,16 @@ def run_chatbot():
     print("• Customer information")
     print("=" * 60)
     
-    # Inicializar estado
-    state = {
+    # Identificador de la sesión: thread_id de los checkpoints y clave de su resumen
+    session_id = session_id or uuid.uuid4().hex
+    thread = thread_config(session_id)
+
+    # Inicializar estado (o recuperar el último checkpoint de la sesión)
+    state = resume_state(app, session_id) or {
         "messages": [],
         "customer_info": {},
         "conversation_summary": "",
+        "summarized_count": 0,
         "tool_usage_count": {}
     }
     
@@ -314,21 +290,24 @@ def run_chatbot():
         
         if user_input.lower() in config["ui"]["exit_commands"]:
             print("🤖 Thank you for using our customer support! Goodbye!")
+            logger.info(f"FAQ router stats: {faq_router.stats()}")
             break
         
-        # Agregar mensaje del usuario al estado
-        state["messages"].append(HumanMessage(content=user_input))
+        # Entrada del turno: solo el mensaje nuevo (el reductor lo añade a la historia)
+        turn = turn_input(app, state, [HumanMessage(content=user_input)])
         conversation_length += 1
         
         try:
-            # Ejecutar workflow
-            result = app.invoke(state)
-            
-            # Obtener último mensaje del asistente
-            ai_messages = [msg for msg in result["messages"] if isinstance(msg, AIMessage)]
-            if ai_messages:
-                last_ai_message = ai_messages[-1]
-                print(f"🤖 Assistant: {last_ai_message.content}")
+            if config["ui"]["stream_responses"]:
+                # Ejecutar workflow mostrando los tokens según llegan
+                result = print_stream(stream_turn(app, turn, config=thread))
+            else:
+                # Ejecutar workflow
+                result = app.invoke(turn, thread)
+                
+                # Último mensaje del asistente, guardado en el estado sin recorrer la historia
+                if result.get("last_ai_message") is not None:
+                    print(f"🤖 Assistant: {last_reply(result)}")
             
             # Mostrar uso de herramientas si está habilitado
             if config["ui"]["show_tool_usage"] and result.get("tool_usage_count"):
@@ -344,6 +323,12 @@ def run_chatbot():
             print(f"🤖 I apologize, but I encountered an error: {str(e)}")
             print("Please try rephrasing your question or contact our support team directly.")
 
+    # Resumir al terminar la sesión, fuera del camino de la respuesta
+    if state["messages"]:
+        summary_queue.submit(session_id, state)
+        logger.info(f"Summary queued for session {session_id} (pending: {len(summary_queue)})")
+
+
 if __name__ == "__main__":
     # Verificar configuración
     if not env_config["openai_api_key"]:
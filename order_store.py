@@ -0,0 +1,221 @@
+"""
+Backend de estados de pedido
+Consultas deterministas en todos los procesos: simulador con hash estable y almacén SQLite indexado
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from config import ORDER_STORE_CONFIG
+from response_cache import MemoryCacheBackend, hash_text
+from support_data import get_support_data
+
+# Marca de "pedido inexistente" en la caché (MemoryCacheBackend devuelve None si no hay entrada)
+_MISSING = ""
+
+# Parámetros por sentencia: por debajo del límite de las versiones antiguas de SQLite (999)
+MAX_SQL_PARAMS = 900
+
+
+class OrderStatusBackend(ABC):
+    """Interfaz de los backends de estados de pedido."""
+
+    @abstractmethod
+    def get_status(self, order_number: str) -> Optional[str]:
+        """Clave del estado del pedido (p. ej. "shipped") o None si el pedido no existe."""
+
+    def get_statuses(self, order_numbers: Sequence[str]) -> Dict[str, Optional[str]]:
+        """
+        Estados de varios pedidos: {número: clave del estado o None}.
+
+        Los backends indexados lo resuelven con una sola consulta; por
+        defecto se consulta pedido a pedido.
+        """
+        return {order_number: self.get_status(order_number) for order_number in order_numbers}
+
+
+class SimulatedOrderBackend(OrderStatusBackend):
+    """
+    Estados simulados a partir de un hash estable del número de pedido.
+
+    Mismo pedido, mismo estado en cualquier proceso y en cada ejecución,
+    por lo que las respuestas se pueden cachear y repartir entre workers.
+    """
+
+    def __init__(self, status_keys: Sequence[str]):
+        self.status_keys: Tuple[str, ...] = tuple(status_keys)
+
+    def get_status(self, order_number: str) -> Optional[str]:
+        return self.status_keys[int(hash_text(order_number), 16) % len(self.status_keys)]
+
+
+class SQLiteOrderStore(OrderStatusBackend):
+    """
+    Estados de pedido en una tabla SQLite indexada por número de pedido.
+
+    La clave primaria (tabla WITHOUT ROWID) hace que cada consulta sea una
+    búsqueda en el índice, independiente del número de pedidos. Los
+    pedidos que no están en la tabla se delegan en `fallback` si existe.
+    """
+
+    def __init__(self, path: str, fallback: Optional[OrderStatusBackend] = None):
+        self.path = path
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "order_number TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_status(self, order_number: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM orders WHERE order_number = ?", (order_number,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.fallback.get_status(order_number) if self.fallback is not None else None
+
+    def get_statuses(self, order_numbers: Sequence[str]) -> Dict[str, Optional[str]]:
+        """Resolver todos los pedidos con una consulta IN sobre la clave primaria."""
+        order_numbers = list(dict.fromkeys(order_numbers))
+        found: Dict[str, Optional[str]] = {}
+        with self._lock:
+            for start in range(0, len(order_numbers), MAX_SQL_PARAMS):
+                chunk = order_numbers[start:start + MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT order_number, status FROM orders WHERE order_number IN ({placeholders})", chunk
+                ))
+        missing = [order_number for order_number in order_numbers if order_number not in found]
+        if missing:
+            found.update(self.fallback.get_statuses(missing) if self.fallback is not None else dict.fromkeys(missing))
+        return found
+
+    def put_status(self, order_number: str, status: str) -> None:
+        """Guardar (o actualizar) el estado de un pedido."""
+        self.put_many([(order_number, status)])
+
+    def put_many(self, orders: Iterable[Tuple[str, str]]) -> None:
+        """Guardar muchos pedidos (número, estado) en una sola transacción."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO orders (order_number, status, updated_at) VALUES (?, ?, ?)",
+                ((order_number, status, now) for order_number, status in orders)
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+class CachedOrderBackend(OrderStatusBackend):
+    """
+    Caché LRU con TTL delante de otro backend.
+
+    Como las consultas son deterministas, cualquier worker puede reutilizar
+    el resultado. El TTL es corto porque el estado de un pedido cambia.
+    """
+
+    def __init__(self, backend: OrderStatusBackend, max_entries: int = 10000, ttl_seconds: float = 60):
+        self.backend = backend
+        self._cache = MemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    def get_status(self, order_number: str) -> Optional[str]:
+        cached = self._cache.get(order_number)
+        if cached is not None:
+            self.hits += 1
+            return cached or None
+        self.misses += 1
+        status = self.backend.get_status(order_number)
+        self._cache.set(order_number, status or _MISSING)
+        return status
+
+    def get_statuses(self, order_numbers: Sequence[str]) -> Dict[str, Optional[str]]:
+        """Servir desde la caché lo que se pueda y pedir el resto al backend en una sola llamada."""
+        statuses: Dict[str, Optional[str]] = {}
+        misses = []
+        for order_number in order_numbers:
+            cached = self._cache.get(order_number)
+            if cached is None:
+                misses.append(order_number)
+            else:
+                self.hits += 1
+                statuses[order_number] = cached or None
+        if misses:
+            self.misses += len(misses)
+            for order_number, status in self.backend.get_statuses(misses).items():
+                self._cache.set(order_number, status or _MISSING)
+                statuses[order_number] = status
+        return statuses
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def create_order_backend(order_config: Dict[str, Any] = None) -> OrderStatusBackend:
+    """Crear el backend configurado ("simulated" o "sqlite"), con caché si `cache_entries` > 0."""
+    order_config = order_config or ORDER_STORE_CONFIG
+    simulator = SimulatedOrderBackend(get_support_data().order_status_keys)
+    if order_config["backend"] == "sqlite":
+        backend = SQLiteOrderStore(order_config["sqlite_path"],
+                                   fallback=simulator if order_config["simulate_missing"] else None)
+    else:
+        backend = simulator
+    if order_config["cache_entries"] > 0:
+        backend = CachedOrderBackend(backend, order_config["cache_entries"], order_config["cache_ttl_seconds"])
+    return backend
+
+
+def describe_order_statuses(order_numbers: Sequence[str], min_length: int, max_orders: Optional[int] = None) -> str:
+    """
+    Texto del estado de varios pedidos para la herramienta check_order_statuses.
+
+    Todos los pedidos válidos se resuelven con una sola consulta al backend
+    y la respuesta cabe en un único ToolMessage (una línea por pedido).
+    """
+    max_orders = max_orders or ORDER_STORE_CONFIG["max_batch_orders"]
+    order_numbers = list(dict.fromkeys(str(order_number).strip() for order_number in order_numbers))
+    if not order_numbers:
+        return "Please provide at least one order number."
+    truncated = len(order_numbers) > max_orders
+    order_numbers = order_numbers[:max_orders]
+
+    valid = [order_number for order_number in order_numbers if len(order_number) >= min_length]
+    statuses = get_order_backend().get_statuses(valid) if valid else {}
+    messages = get_support_data().order_statuses
+
+    lines = []
+    for order_number in order_numbers:
+        if order_number not in statuses:
+            lines.append(f"Order {order_number}: Invalid order number (minimum {min_length} characters).")
+        elif statuses[order_number] is None:
+            lines.append(f"Order {order_number}: Not found. Please verify the order number.")
+        else:
+            status_key = statuses[order_number]
+            lines.append(f"Order {order_number}: {messages.get(status_key, f'Current status: {status_key}.')}")
+    if truncated:
+        lines.append(f"Only the first {max_orders} orders were checked.")
+    return "\n".join(lines)
+
+
+_backend: Optional[OrderStatusBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_order_backend() -> OrderStatusBackend:
+    """Obtener el backend de pedidos compartido, creándolo la primera vez."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_order_backend()
+    return _backend
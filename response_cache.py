@@ -0,0 +1,413 @@
+"""
+Caché de respuestas del LLM
+Coincidencia exacta (modelo, prompt, herramientas y conversación normalizada) y similitud semántica para preguntas frecuentes
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Collection, Dict, Optional, Sequence
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+
+from config import CACHE_CONFIG, SEARCH_CONFIG, VALIDATION_CONFIG
+
+# Datos personales que hacen que una pregunta o respuesta no sea reutilizable entre clientes
+PERSONAL_DATA_RE = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.-]+|\d{%d,}" % VALIDATION_CONFIG["min_order_number_length"]
+)
+
+# Preguntas sobre la situación del propio cliente ("where is my order?", "I ordered…"): la respuesta
+# depende de quién pregunta aunque el texto sea idéntico
+PERSONAL_REFERENCE_RE = re.compile(
+    r"\b(my|mine|our|ours|mi|mis|m[ií]o|m[ií]a|nuestr[oa]s?)\b"
+    r"|\bi(?: have)? (ordered|bought|purchased|paid|placed|received|returned|sent|got)\b"
+    r"|\b(compr[eé]|ped[ií]|pagu[eé]|recib[ií])\b",
+    re.IGNORECASE
+)
+
+
+def _normalize_text(text: Any) -> str:
+    """Normalizar espacios y mayúsculas para que variaciones triviales compartan entrada."""
+    if not isinstance(text, str):
+        text = json.dumps(text, sort_keys=True, ensure_ascii=False)
+    return " ".join(text.split()).casefold()
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> list:
+    """
+    Convertir la conversación a una forma canónica.
+
+    Se ignoran los identificadores de tool_call, que son aleatorios, y se
+    conservan tipo, contenido y llamadas a herramientas de cada mensaje.
+    """
+    normalized = []
+    for message in messages:
+        entry = [message.type, _normalize_text(message.content)]
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            entry.append([[call["name"], call["args"]] for call in tool_calls])
+        normalized.append(entry)
+    return normalized
+
+
+def hash_text(text: str) -> str:
+    """Hash corto y estable de un texto."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class MemoryCacheBackend:
+    """Backend en memoria con expulsión LRU y caducidad por TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """Backend persistente en SQLite con expulsión LRU y caducidad por TTL."""
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now)
+            )
+            # Expulsar las entradas menos usadas por encima del límite
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Caché de respuestas del LLM con contadores de aciertos y fallos."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, namespace: str, messages: Sequence[BaseMessage]) -> str:
+        """Clave de la conversación dentro de un espacio (modelo + prompt + herramientas)."""
+        payload = json.dumps(normalize_messages(messages), sort_keys=True, ensure_ascii=False, default=str)
+        return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return messages_from_dict([json.loads(value)])[0]
+
+    def set(self, key: str, message: AIMessage) -> None:
+        self.backend.set(key, json.dumps(message_to_dict(message)))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self.backend)
+        }
+
+
+def standalone_question(messages: Sequence[BaseMessage], safe_tools: Collection[str]) -> Optional[str]:
+    """
+    Devolver la pregunta si la conversación admite una respuesta compartida.
+
+    Solo se aceptan conversaciones de una única pregunta sin datos
+    personales (email o número de pedido) ni referencias a la situación
+    del propio cliente ("my order", "I bought…"), cuyas llamadas a
+    herramientas sean todas de `safe_tools`; así la respuesta no depende
+    del cliente ni del contexto de turnos anteriores.
+    """
+    if not messages or not isinstance(messages[0], HumanMessage) or not isinstance(messages[0].content, str):
+        return None
+    for message in messages[1:]:
+        if isinstance(message, AIMessage):
+            if any(call["name"] not in safe_tools for call in message.tool_calls):
+                return None
+        elif not isinstance(message, ToolMessage):
+            return None
+    question = messages[0].content
+    if PERSONAL_DATA_RE.search(question) or PERSONAL_REFERENCE_RE.search(question):
+        return None
+    return question
+
+
+class SemanticResponseCache:
+    """
+    Caché de respuestas por similitud de embeddings.
+
+    Cada espacio de claves guarda los embeddings normalizados de las
+    preguntas en una matriz float32; una búsqueda es un producto
+    matriz-vector y solo se acepta el vecino más cercano si su similitud
+    coseno alcanza `threshold`. Al llenarse se sustituye la entrada menos
+    usada recientemente.
+    """
+
+    def __init__(self, embedder, threshold: float = 0.8, max_entries: int = 500, ttl_seconds: float = 3600):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._partitions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedder([_normalize_text(text)])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _partition(self, namespace: str, dim: int) -> Dict[str, Any]:
+        partition = self._partitions.get(namespace)
+        if partition is None:
+            partition = {
+                "vectors": np.zeros((self.max_entries, dim), dtype=np.float32),
+                "expires_at": np.zeros(self.max_entries, dtype=np.float64),
+                "last_used": np.zeros(self.max_entries, dtype=np.float64),
+                "answers": [None] * self.max_entries,
+            }
+            self._partitions[namespace] = partition
+        return partition
+
+    def get(self, namespace: str, question: str) -> Optional[AIMessage]:
+        """Buscar una respuesta para una pregunta parecida."""
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            partition = self._partitions.get(namespace)
+            if partition is not None:
+                similarities = partition["vectors"] @ vector
+                similarities[partition["expires_at"] < now] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    partition["last_used"][best] = now
+                    self.hits += 1
+                    return messages_from_dict([json.loads(partition["answers"][best])])[0]
+            self.misses += 1
+            return None
+
+    def set(self, namespace: str, question: str, message: AIMessage) -> None:
+        """Guardar la respuesta final a una pregunta."""
+        vector = self._embed(question)
+        now = time.time()
+        with self._lock:
+            partition = self._partition(namespace, vector.shape[0])
+            # Ocupa un hueco libre o caducado; si no hay, el menos usado
+            slot = int(np.argmin(np.where(partition["expires_at"] < now, -1.0, partition["last_used"])))
+            partition["vectors"][slot] = vector
+            partition["expires_at"][slot] = now + self.ttl_seconds
+            partition["last_used"][slot] = now
+            partition["answers"][slot] = json.dumps(message_to_dict(message))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        now = time.time()
+        with self._lock:
+            entries = sum(int((p["expires_at"] >= now).sum()) for p in self._partitions.values())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries
+        }
+
+
+class CachedRunnable:
+    """
+    Envoltorio de un runnable del agente que consulta la caché antes de llamar al LLM.
+
+    Expone invoke/ainvoke con la misma entrada que el runnable original
+    ({"messages": ..., "agent_scratchpad": ...}). Si hay caché semántica,
+    las preguntas independientes (ver standalone_question) se buscan
+    también por similitud, y sus respuestas finales sin llamadas a
+    herramientas se guardan para preguntas parafraseadas.
+    """
+
+    def __init__(self, runnable, cache: ResponseCache, namespace: str,
+                 semantic_cache: Optional[SemanticResponseCache] = None,
+                 safe_tools: Collection[str] = ()):
+        self.runnable = runnable
+        self.cache = cache
+        self.namespace = namespace
+        self.semantic_cache = semantic_cache
+        self.safe_tools = frozenset(safe_tools)
+
+    def _conversation(self, inputs: Dict[str, Any]) -> list:
+        return list(inputs["messages"]) + list(inputs.get("agent_scratchpad") or [])
+
+    def _lookup(self, key: str, conversation: list) -> Optional[AIMessage]:
+        cached = self.cache.get(key)
+        if cached is None and self.semantic_cache is not None and len(conversation) == 1:
+            # Solo al inicio del turno: un acierto evita también las llamadas a herramientas
+            question = standalone_question(conversation, self.safe_tools)
+            if question is not None:
+                cached = self.semantic_cache.get(self.namespace, question)
+        return cached
+
+    def _store(self, key: str, conversation: list, response: AIMessage) -> None:
+        self.cache.set(key, response)
+        if self.semantic_cache is None or response.tool_calls:
+            return
+        question = standalone_question(conversation, self.safe_tools)
+        if question is not None and isinstance(response.content, str) and not PERSONAL_DATA_RE.search(response.content):
+            self.semantic_cache.set(self.namespace, question, response)
+
+    def invoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> AIMessage:
+        conversation = self._conversation(inputs)
+        key = self.cache.make_key(self.namespace, conversation)
+        cached = self._lookup(key, conversation)
+        if cached is not None:
+            return cached
+        response = self.runnable.invoke(inputs, config, **kwargs)
+        self._store(key, conversation, response)
+        return response
+
+    async def ainvoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> AIMessage:
+        conversation = self._conversation(inputs)
+        key = self.cache.make_key(self.namespace, conversation)
+        cached = self._lookup(key, conversation)
+        if cached is not None:
+            return cached
+        response = await self.runnable.ainvoke(inputs, config, **kwargs)
+        self._store(key, conversation, response)
+        return response
+
+
+def create_backend(cache_config: Dict[str, Any] = None):
+    """Crear el backend configurado ("memory" o "sqlite")."""
+    cache_config = cache_config or CACHE_CONFIG
+    if cache_config["backend"] == "sqlite":
+        return SQLiteCacheBackend(cache_config["sqlite_path"], cache_config["max_entries"], cache_config["ttl_seconds"])
+    return MemoryCacheBackend(cache_config["max_entries"], cache_config["ttl_seconds"])
+
+
+def semantic_cache_enabled(cache_config: Dict[str, Any] = None, search_config: Dict[str, Any] = None) -> bool:
+    """
+    Indicar si se debe usar la caché semántica.
+
+    Hace falta activarla en CACHE_CONFIG y un modelo de embeddings real: con
+    el embedder "hashing" dos preguntas que comparten casi todas las
+    palabras ("open on Sunday?" / "open on Monday?") superan el umbral y
+    los parafraseos reales no se parecen, así que daría respuestas ajenas.
+    """
+    cache_config = cache_config or CACHE_CONFIG
+    search_config = search_config or SEARCH_CONFIG
+    return bool(cache_config["semantic_enabled"]) and search_config["embedder"] != "hashing"
+
+
+_cache: Optional[ResponseCache] = None
+_semantic_cache: Optional[SemanticResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Obtener la caché de respuestas compartida, creándola la primera vez."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(create_backend())
+    return _cache
+
+
+def get_semantic_cache() -> SemanticResponseCache:
+    """Obtener la caché semántica compartida, creándola la primera vez."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _cache_lock:
+            if _semantic_cache is None:
+                # Importación diferida: el embedder solo se necesita con la caché semántica activa
+                from semantic_search import default_embedder
+                _semantic_cache = SemanticResponseCache(
+                    default_embedder(),
+                    threshold=CACHE_CONFIG["semantic_threshold"],
+                    max_entries=CACHE_CONFIG["semantic_max_entries"],
+                    ttl_seconds=CACHE_CONFIG["ttl_seconds"]
+                )
+    return _semantic_cache
@@ -0,0 +1,149 @@
+"""
+Resumen incremental de la conversación
+Actualiza el resumen solo con los mensajes nuevos y permite compactar la historia antigua en un único mensaje de sistema
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langgraph.types import Overwrite
+
+from agent_factory import get_summary_runnable
+from config import CONTEXT_CONFIG
+from context_window import estimate_tokens, fit_context
+
+# Nombre del SystemMessage que sustituye a los turnos compactados
+SUMMARY_MESSAGE_NAME = "conversation_summary"
+SUMMARY_MESSAGE_PREFIX = "Summary of the earlier conversation: "
+
+
+def is_summary_message(message: BaseMessage) -> bool:
+    """Indicar si el mensaje es el resumen insertado por la compactación."""
+    return isinstance(message, SystemMessage) and message.name == SUMMARY_MESSAGE_NAME
+
+
+def summary_message(summary: str) -> SystemMessage:
+    """Crear el mensaje de sistema que representa los turnos compactados."""
+    return SystemMessage(content=SUMMARY_MESSAGE_PREFIX + summary, name=SUMMARY_MESSAGE_NAME)
+
+
+class RollingSummarizer:
+    """
+    Resumen que se actualiza a partir de los mensajes nuevos.
+
+    El estado guarda el resumen en `conversation_summary` y en
+    `summarized_count` cuántos mensajes del principio de `messages` ya
+    están reflejados en él. El primer resumen usa `summary_prompt`; los
+    siguientes usan `update_prompt`, que recibe el resumen anterior en la
+    variable {summary} y solo los mensajes posteriores.
+    """
+
+    def __init__(self, llm, summary_prompt: str, update_prompt: str,
+                 threshold_tokens: Optional[int] = None, keep_tokens: Optional[int] = None,
+                 compaction: Optional[bool] = None):
+        self.llm = llm
+        self.summary_prompt = summary_prompt
+        self.update_prompt = update_prompt
+        self.threshold_tokens = CONTEXT_CONFIG["compact_threshold_tokens"] if threshold_tokens is None else threshold_tokens
+        self.keep_tokens = CONTEXT_CONFIG["compact_keep_tokens"] if keep_tokens is None else keep_tokens
+        self.compaction = CONTEXT_CONFIG["compaction"] if compaction is None else compaction
+
+    def _chain_and_inputs(self, summary: str, new_messages: Sequence[BaseMessage]) -> Tuple[Any, Dict[str, Any]]:
+        if not summary:
+            return get_summary_runnable(self.llm, self.summary_prompt), {"messages": list(new_messages)}
+        chain = get_summary_runnable(self.llm, self.update_prompt)
+        return chain, {"messages": list(new_messages), "summary": summary}
+
+    def update(self, summary: str, new_messages: Sequence[BaseMessage]) -> str:
+        """Incorporar los mensajes nuevos al resumen."""
+        if not new_messages:
+            return summary
+        chain, inputs = self._chain_and_inputs(summary, new_messages)
+        return chain.invoke(inputs).content
+
+    async def aupdate(self, summary: str, new_messages: Sequence[BaseMessage]) -> str:
+        """Versión asíncrona de update."""
+        if not new_messages:
+            return summary
+        chain, inputs = self._chain_and_inputs(summary, new_messages)
+        return (await chain.ainvoke(inputs)).content
+
+    @staticmethod
+    def _unsummarized(state: Dict[str, Any]) -> List[BaseMessage]:
+        messages = state["messages"]
+        return [m for m in messages[state.get("summarized_count", 0):] if not is_summary_message(m)]
+
+    def summarize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Nodo de resumen: actualizar el resumen con los mensajes aún no resumidos."""
+        new_messages = self._unsummarized(state)
+        if not new_messages:
+            return {}
+        summary = self.update(state.get("conversation_summary", ""), new_messages)
+        return {"conversation_summary": summary, "summarized_count": len(state["messages"])}
+
+    async def asummarize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Versión asíncrona de summarize."""
+        new_messages = self._unsummarized(state)
+        if not new_messages:
+            return {}
+        summary = await self.aupdate(state.get("conversation_summary", ""), new_messages)
+        return {"conversation_summary": summary, "summarized_count": len(state["messages"])}
+
+    def _plan_compaction(self, state: Dict[str, Any]) -> Optional[Tuple[List[BaseMessage], List[BaseMessage], List[BaseMessage], int]]:
+        """
+        Decidir qué mensajes se compactan.
+
+        Devuelve (mensajes a resumir, SystemMessage propios, ventana reciente,
+        nuevo summarized_count) o None si la historia cabe en el umbral.
+        """
+        messages = state["messages"]
+        if not self.compaction or estimate_tokens(messages) <= self.threshold_tokens:
+            return None
+
+        head = 0
+        while head < len(messages) and isinstance(messages[head], SystemMessage):
+            head += 1
+        # La ventana respeta los bloques de herramientas; lo anterior se compacta
+        window = fit_context(messages[head:], max_tokens=self.keep_tokens)
+        cut = len(messages) - len(window)
+        if cut <= head:
+            return None
+
+        summarized_count = state.get("summarized_count", 0)
+        folded = list(messages[max(summarized_count, head):cut])
+        # Los SystemMessage propios (no el resumen anterior) se conservan delante
+        preserved = [m for m in messages[:head] if not is_summary_message(m)]
+        return folded, preserved, window, len(preserved) + 1 + max(0, summarized_count - cut)
+
+    def compact(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Nodo de compactación para el prompt del agente.
+
+        Si la historia supera `threshold_tokens`, los turnos antiguos se
+        incorporan al resumen y se sustituyen por un único SystemMessage;
+        se conservan los mensajes recientes que caben en `keep_tokens`. La
+        historia se sustituye con Overwrite, sin pasar por el reductor.
+        """
+        plan = self._plan_compaction(state)
+        if plan is None:
+            return {}
+        folded, preserved, window, summarized_count = plan
+        summary = self.update(state.get("conversation_summary", ""), folded)
+        return {
+            "messages": Overwrite(preserved + [summary_message(summary)] + window),
+            "conversation_summary": summary,
+            "summarized_count": summarized_count
+        }
+
+    async def acompact(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Versión asíncrona de compact."""
+        plan = self._plan_compaction(state)
+        if plan is None:
+            return {}
+        folded, preserved, window, summarized_count = plan
+        summary = await self.aupdate(state.get("conversation_summary", ""), folded)
+        return {
+            "messages": Overwrite(preserved + [summary_message(summary)] + window),
+            "conversation_summary": summary,
+            "summarized_count": summarized_count
+        }
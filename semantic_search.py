@@ -0,0 +1,151 @@
+"""
+Búsqueda semántica en la base de conocimientos
+Índice de embeddings en una matriz float32 de NumPy con similitud coseno por producto matriz-vector
+"""
+
+import re
+import threading
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from config import KNOWLEDGE_BASE_ALIASES, SEARCH_CONFIG
+from support_data import get_support_data
+
+# Un embedder recibe una lista de textos y devuelve una matriz (len(textos), dim)
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class SemanticResult(NamedTuple):
+    """Resultado de una búsqueda semántica."""
+    topic: str
+    article: str
+    score: float
+
+
+class HashingEmbedder:
+    """
+    Embedder local y determinista basado en hashing de características.
+
+    Proyecta palabras, bigramas de palabras y trigramas de caracteres en
+    `dim` dimensiones con CRC32 (estable entre procesos, a diferencia de
+    hash()). No necesita red ni modelo, por lo que sirve para pruebas
+    offline y como alternativa barata a un modelo de embeddings real.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        features += [f"{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                # El bit alto decide el signo para que las colisiones tiendan a cancelarse
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign
+        return vectors
+
+
+class LangChainEmbedder:
+    """Adaptador para cualquier modelo de embeddings de LangChain (p. ej. OpenAIEmbeddings)."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_documents(list(texts)), dtype=np.float32)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normalizar cada fila a norma 1 para que el producto escalar sea el coseno."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class EmbeddingIndex:
+    """
+    Índice de embeddings de la base de conocimientos.
+
+    Cada artículo se embebe una vez (tema, alias y texto) en una matriz
+    float32 normalizada; una consulta se resuelve con un único producto
+    matriz-vector y un lote de consultas con un producto matriz-matriz.
+    """
+
+    def __init__(self, entries: Dict[str, str], embedder: Embedder,
+                 aliases: Optional[Dict[str, Sequence[str]]] = None):
+        self.embedder = embedder
+        self._topics: List[str] = list(entries)
+        self._articles: List[str] = [entries[topic] for topic in self._topics]
+        aliases = aliases or {}
+        documents = [
+            " ".join([topic, *aliases.get(topic, ()), article])
+            for topic, article in zip(self._topics, self._articles)
+        ]
+        self._matrix = _normalize_rows(embedder(documents)) if documents else np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Embeber y normalizar un lote de consultas."""
+        return _normalize_rows(self.embedder(queries))
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 3, min_score: float = 0.0) -> List[List[SemanticResult]]:
+        """Buscar varias consultas a la vez con una sola multiplicación de matrices."""
+        if not queries or not self._topics:
+            return [[] for _ in queries]
+
+        similarities = self.embed_queries(queries) @ self._matrix.T
+        top_k = min(top_k, len(self._topics))
+
+        results = []
+        for row in similarities:
+            top = np.argpartition(-row, top_k - 1)[:top_k]
+            top = top[np.argsort(-row[top], kind="stable")]
+            results.append([
+                SemanticResult(self._topics[doc_id], self._articles[doc_id], float(row[doc_id]))
+                for doc_id in top
+                if row[doc_id] >= min_score
+            ])
+        return results
+
+    def search(self, query: str, top_k: int = 3, min_score: float = 0.0) -> List[SemanticResult]:
+        """Devolver los `top_k` artículos más parecidos a la consulta."""
+        return self.search_batch([query], top_k=top_k, min_score=min_score)[0]
+
+
+def default_embedder() -> Embedder:
+    """Crear el embedder configurado en SEARCH_CONFIG["embedder"]."""
+    if SEARCH_CONFIG["embedder"] == "openai":
+        # Importación diferida: solo se necesita con embeddings remotos
+        from langchain_openai import OpenAIEmbeddings
+        return LangChainEmbedder(OpenAIEmbeddings(model=SEARCH_CONFIG["embedding_model"]))
+    return HashingEmbedder(dim=SEARCH_CONFIG["embedding_dim"])
+
+
+_index: Optional[EmbeddingIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Obtener el índice de embeddings compartido, construyéndolo la primera vez."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = EmbeddingIndex(get_support_data().knowledge_base, default_embedder(), KNOWLEDGE_BASE_ALIASES)
+    return _index
@@ -0,0 +1,134 @@
+"""
+Streaming de respuestas del asistente token a token
+Envuelve los modos de stream de LangGraph para la CLI y para llamadas programáticas
+"""
+
+import sys
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+from message_state import last_reply
+
+# Modos de stream: "messages" entrega tokens del LLM, "values" el estado completo y
+# "custom" los eventos de progreso de las herramientas (tool_executor.emit_tool_progress)
+STREAM_MODES = ["messages", "values", "custom"]
+
+# Eventos emitidos: ("token", delta) por cada fragmento, ("progress", evento) por cada
+# herramienta que empieza o termina y ("state", estado) al final
+StreamEvent = Tuple[str, Any]
+
+
+def _token_delta(chunk: Any, metadata: Dict[str, Any], nodes: Optional[Tuple[str, ...]]) -> str:
+    """Extraer el texto visible de un fragmento del LLM, ignorando llamadas a herramientas."""
+    if not isinstance(chunk, AIMessageChunk):
+        return ""
+    if nodes is not None and metadata.get("langgraph_node") not in nodes:
+        return ""
+    content = chunk.content
+    if isinstance(content, list):
+        # Algunos modelos devuelven bloques de contenido en lugar de texto plano
+        content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+
+def _unstreamed_reply(final_state: Optional[Dict[str, Any]]) -> str:
+    """
+    Texto de la respuesta final cuando no llegó ningún token.
+
+    Ocurre cuando la respuesta no pasó por el LLM (p. ej. un acierto de la
+    caché de respuestas); se emite completa como un único fragmento. Se lee
+    de `last_ai_message`, no del último mensaje de la historia, que puede
+    ser un ToolMessage.
+    """
+    if not final_state:
+        return ""
+    reply = last_reply(final_state)
+    return reply if isinstance(reply, str) else ""
+
+
+def stream_turn(app, state: Dict[str, Any], nodes: Optional[Tuple[str, ...]] = ("agent",),
+                config: Optional[Dict[str, Any]] = None) -> Iterator[StreamEvent]:
+    """
+    Ejecutar un turno del grafo emitiendo los tokens a medida que llegan.
+
+    Genera ("token", delta) por cada fragmento de texto del asistente,
+    ("progress", evento) cuando una herramienta empieza o termina, y
+    termina con ("state", estado_final), equivalente al resultado de invoke().
+    `config` se pasa al grafo (p. ej. el thread_id del checkpointer).
+    """
+    final_state = None
+    streamed = False
+    for mode, payload in app.stream(state, config, stream_mode=STREAM_MODES):
+        if mode == "messages":
+            delta = _token_delta(payload[0], payload[1], nodes)
+            if delta:
+                streamed = True
+                yield ("token", delta)
+        elif mode == "values":
+            final_state = payload
+        elif isinstance(payload, dict) and payload.get("type") == "tool_progress":
+            yield ("progress", payload)
+    reply = "" if streamed else _unstreamed_reply(final_state)
+    if reply:
+        yield ("token", reply)
+    yield ("state", final_state)
+
+
+async def astream_turn(app, state: Dict[str, Any], nodes: Optional[Tuple[str, ...]] = ("agent",),
+                       config: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamEvent]:
+    """Versión asíncrona de stream_turn basada en app.astream."""
+    final_state = None
+    streamed = False
+    async for mode, payload in app.astream(state, config, stream_mode=STREAM_MODES):
+        if mode == "messages":
+            delta = _token_delta(payload[0], payload[1], nodes)
+            if delta:
+                streamed = True
+                yield ("token", delta)
+        elif mode == "values":
+            final_state = payload
+        elif isinstance(payload, dict) and payload.get("type") == "tool_progress":
+            yield ("progress", payload)
+    reply = "" if streamed else _unstreamed_reply(final_state)
+    if reply:
+        yield ("token", reply)
+    yield ("state", final_state)
+
+
+def print_stream(events: Iterator[StreamEvent], prefix: str = "🤖 Assistant: ") -> Optional[Dict[str, Any]]:
+    """Imprimir los tokens en la terminal según llegan y devolver el estado final."""
+    final_state = None
+    started = False
+    for kind, payload in events:
+        if kind == "token":
+            if not started:
+                sys.stdout.write(prefix)
+                started = True
+            sys.stdout.write(payload)
+            sys.stdout.flush()
+        elif kind == "state":
+            final_state = payload
+    if started:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    return final_state
+
+
+async def aprint_stream(events: AsyncIterator[StreamEvent], prefix: str = "🤖 Assistant: ") -> Optional[Dict[str, Any]]:
+    """Versión asíncrona de print_stream."""
+    final_state = None
+    started = False
+    async for kind, payload in events:
+        if kind == "token":
+            if not started:
+                sys.stdout.write(prefix)
+                started = True
+            sys.stdout.write(payload)
+            sys.stdout.flush()
+        elif kind == "state":
+            final_state = payload
+    if started:
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    return final_state
@@ -0,0 +1,173 @@
+"""
+Cola de resúmenes en segundo plano
+Genera conversation_summary fuera del camino de la petición y guarda el resultado en SQLite
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config import SUMMARY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Una función de resumen recibe el estado de la conversación y devuelve la actualización
+# ({"conversation_summary": ..., "summarized_count": ...}), como generate_summary
+SummaryFunction = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class SummaryStore:
+    """Almacén persistente de resúmenes por sesión."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_summaries ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, summarized_count INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(self, session_id: str, summary: str, summarized_count: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversation_summaries (session_id, summary, summarized_count, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, summary, summarized_count, time.time())
+            )
+            self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Devolver {"summary", "summarized_count"} de la sesión, o None si no existe."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summarized_count FROM conversation_summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"summary": row[0], "summarized_count": row[1]}
+
+
+class SummaryQueue:
+    """
+    Cola de trabajo que calcula los resúmenes con hilos en segundo plano.
+
+    submit() solo copia el estado y lo encola, así que el final de la
+    conversación no espera al LLM. Los hilos se crean en el primer envío y,
+    al salir del proceso, se espera a que terminen los resúmenes pendientes.
+    Con `background=False` el resumen se calcula dentro de submit().
+    """
+
+    def __init__(self, summarize: SummaryFunction, store: Optional[SummaryStore] = None, workers: int = 1,
+                 background: bool = True):
+        self.summarize = summarize
+        self.store = store
+        self.workers = workers
+        self.background = background
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._exit_hook = False
+        self.completed = 0
+        self.failed = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            if self.store is None:
+                self.store = get_summary_store()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"summary-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if not self._exit_hook:
+                atexit.register(self.shutdown)
+                self._exit_hook = True
+
+    def submit(self, session_id: str, state: Dict[str, Any]) -> None:
+        """Encolar el resumen de una conversación terminada."""
+        # Copia superficial: la sesión puede seguir modificando su lista de mensajes
+        snapshot = dict(state, messages=list(state["messages"]))
+        with self._lock:
+            self._pending += 1
+        if not self.background:
+            self._run(session_id, snapshot)
+            return
+        self._start()
+        self._queue.put((session_id, snapshot))
+
+    def _run(self, session_id: str, state: Dict[str, Any]) -> None:
+        """Calcular y guardar un resumen; los errores se registran sin detener la cola."""
+        try:
+            update = self.summarize(state) or {}
+            summary = update.get("conversation_summary", state.get("conversation_summary", ""))
+            summarized_count = update.get("summarized_count", state.get("summarized_count", 0))
+            (self.store or get_summary_store()).save(session_id, summary, summarized_count)
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            logger.error(f"Error summarizing session {session_id}: {str(e)}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                self._queue.task_done()
+
+    def __len__(self) -> int:
+        """Resúmenes pendientes: en cola más en curso."""
+        return self._pending
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self), "completed": self.completed, "failed": self.failed}
+
+    def join(self) -> None:
+        """Esperar a que se procesen todos los resúmenes encolados."""
+        if self._threads:
+            self._queue.join()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Detener los hilos; con `wait` se terminan antes los resúmenes pendientes."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+_store: Optional[SummaryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_summary_store() -> SummaryStore:
+    """Obtener el almacén de resúmenes compartido, abriéndolo la primera vez."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SummaryStore(SUMMARY_CONFIG["store_path"])
+    return _store
+
+
+def create_summary_queue(summarize: SummaryFunction) -> SummaryQueue:
+    """Crear una cola con la configuración de SUMMARY_CONFIG; el almacén compartido se abre en el primer envío."""
+    return SummaryQueue(summarize, workers=SUMMARY_CONFIG["workers"], background=SUMMARY_CONFIG["background"])
@@ -0,0 +1,73 @@
+"""
+Capa de datos compartida del chatbot
+Carga una sola vez la base de conocimientos, clientes, estados de pedido y prioridades de tickets
+"""
+
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from config import CUSTOMER_DATA, KNOWLEDGE_BASE, ORDER_STATUSES, TICKET_CONFIG
+
+# Variable de entorno con la ruta de un fichero JSON que sustituye a los datos de config.py
+DATA_FILE_ENV = "SUPPORT_DATA_FILE"
+
+
+class SupportData:
+    """
+    Datos de soporte precargados y de solo lectura.
+
+    Las herramientas consultan estas vistas en lugar de construir sus
+    diccionarios en cada llamada.
+    """
+
+    __slots__ = ("knowledge_base", "customers", "order_statuses", "order_status_keys", "priority_levels")
+
+    def __init__(self, knowledge_base: Mapping[str, str], customers: Mapping[str, Dict[str, Any]],
+                 order_statuses: Mapping[str, str], priority_levels: Mapping[str, str]):
+        self.knowledge_base: Mapping[str, str] = MappingProxyType(dict(knowledge_base))
+        self.customers: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+            {email: MappingProxyType(dict(data)) for email, data in customers.items()}
+        )
+        self.order_statuses: Mapping[str, str] = MappingProxyType(dict(order_statuses))
+        self.order_status_keys: Tuple[str, ...] = tuple(order_statuses)
+        self.priority_levels: Mapping[str, str] = MappingProxyType(dict(priority_levels))
+
+    @classmethod
+    def from_config(cls) -> "SupportData":
+        """Crear los datos a partir de config.py."""
+        return cls(KNOWLEDGE_BASE, CUSTOMER_DATA, ORDER_STATUSES, TICKET_CONFIG["priority_levels"])
+
+    @classmethod
+    def from_file(cls, path: str) -> "SupportData":
+        """
+        Cargar los datos desde un fichero JSON.
+
+        Las secciones que falten ("knowledge_base", "customers",
+        "order_statuses", "priority_levels") se toman de config.py.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data.get("knowledge_base", KNOWLEDGE_BASE),
+            data.get("customers", CUSTOMER_DATA),
+            data.get("order_statuses", ORDER_STATUSES),
+            data.get("priority_levels", TICKET_CONFIG["priority_levels"])
+        )
+
+
+_data: Optional[SupportData] = None
+_data_lock = threading.Lock()
+
+
+def get_support_data() -> SupportData:
+    """Obtener los datos compartidos, cargándolos la primera vez."""
+    global _data
+    if _data is None:
+        with _data_lock:
+            if _data is None:
+                path = os.getenv(DATA_FILE_ENV)
+                _data = SupportData.from_file(path) if path else SupportData.from_config()
+    return _data
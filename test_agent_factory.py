@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la fábrica de runnables del agente
+Un runnable por LLM, conjunto de herramientas (nombres y esquemas) y prompt
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.tools import tool
+from langchain_openai import ChatOpenAI
+
+import agent_factory
+from agent_factory import clear_agent_cache, get_agent_runnable, get_summary_runnable
+
+PROMPT = "You are a helpful assistant."
+
+
+@tool
+def check_order_status(order_number: str) -> str:
+    """Check the status of an order."""
+    return order_number
+
+
+def make_other_check_order_status():
+    @tool
+    def check_order_status(order_number: str, include_history: bool = False) -> str:
+        """Check the status of an order, optionally with its history."""
+        return order_number
+
+    return check_order_status
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_agent_cache()
+    yield
+    clear_agent_cache()
+
+
+def llm():
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
+
+
+def test_same_llm_and_tools_reuse_the_runnable():
+    model = llm()
+    assert get_agent_runnable(model, [check_order_status], PROMPT, cache=False) is \
+        get_agent_runnable(model, [check_order_status], PROMPT, cache=False)
+    assert get_summary_runnable(model, PROMPT) is get_summary_runnable(model, PROMPT)
+
+
+def test_tools_with_the_same_names_but_other_schemas_get_their_own_runnable():
+    model = llm()
+    agent = get_agent_runnable(model, [check_order_status], PROMPT, cache=False)
+    other = get_agent_runnable(model, [make_other_check_order_status()], PROMPT, cache=False)
+    assert other is not agent
+    assert "include_history" in str(other.last.kwargs["tools"])
+    assert "include_history" not in str(agent.last.kwargs["tools"])
+
+
+def test_llm_instances_with_the_same_settings_do_not_share_runnables():
+    first, second = llm(), llm()
+    agent = get_agent_runnable(first, [check_order_status], PROMPT, cache=False)
+    other = get_agent_runnable(second, [check_order_status], PROMPT, cache=False)
+    assert other is not agent and other.last.bound is second
+    assert get_summary_runnable(second, PROMPT).last is second
+
+
+def test_schema_hash_is_computed_once_per_tool_set(monkeypatch):
+    calls = []
+    original = agent_factory.tools_schema_hash
+    monkeypatch.setattr(agent_factory, "tools_schema_hash", lambda tools: calls.append(tools) or original(tools))
+    model = llm()
+    for _ in range(3):
+        get_agent_runnable(model, [check_order_status], PROMPT, cache=False)
+    assert len(calls) == 1
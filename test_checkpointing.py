@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los checkpoints de conversación
+Estado del grafo guardado por thread_id, mensajes como deltas, compactación y reanudación desde otro checkpointer
+"""
+
+import asyncio
+import importlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Annotated, List, TypedDict
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Overwrite
+
+from checkpointing import DeltaCheckpointSaver, SQLiteCheckpointStore, thread_config
+from message_state import MessageHistory, append_messages
+
+GRAPH_MODULES = ["modern_customer_support", "configurable_customer_support", "simple_customer_support",
+                 "simple_modern_customer_support", "enhanced_customer_support"]
+
+
+def order_lookup_llm():
+    """LLM falso que responde a cada pregunta con una llamada a check_order_status."""
+    calls = []
+
+    def llm(inputs):
+        calls.append(inputs)
+        return AIMessage(content="", tool_calls=[{"name": "check_order_status",
+                                                  "args": {"order_number": f"12345{len(calls)}"},
+                                                  "id": f"call-{len(calls)}"}])
+
+    return RunnableLambda(llm)
+
+
+@pytest.mark.parametrize("module_name", GRAPH_MODULES)
+def test_tool_usage_count_is_checkpointed(module_name, monkeypatch, tmp_path):
+    module = importlib.import_module(module_name)
+    monkeypatch.setattr(module, "get_agent_runnable", lambda *args, **kwargs: order_lookup_llm())
+    if hasattr(module, "final_response_chain"):
+        monkeypatch.setattr(module, "final_response_chain", RunnableLambda(lambda inputs: AIMessage(content="Done")))
+    path = str(tmp_path / "checkpoints.db")
+    app = module.workflow.compile(checkpointer=DeltaCheckpointSaver(SQLiteCheckpointStore(path)))
+    config = thread_config("session-1")
+
+    for question in ("Check order 123451", "And order 123452"):
+        app.invoke({"messages": [HumanMessage(content=question)]}, config)
+
+    assert app.get_state(config).values["tool_usage_count"] == {"check_order_status": 2}
+    resumed = module.workflow.compile(checkpointer=DeltaCheckpointSaver(SQLiteCheckpointStore(path)))
+    assert resumed.get_state(config).values["tool_usage_count"] == {"check_order_status": 2}
+
+
+class State(TypedDict):
+    messages: Annotated[List[BaseMessage], append_messages]
+
+
+def echo_graph(store, compact_after=None):
+    """Grafo mínimo: responde a cada pregunta y, si la historia pasa de `compact_after`, la sustituye por un resumen."""
+
+    def reply(state):
+        messages = state["messages"]
+        response = AIMessage(content=f"Answer to: {messages[-1].content}")
+        if compact_after is not None and len(messages) > compact_after:
+            return {"messages": Overwrite([AIMessage(content="Summary"), messages[-1], response])}
+        return {"messages": [response]}
+
+    graph = StateGraph(State)
+    graph.add_node("reply", reply)
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=DeltaCheckpointSaver(store))
+
+
+def ask(app, thread_id, question):
+    return app.invoke({"messages": [HumanMessage(content=question)]}, thread_config(thread_id))
+
+
+def logged_messages(store, thread_id):
+    return store.message_count(thread_id, "")
+
+
+def test_each_turn_logs_only_the_new_messages(tmp_path):
+    store = SQLiteCheckpointStore(str(tmp_path / "checkpoints.db"))
+    app = echo_graph(store)
+    for turn in range(1, 6):
+        state = ask(app, "t1", f"question {turn}")
+        # Sin deltas el registro crecería con la historia entera en cada turno
+        assert logged_messages(store, "t1") == 2 * turn
+    assert isinstance(state["messages"], MessageHistory) and len(state["messages"]) == 10
+
+
+def test_compacted_history_is_logged_once_and_resumed(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    store = SQLiteCheckpointStore(path)
+    app = echo_graph(store, compact_after=4)
+    for turn in range(1, 4):
+        state = ask(app, "t1", f"question {turn}")
+    assert [m.content for m in state["messages"]] == ["Summary", "question 3", "Answer to: question 3"]
+    # Turnos 1-2 (4 mensajes) + pregunta 3 + la historia compactada añadida completa una vez
+    assert logged_messages(store, "t1") == 4 + 1 + 3
+    resumed = echo_graph(SQLiteCheckpointStore(path), compact_after=4)
+    assert [m.content for m in resumed.get_state(thread_config("t1")).values["messages"]] == \
+        ["Summary", "question 3", "Answer to: question 3"]
+
+
+def test_fresh_saver_resumes_and_keeps_appending_deltas(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    app = echo_graph(SQLiteCheckpointStore(path))
+    ask(app, "t1", "question 1")
+    ask(app, "t1", "question 2")
+    store = SQLiteCheckpointStore(path)
+    resumed = echo_graph(store)
+    state = ask(resumed, "t1", "question 3")
+    assert [m.content for m in state["messages"]][-3:] == ["Answer to: question 2", "question 3",
+                                                           "Answer to: question 3"]
+    assert len(state["messages"]) == 6 and logged_messages(store, "t1") == 6
+
+
+def test_concurrent_appends_get_distinct_positions(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    SQLiteCheckpointStore(path)
+    starts = []
+
+    def writer():
+        # Una conexión por hilo: en SQLite es lo mismo que otro proceso abriendo el fichero
+        store = SQLiteCheckpointStore(path)
+        for i in range(50):
+            starts.append(store.append_messages("t1", "", [("msgpack", b"a"), ("msgpack", b"b")]))
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(starts) == list(range(0, 400, 2))
+    assert SQLiteCheckpointStore(path).message_count("t1", "") == 400
+
+
+def test_blobs_and_checkpoint_are_written_in_one_transaction(tmp_path):
+    store = SQLiteCheckpointStore(str(tmp_path / "checkpoints.db"))
+    # El checkpoint no es válido (type NULL): los valores de sus canales tampoco deben quedar guardados
+    with pytest.raises(sqlite3.IntegrityError):
+        store.put_checkpoint("t1", "", "c1", (None, b""), ("msgpack", b""), None,
+                             [("customer_info", "1", ("msgpack", b"x"))])
+    assert store.get_blob("t1", "", "customer_info", "1") is None and store.get_checkpoint("t1", "") is None
+
+
+class SlowStore(SQLiteCheckpointStore):
+    """Almacén que tarda en escribir, como un SQLite ocupado por otro proceso."""
+
+    def put_checkpoint(self, *args, **kwargs):
+        time.sleep(0.05)
+        super().put_checkpoint(*args, **kwargs)
+
+
+def test_async_saver_does_not_block_the_event_loop(tmp_path):
+    app = echo_graph(SlowStore(str(tmp_path / "checkpoints.db")))
+    ticks = []
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.005)
+
+    async def main():
+        done = asyncio.Event()
+        task = asyncio.create_task(ticker(done))
+        state = await app.ainvoke({"messages": [HumanMessage(content="question")]}, thread_config("t1"))
+        done.set()
+        await task
+        return state
+
+    started = time.monotonic()
+    state = asyncio.run(main())
+    assert state["messages"][-1].content == "Answer to: question"
+    # Cada escritura espera 50 ms; con el almacén en el event loop el ticker no avanzaría mientras tanto
+    assert time.monotonic() - started >= 0.1
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.04
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la ventana de contexto
+Mensajes recientes dentro del presupuesto, sin separar llamadas a herramientas de sus resultados
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from context_window import fit_context
+from message_state import MessageHistory
+
+
+def count_messages(messages):
+    """Contador de prueba: cada mensaje cuesta un token."""
+    return len(messages)
+
+
+def tool_turn(i):
+    return [HumanMessage(content=f"question {i}"),
+            AIMessage(content="", tool_calls=[{"name": "check_order_status", "args": {}, "id": f"a{i}"},
+                                              {"name": "check_order_status", "args": {}, "id": f"b{i}"}]),
+            ToolMessage(content="shipped", tool_call_id=f"a{i}"),
+            ToolMessage(content="shipped", tool_call_id=f"b{i}"),
+            AIMessage(content=f"answer {i}")]
+
+
+def test_keeps_system_messages_and_the_most_recent_messages():
+    system = SystemMessage(content="summary")
+    history = [system] + [HumanMessage(content=f"m{i}") for i in range(10)]
+    window = fit_context(history, max_tokens=4, token_counter=count_messages)
+    assert window == [system] + history[-3:]
+
+
+def test_tool_calls_are_never_separated_from_their_results():
+    history = tool_turn(1) + tool_turn(2)
+    window = fit_context(history, max_tokens=3, token_counter=count_messages)
+    # Cabrían las ToolMessage sueltas, pero no el bloque con su AIMessage: se queda fuera entero
+    assert window == [history[-1]]
+    window = fit_context(history, max_tokens=4, token_counter=count_messages)
+    assert window == history[-4:] and isinstance(window[0], AIMessage) and window[0].tool_calls
+
+
+def test_latest_block_is_always_sent_and_history_views_work():
+    history = MessageHistory(tool_turn(1)[:4])
+    assert fit_context(history, max_tokens=1, token_counter=count_messages) == list(history[1:])
+    assert fit_context(MessageHistory(), max_tokens=10) == []
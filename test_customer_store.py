@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pruebas del repositorio de clientes
+Búsqueda por email normalizado, importación CSV/JSONL, caché LRU y emails inexistentes
+"""
+
+import json
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+
+from customer_store import (CustomerRecord, CustomerRepository, InMemoryCustomerRepository,
+                            SQLiteCustomerRepository, read_customer_file)
+
+JANE = {"name": "Jane Doe", "orders": 3, "total_spent": "$120.00", "last_order": "2024-01-10",
+        "loyalty_tier": "Gold", "preferences": ["email", "sms, weekends"]}
+
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        CustomerRepository()
+
+
+def test_memory_repository_normalizes_email():
+    repository = InMemoryCustomerRepository({"Jane@Example.com": JANE})
+    record = repository.get("  jane@example.COM ")
+    assert record.name == "Jane Doe" and record.orders == 3 and record.preferences == ("email", "sms, weekends")
+    assert repository.get("john@example.com") is None
+
+
+def test_sqlite_repository_round_trips_preferences_as_json(tmp_path):
+    path = str(tmp_path / "customers.db")
+    SQLiteCustomerRepository(path).put_many([CustomerRecord.from_mapping("Jane@Example.com", JANE)])
+    record = SQLiteCustomerRepository(path).get("jane@example.com")
+    # Una preferencia con coma no se parte en dos
+    assert record.email == "Jane@Example.com" and record.preferences == ("email", "sms, weekends")
+
+
+def test_sqlite_repository_caches_hits_lru(tmp_path):
+    repository = SQLiteCustomerRepository(str(tmp_path / "customers.db"), cache_size=2)
+    repository.put_many(CustomerRecord(f"c{i}@example.com", f"Customer {i}") for i in range(3))
+    for email in ("c0@example.com", "c1@example.com", "c0@example.com", "c2@example.com", "c1@example.com"):
+        repository.get(email)
+    assert (repository.hits, repository.misses) == (1, 4)
+
+
+def test_missing_customer_is_found_after_another_process_adds_it(tmp_path):
+    path = str(tmp_path / "customers.db")
+    repository = SQLiteCustomerRepository(path)
+    assert repository.get("new@example.com") is None
+    SQLiteCustomerRepository(path).put_many([CustomerRecord("new@example.com", "New Customer")])
+    assert repository.get("new@example.com").name == "New Customer"
+
+
+def test_put_many_invalidates_cached_profiles(tmp_path):
+    repository = SQLiteCustomerRepository(str(tmp_path / "customers.db"))
+    repository.put_many([CustomerRecord("jane@example.com", "Jane", orders=1)])
+    assert repository.get("jane@example.com").orders == 1
+    repository.put_many([CustomerRecord("jane@example.com", "Jane", orders=2)])
+    assert repository.get("jane@example.com").orders == 2
+
+
+def test_import_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "customers.csv"
+    csv_path.write_text("email,name,orders,total_spent,last_order,loyalty_tier,preferences\n"
+                        'a@example.com,Ann,2,$10.00,2024-02-01,Silver,"email,sms"\n'
+                        'b@example.com,Bob,1,$5.00,2024-02-02,Bronze,"[""phone, evenings""]"\n', encoding="utf-8")
+    jsonl_path = tmp_path / "customers.jsonl"
+    jsonl_path.write_text(json.dumps(dict(JANE, email="jane@example.com")) + "\n\n", encoding="utf-8")
+    assert [r.preferences for r in read_customer_file(str(csv_path))] == [("email", "sms"), ("phone, evenings",)]
+    repository = SQLiteCustomerRepository(str(tmp_path / "customers.db"))
+    assert repository.import_file(str(csv_path)) + repository.import_file(str(jsonl_path)) == 3
+    assert len(repository) == 3 and repository.get("A@example.com").orders == 2
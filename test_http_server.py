@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Pruebas del servidor HTTP
+Orden de los turnos por sesión, límite de la cola, apagado ordenado y errores sin detalles internos
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from http_server import INTERNAL_ERROR, ServerBusyError, SessionPool, create_web_app
+
+
+async def hold_turn(pool, session_id, events, release):
+    async with pool.turn(session_id):
+        events.append(f"{session_id} start")
+        await release.wait()
+        events.append(f"{session_id} end")
+
+
+def test_turns_of_a_session_run_in_order_and_other_sessions_in_parallel():
+    async def main():
+        pool = SessionPool(max_concurrent=4)
+        events = []
+        release_first, release_rest = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(hold_turn(pool, "s1", events, release_first))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold_turn(pool, "s1", events, release_rest))
+        other = asyncio.create_task(hold_turn(pool, "s2", events, release_rest))
+        await asyncio.sleep(0.01)
+        # El segundo turno de s1 espera al primero; s2 no espera a nadie
+        assert events == ["s1 start", "s2 start"] and pool.waiting == 1 and pool.active == 2
+        release_first.set()
+        await asyncio.sleep(0.01)
+        release_rest.set()
+        await asyncio.gather(first, second, other)
+        assert events.index("s1 end") < events.index("s1 start", 1)
+        assert pool.stats()["sessions_in_flight"] == 0 and pool.completed == 3
+
+    asyncio.run(main())
+
+
+def test_turns_beyond_the_queue_limit_are_rejected():
+    async def main():
+        pool = SessionPool(max_concurrent=1, max_queued=1)
+        events, release = [], asyncio.Event()
+        running = asyncio.create_task(hold_turn(pool, "s1", events, release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold_turn(pool, "s2", events, release))
+        await asyncio.sleep(0.01)
+        assert pool.active == 1 and pool.waiting == 1
+        with pytest.raises(ServerBusyError, match="too many queued turns"):
+            async with pool.turn("s3"):
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        assert pool.rejected == 1 and pool.completed == 2
+
+    asyncio.run(main())
+
+
+def test_drain_waits_for_running_turns_and_rejects_new_ones():
+    async def main():
+        pool = SessionPool()
+        events, release = [], asyncio.Event()
+        running = asyncio.create_task(hold_turn(pool, "s1", events, release))
+        await asyncio.sleep(0)
+        assert await pool.drain(0.01) is False
+        with pytest.raises(ServerBusyError, match="shutting down"):
+            async with pool.turn("s2"):
+                pass
+        asyncio.get_running_loop().call_later(0.01, release.set)
+        assert await pool.drain(1) is True
+        await running
+        assert events == ["s1 start", "s1 end"]
+
+    asyncio.run(main())
+
+
+class FailingGraph:
+    """Grafo con checkpointer cuyo turno falla con un detalle interno."""
+
+    checkpointer = object()
+
+    async def ainvoke(self, state, config):
+        raise RuntimeError("sqlite3.OperationalError: database is locked at /srv/checkpoints.db")
+
+
+def test_unexpected_errors_do_not_leak_details():
+    async def main():
+        async with TestClient(TestServer(create_web_app(FailingGraph()))) as client:
+            response = await client.post("/sessions/s1/messages", json={"message": "Where is my order?"})
+            assert response.status == 500
+            assert await response.json() == {"error": INTERNAL_ERROR}
+
+    asyncio.run(main())
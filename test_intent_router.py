@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Pruebas del enrutador de preguntas frecuentes
+Solo responde sin LLM las preguntas cortas de un único tema y sin datos del cliente
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END
+
+from config import ROUTER_CONFIG
+from intent_router import FaqRouter, needs_model
+
+KNOWLEDGE_BASE = {"return policy": "Returns within 30 days.", "shipping": "Shipping takes 3-5 days.",
+                  "warranty": "One-year warranty."}
+
+
+def router(**kwargs):
+    return FaqRouter(ROUTER_CONFIG["intents"], KNOWLEDGE_BASE, max_words=ROUTER_CONFIG["max_words"],
+                     blockers=ROUTER_CONFIG["blockers"], **kwargs)
+
+
+def ask(question):
+    return {"messages": [HumanMessage(content=question)]}
+
+
+def test_single_intent_questions_are_answered_from_the_knowledge_base():
+    update = router().route(ask("What is your return policy?"))
+    assert update["messages"][0].content == "Returns within 30 days."
+    assert update["last_ai_message"].response_metadata["router_intent"] == "return policy"
+    assert needs_model(dict(ask("What is your return policy?"), messages=update["messages"])) == END
+
+
+def test_ambiguous_personal_or_long_questions_go_to_the_agent():
+    faq = router()
+    for question in ["What is your return policy and how long does shipping take?",
+                     "My return was never processed, what is your return policy?",
+                     "Return policy for order 123456789?",
+                     "I would like to know, if it is not too much trouble, what exactly your return policy says "
+                     "about items bought on sale"]:
+        assert faq.route(ask(question)) == {}, question
+    assert needs_model(ask("Where is my order?")) == "agent"
+
+
+def test_intents_without_an_article_and_disabled_router_are_ignored():
+    assert router().classify("Do you sell gift cards?") is None
+    assert router(enabled=False).route(ask("What is your return policy?")) == {}
+    assert router().route({"messages": [AIMessage(content="Hi")]}) == {}
+
+
+def test_stats_count_hits_and_model_latency():
+    faq = router()
+    faq.route(ask("Tell me about the warranty"))
+    faq.route(ask("Where is my order 123456789?"))
+    faq.timed(lambda state: {})({})
+    stats = faq.stats()
+    assert (stats["turns"], stats["hits"], stats["hit_rate"]) == (2, 1, 0.5)
+    faq.reset_stats()
+    assert faq.stats()["turns"] == 0
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice BM25 de la base de conocimientos
+Orden por puntuación, truncado a top_k y descarte por puntuación relativa
+"""
+
+import pytest
+
+from config import KNOWLEDGE_BASE
+from knowledge_base import KnowledgeBaseIndex, clamp_top_k, format_results, tokenize
+
+
+@pytest.fixture(scope="module")
+def index():
+    return KnowledgeBaseIndex(KNOWLEDGE_BASE)
+
+
+def test_query_with_two_topics_returns_both_best_first(index):
+    results = index.search("shipping refund", top_k=5)
+    assert [result.topic for result in results[:2]] == ["shipping", "refund"]
+    scores = [result.score for result in results]
+    assert scores == sorted(scores, reverse=True)
+    # Los artículos que solo mencionan uno de los términos quedan claramente por detrás
+    assert results[1].score > 2 * results[2].score
+
+
+def test_topic_phrase_outranks_articles_that_only_share_words(index):
+    results = index.search("return policy for damaged items", top_k=5)
+    assert [result.topic for result in results[:2]] == ["return policy", "damaged"]
+
+
+def test_top_k_keeps_the_best_results_in_order(index):
+    full = index.search("shipping refund", top_k=5)
+    assert index.search("shipping refund", top_k=1) == full[:1]
+    assert index.search("shipping refund", top_k=3) == full[:3]
+    assert index.search("shipping refund", top_k=0) == []
+
+
+def test_min_relative_score_drops_weak_passages(index):
+    everything = index.search("shipping refund", top_k=5)
+    kept = index.search("shipping refund", top_k=5, min_relative_score=0.5)
+    assert [result.topic for result in kept] == ["shipping", "refund"]
+    assert all(result.score >= everything[0].score * 0.5 for result in kept)
+    assert index.search("shipping refund", top_k=5, min_relative_score=0.0) == everything
+
+
+def test_queries_without_known_terms_return_nothing(index):
+    assert index.search("xyz qwerty") == []
+    assert index.search("the and of") == []
+    assert KnowledgeBaseIndex({}).search("shipping") == []
+
+
+def test_term_frequency_and_article_length_affect_the_score():
+    index = KnowledgeBaseIndex({
+        "short": "Refunds take five days.",
+        "repeated": "Refunds, refunds and more refunds are processed weekly by our team.",
+        "long": "Refunds are mentioned once in this much longer article about many unrelated store topics.",
+    }, topic_weight=1.0)
+    assert [result.topic for result in index.search("refund")] == ["repeated", "short", "long"]
+
+
+def test_helpers():
+    assert tokenize("Where are my Returns?") == ["return"]
+    assert clamp_top_k(None) >= 1 and clamp_top_k(100) == clamp_top_k(1000) and clamp_top_k(-3) == 1
+    results = KnowledgeBaseIndex(KNOWLEDGE_BASE).search("shipping refund", top_k=2)
+    assert format_results(results[:1]) == KNOWLEDGE_BASE["shipping"]
+    assert format_results(results).startswith("[shipping] ")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Pruebas del canal de mensajes
+MessageHistory se amplía sin copiar la historia y sin modificar las vistas anteriores
+"""
+
+import os
+import pickle
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from message_state import HistorySerializer, MessageHistory, append_messages, last_reply, turn_input
+
+
+def messages(count, prefix="m"):
+    return [HumanMessage(content=f"{prefix}{i}") for i in range(count)]
+
+
+def test_reducer_appends_without_copying_the_history():
+    history = append_messages([], messages(3))
+    longer = append_messages(history, AIMessage(content="reply"))
+    assert isinstance(longer, MessageHistory) and len(longer) == 4
+    # La vista nueva comparte la lista de la anterior: escribir no copia la historia
+    assert longer._items is history._items
+    assert append_messages(longer, []) is longer
+
+
+def test_previous_views_do_not_change():
+    history = MessageHistory(messages(2))
+    longer = history.extended(messages(1, "new"))
+    assert len(history) == 2 and list(history) == messages(2)
+    assert history[-1].content == "m1" and longer[-1].content == "new0"
+    with pytest.raises(IndexError):
+        history[2]
+    assert history[1:] == [HumanMessage(content="m1")] and longer[-2:] == messages(2)[1:] + messages(1, "new")
+
+
+def test_extending_an_older_view_branches_once():
+    history = MessageHistory(messages(2))
+    main = history.extended(messages(1, "main"))
+    branch = history.extended(messages(1, "branch"))
+    assert branch._items is not main._items
+    assert [m.content for m in main] == ["m0", "m1", "main0"]
+    assert [m.content for m in branch] == ["m0", "m1", "branch0"]
+
+
+def test_history_behaves_like_a_list():
+    history = MessageHistory(messages(3))
+    assert history == messages(3) and history != messages(2)
+    assert history + messages(1, "x") == messages(3) + messages(1, "x")
+    assert [m.content for m in reversed(history)] == ["m2", "m1", "m0"]
+    assert pickle.loads(pickle.dumps(history)) == history
+
+
+def test_history_serializer_stores_a_plain_list():
+    serde = HistorySerializer()
+    history = MessageHistory(messages(2)).extended(messages(1, "x"))
+    assert serde.loads_typed(serde.dumps_typed(history)) == list(history)
+
+
+@pytest.mark.parametrize("module_name", ["customer_support_bot", "fixed_customer_support_bot"])
+def test_original_variants_return_only_new_messages(module_name, monkeypatch):
+    module = __import__(module_name)
+    seen = []
+
+    def llm(inputs):
+        seen.append(len(inputs["messages"]))
+        return AIMessage(content=f"Answer {len(seen)}")
+
+    monkeypatch.setattr(module, "get_agent_runnable", lambda *args, **kwargs: RunnableLambda(llm))
+    state = {"messages": [], "next": ""}
+    for question in ("What is your return policy?", "How long does shipping take?"):
+        state = module.app.invoke(turn_input(module.app, state, [HumanMessage(content=question)]))
+    assert [m.content for m in state["messages"]] == ["What is your return policy?", "Answer 1",
+                                                      "How long does shipping take?", "Answer 2"]
+    assert last_reply(state) == "Answer 2" and seen == [1, 3]
+
+
+def test_turn_input_sends_only_new_messages_with_a_checkpointer():
+    question = HumanMessage(content="Where is my order?")
+    state = {"messages": messages(4), "customer_info": {"name": "Jane"}, "conversation_summary": "..."}
+    with_checkpointer = type("App", (), {"checkpointer": object()})()
+    without_checkpointer = type("App", (), {"checkpointer": None})()
+    assert turn_input(with_checkpointer, state, [question]) == {"messages": [question]}
+    full = turn_input(without_checkpointer, state, [question])
+    assert full["messages"] == messages(4) + [question] and full["customer_info"] == {"name": "Jane"}
+
+
+def test_turn_input_extends_the_history_without_a_checkpointer(monkeypatch):
+    import customer_support_bot as module
+
+    monkeypatch.setattr(module, "get_agent_runnable",
+                        lambda *args, **kwargs: RunnableLambda(lambda inputs: AIMessage(content="reply")))
+    state = {"messages": [], "next": ""}
+    items = []
+    for turn in range(3):
+        state = module.app.invoke(turn_input(module.app, state, [HumanMessage(content=f"question {turn}")]))
+        items.append(state["messages"]._items)
+    # Todos los turnos amplían la misma lista: ni turn_input ni el reductor copian la historia
+    assert items[0] is items[1] is items[2] and len(state["messages"]) == 6
+    assert append_messages([], state["messages"]) is state["messages"]
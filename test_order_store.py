@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Pruebas del backend de estados de pedido
+Simulador determinista, almacén SQLite con consultas por lotes, caché con TTL y texto de la herramienta
+"""
+
+import os
+import subprocess
+import sys
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+
+import order_store
+from order_store import (CachedOrderBackend, OrderStatusBackend, SimulatedOrderBackend, SQLiteOrderStore,
+                         describe_order_statuses)
+
+STATUS_KEYS = ["processing", "shipped", "delivered"]
+
+
+class CountingBackend(OrderStatusBackend):
+    """Backend que registra cada llamada que recibe."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = []
+
+    def get_status(self, order_number):
+        self.calls.append([order_number])
+        return self.statuses.get(order_number)
+
+    def get_statuses(self, order_numbers):
+        self.calls.append(list(order_numbers))
+        return {order_number: self.statuses.get(order_number) for order_number in order_numbers}
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        OrderStatusBackend()
+
+
+def test_simulated_status_is_the_same_in_every_process():
+    backend = SimulatedOrderBackend(STATUS_KEYS)
+    code = ("from order_store import SimulatedOrderBackend; "
+            f"print(SimulatedOrderBackend({STATUS_KEYS!r}).get_status('123456789'))")
+    other = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                           env=dict(os.environ, PYTHONHASHSEED="random"), cwd=os.path.dirname(order_store.__file__))
+    assert other.stdout.strip() == backend.get_status("123456789")
+
+
+def test_sqlite_store_batches_lookups_and_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(order_store, "MAX_SQL_PARAMS", 2)
+    fallback = CountingBackend({"999": "delivered"})
+    store = SQLiteOrderStore(str(tmp_path / "orders.db"), fallback=fallback)
+    store.put_many([("100", "shipped"), ("101", "processing"), ("102", "delivered")])
+    assert store.get_statuses(["100", "101", "102", "999", "404", "100"]) == {
+        "100": "shipped", "101": "processing", "102": "delivered", "999": "delivered", "404": None}
+    assert fallback.calls == [["999", "404"]]
+    store.put_status("100", "delivered")
+    assert store.get_status("100") == "delivered" and len(store) == 3
+
+
+def test_cache_serves_hits_and_remembers_missing_orders():
+    backend = CountingBackend({"100": "shipped"})
+    cached = CachedOrderBackend(backend, max_entries=10, ttl_seconds=60)
+    assert cached.get_statuses(["100", "404"]) == {"100": "shipped", "404": None}
+    assert cached.get_status("100") == "shipped" and cached.get_status("404") is None
+    assert backend.calls == [["100", "404"]] and (cached.hits, cached.misses) == (2, 2)
+
+
+def test_describe_order_statuses_uses_one_backend_call(monkeypatch):
+    backend = CountingBackend({"123456789": "shipped"})
+    monkeypatch.setattr(order_store, "_backend", backend)
+    text = describe_order_statuses(["123456789", "12", "987654321", "123456789"], min_length=6, max_orders=2)
+    lines = text.split("\n")
+    assert lines[0].startswith("Order 123456789: ") and "Invalid order number" in lines[1]
+    assert lines[2] == "Only the first 2 orders were checked."
+    assert backend.calls == [["123456789"]]
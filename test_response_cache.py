@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de respuestas del LLM
+Coincidencia exacta, caché semántica (aciertos correctos y respuestas ajenas) y preguntas personales
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+import response_cache
+from response_cache import (CachedRunnable, MemoryCacheBackend, ResponseCache, SemanticResponseCache,
+                            SQLiteCacheBackend, semantic_cache_enabled, standalone_question)
+from semantic_search import HashingEmbedder
+
+# Embedder de prueba que se comporta como un modelo real: agrupa por significado, no por palabras
+CONCEPTS = {
+    "return policy": ["what is your return policy?", "can i send it back?", "¿cuál es su política de devoluciones?"],
+    "sunday hours": ["is the store open on sunday?"],
+    "monday hours": ["is the store open on monday?"],
+    "shipping time": ["how long does shipping take?", "when will things arrive after i order?"],
+    "international shipping": ["how long does international shipping take?"],
+}
+CONCEPT_OF = {question: index for index, questions in enumerate(CONCEPTS.values()) for question in questions}
+
+
+def concept_embedder(texts):
+    vectors = []
+    for text in texts:
+        vector = np.zeros(len(CONCEPTS) + 1, dtype=np.float32)
+        vector[CONCEPT_OF.get(text, len(CONCEPTS))] = 1.0
+        vectors.append(vector)
+    return vectors
+
+
+def ask(question):
+    return {"messages": [HumanMessage(content=question)], "agent_scratchpad": []}
+
+
+def counting_llm(answer):
+    calls = []
+
+    def llm(inputs):
+        calls.append(inputs["messages"][0].content)
+        return AIMessage(content=answer(inputs["messages"][0].content) if callable(answer) else answer)
+
+    return RunnableLambda(llm), calls
+
+
+def test_exact_cache_normalizes_whitespace_and_case():
+    cache = ResponseCache(MemoryCacheBackend())
+    key = cache.make_key("ns", [HumanMessage(content="What is your  return policy?")])
+    cache.set(key, AIMessage(content="30 days"))
+    assert cache.get(cache.make_key("ns", [HumanMessage(content="what is your return POLICY?")])).content == "30 days"
+    assert cache.get(cache.make_key("other", [HumanMessage(content="What is your return policy?")])) is None
+
+
+def test_memory_backend_evicts_lru_and_expires(monkeypatch):
+    backend = MemoryCacheBackend(max_entries=2, ttl_seconds=10)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("b") is None and backend.get("a") == "1"
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 11)
+    assert backend.get("a") is None
+
+
+def test_sqlite_backend_persists(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SQLiteCacheBackend(path).set("k", "v")
+    assert SQLiteCacheBackend(path).get("k") == "v"
+
+
+def test_standalone_question_rejects_customer_specific_questions():
+    for question in ["Where is my order?", "Where's my refund", "I bought a jacket last week, can I return it?",
+                     "¿Dónde está mi pedido?", "Order 123456789 status", "Contact me at jane@example.com"]:
+        assert standalone_question([HumanMessage(content=question)], ["search_knowledge_base"]) is None, question
+    for question in ["What is your return policy?", "How long does shipping take?"]:
+        assert standalone_question([HumanMessage(content=question)], ["search_knowledge_base"]) == question
+
+
+def test_standalone_question_only_allows_safe_tools():
+    question = HumanMessage(content="What is your return policy?")
+    safe = AIMessage(content="", tool_calls=[{"name": "search_knowledge_base", "args": {"query": "returns"}, "id": "1"}])
+    unsafe = AIMessage(content="", tool_calls=[{"name": "get_customer_info", "args": {"customer_email": "x"}, "id": "2"}])
+    assert standalone_question([question, safe, ToolMessage(content="30 days", tool_call_id="1")], ["search_knowledge_base"])
+    assert standalone_question([question, unsafe, ToolMessage(content="Jane", tool_call_id="2")], ["search_knowledge_base"]) is None
+
+
+def test_semantic_cache_off_with_lexical_embedder():
+    assert not semantic_cache_enabled()
+    assert not semantic_cache_enabled({"semantic_enabled": True}, {"embedder": "hashing"})
+    assert semantic_cache_enabled({"semantic_enabled": True}, {"embedder": "openai"})
+
+
+def test_hashing_embedder_matches_words_not_meaning():
+    # Por qué la caché semántica no se activa con el embedder local
+    cache = SemanticResponseCache(HashingEmbedder(), threshold=0.8)
+    cache.set("ns", "Is the store open on Monday?", AIMessage(content="Monday: 9-18"))
+    assert cache.get("ns", "Is the store open on Sunday?") is not None
+    cache.set("ns", "What is your return policy?", AIMessage(content="30 days"))
+    assert cache.get("ns", "Can I send it back?") is None
+
+
+def test_semantic_cache_hits_paraphrases():
+    cache = SemanticResponseCache(concept_embedder, threshold=0.9)
+    cache.set("ns", "What is your return policy?", AIMessage(content="30 days"))
+    assert cache.get("ns", "Can I send it back?").content == "30 days"
+    assert cache.get("ns", "¿Cuál es su política de devoluciones?").content == "30 days"
+    assert cache.get("other", "Can I send it back?") is None
+
+
+def test_semantic_cache_rejects_different_questions():
+    cache = SemanticResponseCache(concept_embedder, threshold=0.9)
+    cache.set("ns", "Is the store open on Monday?", AIMessage(content="Monday: 9-18"))
+    cache.set("ns", "How long does shipping take?", AIMessage(content="3-5 days"))
+    assert cache.get("ns", "Is the store open on Sunday?") is None
+    assert cache.get("ns", "How long does international shipping take?") is None
+    assert cache.get("ns", "When will things arrive after I order?").content == "3-5 days"
+    assert cache.stats()["hits"] == 1
+
+
+def test_cached_runnable_serves_paraphrase_without_llm():
+    llm, calls = counting_llm("Returns are accepted within 30 days.")
+    agent = CachedRunnable(llm, ResponseCache(MemoryCacheBackend()), "ns",
+                           SemanticResponseCache(concept_embedder, threshold=0.9), ["search_knowledge_base"])
+    agent.invoke(ask("What is your return policy?"))
+    assert agent.invoke(ask("Can I send it back?")).content == "Returns are accepted within 30 days."
+    assert calls == ["What is your return policy?"]
+
+
+def test_cached_runnable_never_shares_customer_specific_answers():
+    llm, calls = counting_llm(lambda question: f"Answer to {question!r}")
+    # Embedder que considera iguales todas las preguntas: solo el filtro de preguntas personales lo impide
+    same_everything = lambda texts: [np.ones(4, dtype=np.float32) for _ in texts]
+    agent = CachedRunnable(llm, ResponseCache(MemoryCacheBackend()), "ns",
+                           SemanticResponseCache(same_everything, threshold=0.9), ["search_knowledge_base"])
+    agent.invoke(ask("Where is my order?"))
+    agent.invoke(ask("where's my order??"))
+    agent.invoke(ask("I ordered a lamp, when does it arrive?"))
+    assert len(calls) == 3
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Pruebas del resumen incremental
+El resumen solo recibe los mensajes nuevos y la compactación sustituye los turnos antiguos por un mensaje de sistema
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.types import Overwrite
+
+from agent_factory import clear_agent_cache
+from rolling_summary import RollingSummarizer, is_summary_message
+
+
+@pytest.fixture
+def summarizer():
+    clear_agent_cache()
+    seen = []
+
+    def llm(prompt):
+        messages = prompt.to_messages()
+        seen.append([m.content for m in messages[1:]])
+        return AIMessage(content=f"summary of {len(seen)} calls")
+
+    summarizer = RollingSummarizer(RunnableLambda(llm), "Summarize.", "Update {summary}.",
+                                   threshold_tokens=60, keep_tokens=30, compaction=True)
+    summarizer.seen = seen
+    yield summarizer
+    clear_agent_cache()
+
+
+def turns(count, start=0):
+    messages = []
+    for i in range(start, start + count):
+        messages += [HumanMessage(content=f"question number {i} " * 3), AIMessage(content=f"answer number {i} " * 3)]
+    return messages
+
+
+def test_summary_only_receives_new_messages(summarizer):
+    state = {"messages": turns(2)}
+    state.update(summarizer.summarize(state))
+    assert state["summarized_count"] == 4 and state["conversation_summary"] == "summary of 1 calls"
+    state["messages"] = state["messages"] + turns(1, start=2)
+    state.update(summarizer.summarize(state))
+    assert len(summarizer.seen[0]) == 4 and len(summarizer.seen[1]) == 2
+    assert summarizer.summarize(state) == {}
+
+
+def test_short_history_is_not_compacted(summarizer):
+    assert summarizer.compact({"messages": turns(1)}) == {}
+    summarizer.compaction = False
+    assert summarizer.compact({"messages": turns(10)}) == {}
+
+
+def test_compaction_replaces_old_turns_with_one_summary_message(summarizer):
+    system = SystemMessage(content="You are a support agent.")
+    state = {"messages": [system] + turns(10)}
+    update = summarizer.compact(state)
+    messages = update["messages"]
+    assert isinstance(messages, Overwrite)
+    messages = messages.value
+    assert messages[0] is system and is_summary_message(messages[1])
+    assert messages[-1] is state["messages"][-1] and len(messages) < len(state["messages"])
+    # Lo compactado ya está en el resumen: un resumen posterior solo verá los mensajes nuevos
+    assert update["summarized_count"] == 2
+    state = {"messages": messages + turns(1, start=10), **{k: v for k, v in update.items() if k != "messages"}}
+    summarizer.summarize(state)
+    assert summarizer.seen[-1] == [m.content for m in messages[2:]] + [m.content for m in turns(1, start=10)]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la búsqueda semántica
+Orden por similitud, truncado a top_k, umbral min_score y búsqueda por lotes
+"""
+
+import numpy as np
+import pytest
+
+from config import KNOWLEDGE_BASE, KNOWLEDGE_BASE_ALIASES
+from semantic_search import EmbeddingIndex, HashingEmbedder
+
+
+@pytest.fixture(scope="module")
+def index():
+    return EmbeddingIndex(KNOWLEDGE_BASE, HashingEmbedder(), KNOWLEDGE_BASE_ALIASES)
+
+
+@pytest.mark.parametrize("query, topic", [
+    ("how long does shipping take", "shipping"),
+    ("when will I get my money back", "refund"),
+    ("where is my package", "tracking"),
+    ("can I pay with paypal", "payment"),
+])
+def test_best_match_comes_first(index, query, topic):
+    results = index.search(query, top_k=4)
+    assert results[0].topic == topic
+    scores = [result.score for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_query_with_two_topics_returns_both_best_first(index):
+    assert [result.topic for result in index.search("shipping refund", top_k=2)] == ["shipping", "refund"]
+
+
+def test_top_k_keeps_the_best_results_in_order(index):
+    # Con min_score=-1 no se descarta nada (el coseno puede ser negativo)
+    full = index.search("shipping refund", top_k=len(KNOWLEDGE_BASE), min_score=-1.0)
+    assert len(full) == len(KNOWLEDGE_BASE)
+    assert index.search("shipping refund", top_k=1) == full[:1]
+    assert index.search("shipping refund", top_k=4) == full[:4]
+    assert len(index.search("shipping refund", top_k=100, min_score=-1.0)) == len(KNOWLEDGE_BASE)
+
+
+def test_min_score_drops_weak_matches(index):
+    full = index.search("how long does shipping take", top_k=5)
+    threshold = (full[0].score + full[1].score) / 2
+    assert index.search("how long does shipping take", top_k=5, min_score=threshold) == full[:1]
+    assert index.search("how long does shipping take", top_k=5, min_score=1.01) == []
+
+
+def test_batch_matches_single_queries(index):
+    queries = ["where is my package", "shipping refund", "can I pay with paypal"]
+    batch = index.search_batch(queries, top_k=3)
+    for results, query in zip(batch, queries):
+        single = index.search(query, top_k=3)
+        assert [result.topic for result in results] == [result.topic for result in single]
+        assert [result.score for result in results] == pytest.approx([result.score for result in single], abs=1e-5)
+    assert index.search_batch([], top_k=3) == []
+    assert EmbeddingIndex({}, HashingEmbedder()).search("shipping") == []
+
+
+def test_hashing_embedder_is_deterministic():
+    first, second = HashingEmbedder(dim=64), HashingEmbedder(dim=64)
+    vectors = first(["shipping refund", "gift cards"])
+    assert vectors.shape == (2, 64) and vectors.dtype == np.float32
+    assert np.array_equal(vectors, second(["shipping refund", "gift cards"]))
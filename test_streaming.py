@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Pruebas del streaming de respuestas
+Una respuesta que no pasó por el LLM se emite completa, leída de last_ai_message
+"""
+
+import asyncio
+from typing import Annotated, List, Optional, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, StateGraph
+
+from message_state import append_messages
+from streaming import astream_turn, stream_turn
+
+
+class State(TypedDict):
+    messages: Annotated[List[BaseMessage], append_messages]
+    last_ai_message: Optional[AIMessage]
+
+
+def replay_graph():
+    """Grafo sin LLM: repite una respuesta guardada que termina con el resultado de una herramienta."""
+
+    def replay(state):
+        reply = AIMessage(content="Your order has shipped.",
+                          tool_calls=[{"name": "check_order_status", "args": {"order_number": "123456"},
+                                       "id": "call-1"}])
+        result = ToolMessage(content="Order 123456: shipped", tool_call_id="call-1")
+        return {"messages": [reply, result], "last_ai_message": reply}
+
+    graph = StateGraph(State)
+    graph.add_node("agent", replay)
+    graph.add_edge(START, "agent")
+    graph.add_edge("agent", END)
+    return graph.compile()
+
+
+def test_unstreamed_reply_comes_from_last_ai_message():
+    state = {"messages": [HumanMessage(content="Where is my order 123456?")], "last_ai_message": None}
+    events = list(stream_turn(replay_graph(), state))
+    assert events[0] == ("token", "Your order has shipped.")
+    assert events[-1][0] == "state" and isinstance(events[-1][1]["messages"][-1], ToolMessage)
+
+
+def test_async_unstreamed_reply_comes_from_last_ai_message():
+    async def collect():
+        state = {"messages": [HumanMessage(content="Where is my order 123456?")], "last_ai_message": None}
+        return [event async for event in astream_turn(replay_graph(), state)]
+
+    assert asyncio.run(collect())[0] == ("token", "Your order has shipped.")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los tickets de soporte
+IDs ordenados, escritura por lotes, vaciado al cerrar y reintentos cuando falla el almacén
+"""
+
+import os
+import re
+import sqlite3
+import threading
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+
+import ticket_store
+from ticket_store import TicketIdGenerator, TicketQueue, TicketStore, TicketStoreError
+
+
+def row(ticket_id, issue="Refund not received"):
+    return (ticket_id, "jane@example.com", "medium", issue, "open", 0.0)
+
+
+class FlakyStore:
+    """Almacén que falla las primeras `failures` escrituras y registra los lotes que recibe."""
+
+    def __init__(self, store, failures=0, error=sqlite3.OperationalError("database is locked")):
+        self.store = store
+        self.failures = failures
+        self.error = error
+        self.batches = []
+
+    def save_many(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.store.save_many(rows)
+        self.batches.append(len(rows))
+
+
+def test_ids_are_unique_sorted_and_crockford_encoded():
+    generator = TicketIdGenerator()
+    ids = []
+
+    def worker():
+        for _ in range(2000):
+            ids.append(generator.new_id())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == len(ids)
+    assert all(re.fullmatch(r"[0-9A-HJKMNP-TV-Z]{26}", ticket_id) for ticket_id in ids)
+    sequential = [generator.new_id() for _ in range(1000)]
+    assert sequential == sorted(sequential)
+
+
+def test_reset_starts_a_new_random_sequence():
+    generator = TicketIdGenerator()
+    first = generator.new_id()
+    generator.reset()
+    assert generator.new_id()[10:] != first[10:]
+
+
+def test_queue_batches_pending_tickets(tmp_path):
+    store = FlakyStore(TicketStore(str(tmp_path / "tickets.db")))
+    queue = TicketQueue(store, batch_size=100)
+    writing, gate = threading.Event(), threading.Event()
+    original = store.save_many
+
+    def blocked_save_many(rows):
+        # El primer lote se queda esperando; mientras tanto se acumulan los demás tickets
+        writing.set()
+        gate.wait(5)
+        original(rows)
+
+    store.save_many = blocked_save_many
+    queue.submit(row("A0000"))
+    assert writing.wait(5)
+    for i in range(1, 250):
+        queue.submit(row(f"A{i:04d}"))
+    gate.set()
+    queue.join()
+    assert len(store.store) == 250
+    assert store.batches[0] == 1 and max(store.batches) == 100 and len(store.batches) <= 4
+    assert queue.stats()["written"] == 250
+
+
+def test_shutdown_flushes_pending_tickets(tmp_path):
+    path = str(tmp_path / "tickets.db")
+    queue = TicketQueue(TicketStore(path), batch_size=10)
+    for i in range(95):
+        queue.submit(row(f"B{i:04d}"))
+    queue.shutdown(wait=True)
+    assert len(TicketStore(path)) == 95
+    assert TicketStore(path).get("B0042")["issue"] == "Refund not received"
+
+
+def test_failed_batch_is_retried_not_dropped(tmp_path):
+    store = FlakyStore(TicketStore(str(tmp_path / "tickets.db")), failures=3)
+    queue = TicketQueue(store, retry_backoff=0.001)
+    for i in range(20):
+        queue.submit(row(f"C{i:04d}"))
+    queue.join()
+    stats = queue.stats()
+    assert len(store.store) == 20
+    assert stats["failed"] == 0 and stats["retries"] == 3
+
+
+def test_shutdown_gives_up_after_max_retries(tmp_path):
+    store = FlakyStore(TicketStore(str(tmp_path / "tickets.db")), failures=10**6)
+    queue = TicketQueue(store, max_retries=2, retry_backoff=0.001)
+    queue.submit(row("D0001"))
+    queue.shutdown(wait=True)
+    assert queue.stats()["failed"] == 1
+
+
+def test_synchronous_submit_raises_when_store_keeps_failing(tmp_path):
+    store = FlakyStore(TicketStore(str(tmp_path / "tickets.db")), failures=10**6)
+    queue = TicketQueue(store, background=False, max_retries=1, retry_backoff=0.001)
+    with pytest.raises(TicketStoreError):
+        queue.submit(row("E0001"))
+
+
+def test_failed_executemany_is_rolled_back(tmp_path):
+    store = TicketStore(str(tmp_path / "tickets.db"))
+    store.save_many([row("F0001")])
+    with pytest.raises(sqlite3.IntegrityError):
+        store.save_many([row("F0002"), row("F0001")])
+    store.save_many([row("F0003")])
+    assert store.get("F0002") is None and len(store) == 2
+
+
+def test_duplicate_id_only_rejects_that_ticket(tmp_path):
+    store = TicketStore(str(tmp_path / "tickets.db"))
+    store.save_many([row("G0001")])
+    queue = TicketQueue(store, background=False)
+    queue._write([row("G0002"), row("G0001"), row("G0003")])
+    assert len(store) == 3 and queue.stats()["failed"] == 1
+
+
+def test_create_ticket_returns_before_persisting(tmp_path, monkeypatch):
+    queue = TicketQueue(TicketStore(str(tmp_path / "tickets.db")))
+    monkeypatch.setattr(ticket_store, "_queue", queue)
+    ticket_id = ticket_store.create_ticket("Package arrived damaged", "jane@example.com", "high")
+    assert re.fullmatch(r"TICKET-[0-9A-Z]{26}", ticket_id)
+    queue.join()
+    assert queue.store.get(ticket_id)["priority"] == "high"
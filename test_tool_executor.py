@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pruebas del ejecutor de herramientas
+Llamadas en paralelo con el orden de las tool_calls, errores como ToolMessage y memoización por sesión
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.tools import tool
+
+import tool_executor
+from tool_executor import SessionToolMemo, aexecute_tool_calls, count_tool_usage, execute_tool_calls
+from tool_registry import ToolRegistry
+
+calls = []
+
+
+@tool
+def check_order_status(order_number: str) -> str:
+    """Check the status of an order."""
+    calls.append(("check_order_status", order_number))
+    time.sleep(0.2)
+    return f"Order {order_number}: shipped"
+
+
+@tool
+def create_support_ticket(issue: str, customer_email: str, priority: str = "medium") -> str:
+    """Create a support ticket."""
+    calls.append(("create_support_ticket", issue))
+    return f"Ticket for {customer_email}"
+
+
+@tool
+def broken_tool(query: str) -> str:
+    """Always fails."""
+    raise RuntimeError("backend down")
+
+
+registry = ToolRegistry([check_order_status, create_support_ticket, broken_tool])
+
+
+def call(name, call_id, **args):
+    return {"name": name, "args": args, "id": call_id}
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo(monkeypatch):
+    calls.clear()
+    monkeypatch.setattr(tool_executor, "_memo", SessionToolMemo())
+
+
+def test_calls_run_in_parallel_and_keep_their_order():
+    tool_calls = [call("check_order_status", f"call-{i}", order_number=f"10000{i}") for i in range(4)]
+    start = time.perf_counter()
+    messages = execute_tool_calls(tool_calls, registry)
+    assert time.perf_counter() - start < 0.6
+    assert [m.tool_call_id for m in messages] == ["call-0", "call-1", "call-2", "call-3"]
+    assert messages[2].content == "Order 100002: shipped"
+
+
+def test_errors_become_error_tool_messages():
+    messages = execute_tool_calls([call("missing_tool", "1"), call("check_order_status", "2"),
+                                   call("broken_tool", "3", query="x")], registry)
+    assert [m.status for m in messages] == ["error", "error", "error"]
+    assert "not found" in messages[0].content and "Invalid arguments" in messages[1].content
+    assert "backend down" in messages[2].content
+
+
+def test_session_memo_reuses_results_within_the_session_only():
+    lookup = call("check_order_status", "1", order_number="123456")
+    execute_tool_calls([lookup], registry, session_id="s1")
+    # Mismos argumentos salvo espacios: misma clave canónica
+    again = execute_tool_calls([call("check_order_status", "2", order_number=" 123456 ")], registry, session_id="s1")
+    execute_tool_calls([lookup], registry, session_id="s2")
+    assert again[0].tool_call_id == "2" and again[0].content == "Order 123456: shipped"
+    assert calls == [("check_order_status", "123456"), ("check_order_status", "123456")]
+
+
+def test_tickets_and_errors_are_never_memoized():
+    ticket = call("create_support_ticket", "1", issue="Refund", customer_email="jane@example.com")
+    execute_tool_calls([ticket], registry, session_id="s1")
+    execute_tool_calls([ticket], registry, session_id="s1")
+    execute_tool_calls([call("broken_tool", "2", query="x")], registry, session_id="s1")
+    assert tool_executor.get_tool_memo().get("s1", "broken_tool", {"query": "x"}) is None
+    assert calls.count(("create_support_ticket", "Refund")) == 2
+
+
+def test_memo_expires_and_can_be_cleared(monkeypatch):
+    memo = SessionToolMemo(max_sessions=2)
+    memo.set("s1", "check_order_status", {"order_number": "1"}, "shipped")
+    assert memo.get("s1", "check_order_status", {"order_number": "1"}) == "shipped"
+    now = time.time()
+    monkeypatch.setattr(tool_executor.time, "time", lambda: now + 3600)
+    assert memo.get("s1", "check_order_status", {"order_number": "1"}) is None
+    memo.set("s1", "check_order_status", {"order_number": "1"}, "shipped")
+    memo.set("s2", "check_order_status", {"order_number": "1"}, "shipped")
+    memo.set("s3", "check_order_status", {"order_number": "1"}, "shipped")
+    memo.clear("s3")
+    assert memo.stats()["sessions"] == 1
+
+
+def test_async_execution_uses_the_memo():
+    lookup = call("check_order_status", "1", order_number="123456")
+    first = asyncio.run(aexecute_tool_calls([lookup], registry, session_id="s1"))
+    second = asyncio.run(aexecute_tool_calls([lookup], registry, session_id="s1"))
+    assert first[0].content == second[0].content and len(calls) == 1
+
+
+def test_count_tool_usage_does_not_modify_previous_counts():
+    previous = {"check_order_status": 1}
+    counts = count_tool_usage([call("check_order_status", "1"), call("broken_tool", "2")], previous)
+    assert counts == {"check_order_status": 2, "broken_tool": 1} and previous == {"check_order_status": 1}
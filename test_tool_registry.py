@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro de herramientas
+Despacho por nombre, una sola validación de argumentos por llamada, errores de argumentos y estadísticas
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+from langchain_core.tools import tool
+from pydantic import BaseModel, ValidationError, field_validator
+
+from tool_registry import ToolArgumentsError, ToolNotFoundError, ToolRegistry
+
+validations = []
+
+
+class OrderArgs(BaseModel):
+    order_number: str
+
+    @field_validator("order_number")
+    @classmethod
+    def count_validation(cls, value):
+        validations.append(value)
+        return value
+
+
+@tool(args_schema=OrderArgs)
+def check_order_status(order_number: str) -> str:
+    """Check the status of an order."""
+    return f"Order {order_number}: shipped"
+
+
+def test_invoke_validates_arguments_once():
+    registry = ToolRegistry([check_order_status])
+    validations.clear()
+    assert registry.invoke("check_order_status", {"order_number": "123456"}) == "Order 123456: shipped"
+    assert asyncio.run(registry.ainvoke("check_order_status", {"order_number": "654321"})) == "Order 654321: shipped"
+    assert validations == ["123456", "654321"]
+
+
+def test_invalid_arguments_raise_tool_arguments_error():
+    registry = ToolRegistry([check_order_status])
+    with pytest.raises(ToolArgumentsError, match="order_number"):
+        registry.invoke("check_order_status", {})
+    with pytest.raises(ToolArgumentsError, match="order_number"):
+        asyncio.run(registry.ainvoke("check_order_status", {"order_number": None}))
+    with pytest.raises(ToolArgumentsError):
+        registry.validate("check_order_status", {})
+    assert registry.stats("check_order_status")["errors"] == 2
+
+
+class Refund(BaseModel):
+    amount: int
+
+
+@tool
+def refund_order(order_number: str, amount: int = 10) -> str:
+    """Refund part of an order."""
+    Refund(amount="not a number")
+    return f"Refunded {amount} on {order_number}"
+
+
+def test_errors_inside_the_tool_are_not_reported_as_invalid_arguments():
+    registry = ToolRegistry([refund_order])
+    # El esquema convierte los argumentos y los que faltan toman el valor por defecto de la función
+    assert registry.validate("refund_order", {"order_number": "123456", "amount": "5"}) == \
+        {"order_number": "123456", "amount": 5}
+    assert registry.validate("refund_order", {"order_number": "123456"}) == {"order_number": "123456"}
+    with pytest.raises(ValidationError):
+        registry.invoke("refund_order", {"order_number": "123456"})
+    with pytest.raises(ValidationError):
+        asyncio.run(registry.ainvoke("refund_order", {"order_number": "123456", "amount": 5}))
+    with pytest.raises(ToolArgumentsError, match="amount"):
+        registry.invoke("refund_order", {"order_number": "123456", "amount": "five"})
+    assert registry.stats("refund_order")["errors"] == 3
+
+
+def test_unknown_and_duplicate_tools():
+    registry = ToolRegistry([check_order_status])
+    with pytest.raises(ToolNotFoundError):
+        registry.invoke("refund_everything", {})
+    with pytest.raises(ValueError):
+        registry.register(check_order_status)
+    assert "check_order_status" in registry and len(registry) == 1
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Pruebas del supervisor multiproceso
+Reparto de sesiones por hash consistente y checkpoints compartidos obligatorios
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import pytest
+
+from config import CHECKPOINT_CONFIG
+from worker_supervisor import HashRing, Supervisor
+
+
+def test_ring_falls_back_to_the_other_nodes_in_order():
+    ring = HashRing([0, 1, 2])
+    order = list(ring.nodes_for("session-1"))
+    assert sorted(order) == [0, 1, 2] and list(ring.nodes_for("session-1")) == order
+
+
+def test_supervisor_refuses_memory_checkpoints():
+    with pytest.raises(ValueError):
+        Supervisor({"workers": 1}, dict(CHECKPOINT_CONFIG, backend="memory"))
+    with pytest.raises(ValueError):
+        Supervisor({"workers": 1}, dict(CHECKPOINT_CONFIG, enabled=False, backend="sqlite"))
+    supervisor = Supervisor({"workers": 2}, dict(CHECKPOINT_CONFIG, enabled=True, backend="sqlite"))
+    assert len(supervisor.workers) == 2
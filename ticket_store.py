@@ -0,0 +1,299 @@
+"""
+Tickets de soporte
+IDs ordenados en el tiempo (estilo ULID) y cola persistente que escribe los tickets en SQLite por lotes
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import TICKET_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Alfabeto Base32 de Crockford (sin I, L, O, U): los IDs se ordenan igual como texto que por tiempo
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+
+# Fila de la tabla tickets: (ticket_id, customer_email, priority, issue, status, created_at)
+TicketRow = Tuple[str, str, str, str, str, float]
+
+
+class TicketStoreError(Exception):
+    """No se pudo guardar un ticket tras agotar los reintentos."""
+    pass
+
+
+class TicketIdGenerator:
+    """
+    Generador de IDs estilo ULID: 48 bits de milisegundos + 80 bits aleatorios.
+
+    Dentro del proceso los IDs son únicos y estrictamente crecientes: en el
+    mismo milisegundo se incrementa la parte aleatoria en lugar de sortearla
+    de nuevo. Entre procesos no hay coordinación; dos IDs solo coinciden si
+    además del milisegundo coinciden los 80 bits aleatorios, lo que es muy
+    improbable (no imposible). Tras un fork el hijo vuelve a sortear para
+    no continuar la secuencia del padre.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def reset(self) -> None:
+        """Olvidar la secuencia actual (el siguiente ID sortea una parte aleatoria nueva)."""
+        self._lock = threading.Lock()
+        self._last_ms = -1
+
+    def new_id(self) -> str:
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= self._last_ms:
+                ms, rand = self._last_ms, self._last_random + 1
+                if rand >> _RANDOM_BITS:
+                    # Desbordamiento de la parte aleatoria: pasar al milisegundo siguiente
+                    ms, rand = ms + 1, int.from_bytes(os.urandom(10), "big")
+            else:
+                rand = int.from_bytes(os.urandom(10), "big")
+            self._last_ms, self._last_random = ms, rand
+        value = (ms << _RANDOM_BITS) | rand
+        chars = []
+        for _ in range(26):
+            chars.append(_CROCKFORD[value & 31])
+            value >>= 5
+        return "".join(reversed(chars))
+
+
+class TicketStore:
+    """
+    Tickets en una tabla SQLite indexada por ticket_id.
+
+    Varios procesos pueden escribir en el mismo fichero (WAL y espera por
+    bloqueo). Cada llamada a save_many es una transacción, es decir, un
+    único fsync para todo el lote; si falla se deshace entera.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tickets ("
+            "ticket_id TEXT PRIMARY KEY, customer_email TEXT NOT NULL, priority TEXT NOT NULL, issue TEXT NOT NULL, "
+            "status TEXT NOT NULL, created_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def save_many(self, rows: Sequence[TicketRow]) -> None:
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+            except BaseException:
+                # Sin rollback, las filas ya insertadas quedarían en la transacción y se confirmarían con el lote siguiente
+                self._conn.rollback()
+                raise
+
+    def get(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Devolver el ticket como diccionario, o None si no existe (o aún no se ha escrito)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ticket_id, customer_email, priority, issue, status, created_at FROM tickets WHERE ticket_id = ?",
+                (ticket_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("ticket_id", "customer_email", "priority", "issue", "status", "created_at"), row))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+
+class TicketQueue:
+    """
+    Cola de escritura de tickets con un hilo en segundo plano.
+
+    submit() solo encola la fila, así que el turno del agente no espera al
+    disco. El hilo escritor toma todo lo que haya en la cola (hasta
+    `batch_size`) y lo guarda en una sola transacción: con carga los lotes
+    crecen solos y el coste del fsync se reparte entre muchos tickets.
+
+    Al cliente ya se le ha dicho que su ticket existe, así que un lote que
+    falla (p. ej. por un bloqueo de SQLite) no se descarta: se reintenta
+    con espera exponencial hasta que se guarde. Solo al cerrar la cola, o
+    con `background=False` (se escribe dentro de submit()), los reintentos
+    se limitan a `max_retries`; en ese caso los tickets perdidos se
+    registran en el log y submit() lanza TicketStoreError.
+    """
+
+    def __init__(self, store: Optional[TicketStore] = None, batch_size: int = 500, background: bool = True,
+                 max_retries: int = 5, retry_backoff: float = 0.2, max_retry_backoff: float = 5.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.background = background
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._queue: "queue.Queue[Optional[TicketRow]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closing = False
+        self._exit_hook = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.store is None:
+                self.store = TicketStore(TICKET_CONFIG["store_path"])
+            self._thread = threading.Thread(target=self._writer, name="ticket-writer", daemon=True)
+            self._thread.start()
+            if not self._exit_hook:
+                atexit.register(self.shutdown)
+                self._exit_hook = True
+
+    def submit(self, row: TicketRow) -> None:
+        """Encolar un ticket para escribirlo."""
+        if not self.background:
+            if not self._write([row]):
+                raise TicketStoreError(f"Could not save ticket {row[0]}")
+            return
+        self._start()
+        self._queue.put(row)
+
+    def _write(self, rows: List[TicketRow]) -> bool:
+        """Guardar un lote reintentando los errores; devuelve False si se agotaron los reintentos."""
+        attempt = 0
+        while True:
+            try:
+                if self.store is None:
+                    self.store = TicketStore(TICKET_CONFIG["store_path"])
+                self.store.save_many(rows)
+                with self._lock:
+                    self.written += len(rows)
+                    self.batches += 1
+                return True
+            except sqlite3.IntegrityError as e:
+                # Reintentar no sirve: se guarda el resto del lote fila a fila y se descarta solo la rechazada
+                if len(rows) > 1:
+                    return all([self._write([row]) for row in rows])
+                logger.error(f"Ticket {rows[0][:3]} rejected by the store: {str(e)}")
+                with self._lock:
+                    self.failed += 1
+                return False
+            except Exception as e:
+                attempt += 1
+                if (self._closing or not self.background) and attempt > self.max_retries:
+                    logger.error(f"Lost {len(rows)} tickets after {attempt} attempts ({str(e)}): "
+                                 f"{[row[:3] for row in rows]}")
+                    with self._lock:
+                        self.failed += len(rows)
+                    return False
+                delay = min(self.retry_backoff * 2 ** (attempt - 1), self.max_retry_backoff)
+                logger.warning(f"Error writing {len(rows)} tickets (attempt {attempt}), retrying in {delay:.1f}s: {str(e)}")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def _writer(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+
+    def __len__(self) -> int:
+        """Tickets pendientes de escribir."""
+        return self._queue.unfinished_tasks
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self), "written": self.written, "failed": self.failed, "batches": self.batches,
+                "retries": self.retries}
+
+    def join(self) -> None:
+        """Esperar a que se escriban todos los tickets encolados."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Detener el hilo escritor; con `wait` se escriben antes los tickets pendientes."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # A partir de aquí un lote que sigue fallando se da por perdido tras max_retries
+        self._closing = True
+        self._queue.put(None)
+        if wait:
+            thread.join()
+
+
+_id_generator = TicketIdGenerator()
+_queue: Optional[TicketQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ticket_queue() -> TicketQueue:
+    """Obtener la cola de tickets compartida, creándola la primera vez (el almacén se abre en el primer envío)."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = TicketQueue(batch_size=TICKET_CONFIG["batch_size"], background=TICKET_CONFIG["background"],
+                                     max_retries=TICKET_CONFIG["write_retries"],
+                                     retry_backoff=TICKET_CONFIG["retry_backoff"],
+                                     max_retry_backoff=TICKET_CONFIG["max_retry_backoff"])
+    return _queue
+
+
+def _after_fork_in_child() -> None:
+    # El hijo no hereda el hilo escritor y no debe compartir la conexión SQLite ni la secuencia de IDs del padre
+    global _queue, _queue_lock
+    _id_generator.reset()
+    _queue = None
+    _queue_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def new_ticket_id() -> str:
+    """ID de ticket nuevo, p. ej. "TICKET-01JAB3X5Q9R7M2N4P6S8T0VWXY"."""
+    return f"{TICKET_CONFIG['ticket_prefix']}-{_id_generator.new_id()}"
+
+
+def create_ticket(issue: str, customer_email: str, priority: str) -> str:
+    """Crear un ticket abierto: se asigna el ID, se encola su escritura y se devuelve el ID sin esperar al disco."""
+    ticket_id = new_ticket_id()
+    get_ticket_queue().submit((ticket_id, customer_email, priority, issue, "open", time.time()))
+    return ticket_id
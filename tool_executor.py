@@ -0,0 +1,325 @@
+"""
+Ejecutor concurrente de llamadas a herramientas
+Ejecuta en paralelo las tool_calls independientes de una misma respuesta del LLM
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import ToolMessage
+from langgraph.config import get_config, get_stream_writer
+
+from config import TOOL_CONFIG
+from tool_registry import ToolArgumentsError, ToolNotFoundError, ToolRegistry
+
+logger = logging.getLogger(__name__)
+
+# Número máximo de herramientas ejecutándose a la vez en el pool compartido
+MAX_TOOL_WORKERS = 8
+
+# Límites de la memoización por sesión: sesiones recordadas y resultados por sesión
+MEMO_MAX_SESSIONS = 10000
+MEMO_MAX_ENTRIES = 64
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Obtener el pool de hilos compartido, creándolo la primera vez."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+    return _pool
+
+
+class SessionToolMemo:
+    """
+    Resultados de herramientas memorizados por sesión.
+
+    La clave es el nombre de la herramienta más sus argumentos canónicos y
+    cada herramienta caduca según su `memo_ttl` de TOOL_CONFIG. Las que no
+    lo definen o lo tienen a 0 (p. ej. create_support_ticket, que crea un
+    ticket en cada llamada) no se memorizan nunca. Sesiones y entradas por
+    sesión están acotadas (LRU).
+    """
+
+    def __init__(self, max_sessions: int = MEMO_MAX_SESSIONS, max_entries: int = MEMO_MAX_ENTRIES):
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sessions: "OrderedDict[str, OrderedDict[str, Tuple[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ttl_for(tool_name: str) -> float:
+        return TOOL_CONFIG.get(tool_name, {}).get("memo_ttl", 0)
+
+    @staticmethod
+    def make_key(tool_name: str, tool_args: Dict[str, Any]) -> str:
+        """Clave canónica: argumentos ordenados y textos sin espacios alrededor."""
+        def canonical(value):
+            if isinstance(value, str):
+                return value.strip()
+            if isinstance(value, dict):
+                return {key: canonical(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [canonical(item) for item in value]
+            return value
+        return tool_name + ":" + json.dumps(canonical(tool_args), sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, session_id: str, tool_name: str, tool_args: Dict[str, Any]) -> Optional[str]:
+        if self.ttl_for(tool_name) <= 0:
+            return None
+        key = self.make_key(tool_name, tool_args)
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is not None:
+                self._sessions.move_to_end(session_id)
+                entry = entries.get(key)
+                if entry is not None and entry[1] > time.time():
+                    entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def set(self, session_id: str, tool_name: str, tool_args: Dict[str, Any], content: str) -> None:
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0:
+            return
+        key = self.make_key(tool_name, tool_args)
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is None:
+                entries = self._sessions[session_id] = OrderedDict()
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            entries[key] = (content, time.time() + ttl)
+            entries.move_to_end(key)
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def clear(self, session_id: Optional[str] = None) -> None:
+        """Olvidar los resultados de una sesión (al cerrarla) o de todas."""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+
+_memo: Optional[SessionToolMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_tool_memo() -> SessionToolMemo:
+    """Obtener la memoización de herramientas compartida, creándola la primera vez."""
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = SessionToolMemo()
+    return _memo
+
+
+def _current_session_id() -> Optional[str]:
+    """thread_id de la sesión en curso cuando se ejecuta dentro de un grafo con checkpointer."""
+    try:
+        return get_config().get("configurable", {}).get("thread_id")
+    except (RuntimeError, KeyError):
+        return None
+
+
+def _as_registry(tools) -> ToolRegistry:
+    """Aceptar un ToolRegistry o una lista de herramientas."""
+    if isinstance(tools, ToolRegistry):
+        return tools
+    return ToolRegistry(tools)
+
+
+def _error_message(tool_call: Dict[str, Any], content: str) -> ToolMessage:
+    """Crear el ToolMessage de error para una llamada."""
+    return ToolMessage(content=content, tool_call_id=tool_call["id"], status="error")
+
+
+def _progress_message(tool_name: str, tool_args: Dict[str, Any]) -> str:
+    """Texto legible del progreso de una herramienta (plantilla `progress` de TOOL_CONFIG)."""
+    template = TOOL_CONFIG.get(tool_name, {}).get("progress", "Running {tool}…")
+    # Las listas (p. ej. varios números de pedido) se muestran separadas por comas
+    values = {key: ", ".join(map(str, value)) if isinstance(value, (list, tuple)) else value
+              for key, value in tool_args.items()}
+    try:
+        return template.format_map({"tool": tool_name, **values})
+    except (KeyError, IndexError, ValueError):
+        return f"Running {tool_name}…"
+
+
+def emit_tool_progress(tool_call: Dict[str, Any], stage: str, result: Optional[ToolMessage] = None) -> None:
+    """
+    Emitir un evento de progreso de herramienta al stream "custom" del grafo.
+
+    `stage` es "start" (con el mensaje legible, p. ej. "Checking order
+    123456…") o "end" (con el estado del ToolMessage). Fuera de un grafo
+    no hay a quién avisar y no se hace nada.
+    """
+    try:
+        writer = get_stream_writer()
+    except (RuntimeError, KeyError):
+        return
+    event = {"type": "tool_progress", "stage": stage, "tool": tool_call["name"], "tool_call_id": tool_call["id"]}
+    if stage == "start":
+        event["message"] = _progress_message(tool_call["name"], tool_call["args"])
+    elif result is not None:
+        event["status"] = result.status
+    writer(event)
+
+
+def _memoized(tool_call: Dict[str, Any], session_id: Optional[str]) -> Optional[ToolMessage]:
+    """ToolMessage con el resultado memorizado en la sesión, si lo hay."""
+    if session_id is None:
+        return None
+    content = get_tool_memo().get(session_id, tool_call["name"], tool_call["args"])
+    if content is None:
+        return None
+    logger.info(f"Reusing {tool_call['name']} result for session {session_id}")
+    return ToolMessage(content=content, tool_call_id=tool_call["id"])
+
+
+def _memoize(tool_call: Dict[str, Any], session_id: Optional[str], message: ToolMessage) -> None:
+    """Memorizar el resultado si la llamada salió bien (los errores se reintentan)."""
+    if session_id is not None and message.status != "error":
+        get_tool_memo().set(session_id, tool_call["name"], tool_call["args"], message.content)
+
+
+def execute_tool_call(tool_call: Dict[str, Any], registry: ToolRegistry, session_id: Optional[str] = None) -> ToolMessage:
+    """
+    Ejecutar una llamada a herramienta y devolver su ToolMessage.
+
+    Con `session_id`, una llamada idéntica reciente de la misma sesión se
+    responde con el resultado memorizado sin volver a ejecutar la herramienta.
+    """
+    emit_tool_progress(tool_call, "start")
+    message = _memoized(tool_call, session_id)
+    if message is None:
+        message = _execute_tool_call(tool_call, registry)
+        _memoize(tool_call, session_id, message)
+    emit_tool_progress(tool_call, "end", message)
+    return message
+
+
+async def aexecute_tool_call(tool_call: Dict[str, Any], registry: ToolRegistry, session_id: Optional[str] = None) -> ToolMessage:
+    """Versión asíncrona de execute_tool_call basada en tool.ainvoke."""
+    emit_tool_progress(tool_call, "start")
+    message = _memoized(tool_call, session_id)
+    if message is None:
+        message = await _aexecute_tool_call(tool_call, registry)
+        _memoize(tool_call, session_id, message)
+    emit_tool_progress(tool_call, "end", message)
+    return message
+
+
+def _execute_tool_call(tool_call: Dict[str, Any], registry: ToolRegistry) -> ToolMessage:
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+
+    logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
+
+    try:
+        result = registry.invoke(tool_name, tool_args)
+    except ToolNotFoundError:
+        logger.error(f"Tool {tool_name} not found")
+        return _error_message(tool_call, f"Tool {tool_name} not found")
+    except ToolArgumentsError as e:
+        logger.error(f"Invalid arguments for tool {tool_name}: {e}")
+        return _error_message(tool_call, f"Invalid arguments for {tool_name}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error executing tool {tool_name}: {e}")
+        return _error_message(tool_call, f"Error executing {tool_name}: {str(e)}")
+
+    return ToolMessage(content=str(result), tool_call_id=tool_call["id"])
+
+
+async def _aexecute_tool_call(tool_call: Dict[str, Any], registry: ToolRegistry) -> ToolMessage:
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+
+    logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
+
+    try:
+        # Las herramientas síncronas se ejecutan en el executor por defecto
+        result = await registry.ainvoke(tool_name, tool_args)
+    except ToolNotFoundError:
+        logger.error(f"Tool {tool_name} not found")
+        return _error_message(tool_call, f"Tool {tool_name} not found")
+    except ToolArgumentsError as e:
+        logger.error(f"Invalid arguments for tool {tool_name}: {e}")
+        return _error_message(tool_call, f"Invalid arguments for {tool_name}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error executing tool {tool_name}: {e}")
+        return _error_message(tool_call, f"Error executing {tool_name}: {str(e)}")
+
+    return ToolMessage(content=str(result), tool_call_id=tool_call["id"])
+
+
+def execute_tool_calls(tool_calls: Sequence[Dict[str, Any]], tools, session_id: Optional[str] = None) -> List[ToolMessage]:
+    """
+    Ejecutar todas las tool_calls de una respuesta concurrentemente.
+
+    `tools` es normalmente el ToolRegistry del módulo; una lista de
+    herramientas también se acepta, aunque entonces se reconstruye el
+    registro en cada llamada.
+
+    Los ToolMessage se devuelven en el mismo orden que las tool_calls, de
+    modo que cada tool_call_id conserva su posición aunque las herramientas
+    terminen en otro orden. La latencia del turno pasa a ser la de la
+    herramienta más lenta en lugar de la suma de todas.
+
+    Los resultados se memorizan por sesión (SessionToolMemo). Si no se
+    indica `session_id`, se usa el thread_id del grafo en curso; fuera de
+    un grafo no se memoriza nada.
+    """
+    registry = _as_registry(tools)
+    session_id = session_id or _current_session_id()
+    if len(tool_calls) <= 1:
+        # Con una sola llamada no compensa pasar por el pool
+        return [execute_tool_call(tool_call, registry, session_id) for tool_call in tool_calls]
+
+    pool = _get_pool()
+    # Copiar el contexto para que los hilos del pool puedan emitir eventos de progreso al stream del grafo
+    futures = [pool.submit(contextvars.copy_context().run, execute_tool_call, tool_call, registry, session_id)
+               for tool_call in tool_calls]
+    return [future.result() for future in futures]
+
+
+async def aexecute_tool_calls(tool_calls: Sequence[Dict[str, Any]], tools, session_id: Optional[str] = None) -> List[ToolMessage]:
+    """Versión asíncrona de execute_tool_calls basada en asyncio.gather."""
+    registry = _as_registry(tools)
+    session_id = session_id or _current_session_id()
+    return list(await asyncio.gather(*(aexecute_tool_call(tool_call, registry, session_id) for tool_call in tool_calls)))
+
+
+def count_tool_usage(tool_calls: Sequence[Dict[str, Any]], tool_usage_count: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Acumular el número de usos de cada herramienta."""
+    counts = dict(tool_usage_count or {})
+    for tool_call in tool_calls:
+        counts[tool_call["name"]] = counts.get(tool_call["name"], 0) + 1
+    return counts
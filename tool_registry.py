@@ -0,0 +1,168 @@
+"""
+Registro de herramientas compartido por todas las variantes del chatbot
+Búsqueda O(1) por nombre, validadores de argumentos precompilados y estadísticas por herramienta
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from pydantic import ValidationError
+
+
+class ToolNotFoundError(KeyError):
+    """La herramienta solicitada no está registrada."""
+
+
+class ToolArgumentsError(ValueError):
+    """Los argumentos de la llamada no cumplen el esquema de la herramienta."""
+
+
+class ToolStats:
+    """Contadores de ejecución de una herramienta."""
+
+    __slots__ = ("calls", "errors", "total_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Representación serializable de las estadísticas."""
+        avg_ms = (self.total_seconds / self.calls * 1000) if self.calls else 0.0
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 6),
+            "avg_ms": round(avg_ms, 3)
+        }
+
+
+class ToolRegistry:
+    """
+    Registro de herramientas indexado por nombre.
+
+    Los esquemas de argumentos se obtienen una sola vez al registrar cada
+    herramienta, de modo que validar y despachar una llamada no depende del
+    número de herramientas del catálogo. invoke() valida con el esquema
+    precompilado y llama directamente a la función de la herramienta
+    (tool.func), así que los argumentos se validan una sola vez y solo un
+    error de validación de los argumentos se convierte en ToolArgumentsError.
+    """
+
+    def __init__(self, tools: Sequence[Any] = ()):
+        self._tools: Dict[str, Any] = {}
+        self._validators: Dict[str, Any] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._stats_lock = threading.Lock()
+        for tool in tools:
+            self.register(tool)
+
+    def register(self, tool) -> None:
+        """Registrar una herramienta y precompilar su validador de argumentos."""
+        if tool.name in self._tools:
+            raise ValueError(f"Tool {tool.name} is already registered")
+        self._tools[tool.name] = tool
+        self._validators[tool.name] = tool.get_input_schema()
+        self._stats[tool.name] = ToolStats()
+
+    def __contains__(self, tool_name: str) -> bool:
+        return tool_name in self._tools
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    @property
+    def tools(self) -> List[Any]:
+        """Lista de herramientas en orden de registro (para bind_tools)."""
+        return list(self._tools.values())
+
+    def get(self, tool_name: str):
+        """Obtener una herramienta por nombre o lanzar ToolNotFoundError."""
+        try:
+            return self._tools[tool_name]
+        except KeyError:
+            raise ToolNotFoundError(tool_name) from None
+
+    def validate(self, tool_name: str, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validar los argumentos contra el esquema precompilado de la herramienta.
+
+        Devuelve los argumentos convertidos por el esquema, solo los que
+        venían en la llamada (los demás toman el valor por defecto de la
+        función), igual que hace tool.invoke.
+        """
+        validator = self._validators.get(tool_name)
+        if validator is None:
+            raise ToolNotFoundError(tool_name)
+        try:
+            parsed = validator.model_validate(tool_args)
+        except ValidationError as e:
+            raise self._arguments_error(e) from None
+        return {name: getattr(parsed, name) for name in tool_args if name in validator.model_fields}
+
+    @staticmethod
+    def _arguments_error(error: ValidationError) -> ToolArgumentsError:
+        return ToolArgumentsError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                                            for err in error.errors()))
+
+    def _record(self, tool_name: str, elapsed: float, failed: bool) -> None:
+        """Actualizar las estadísticas de una herramienta."""
+        with self._stats_lock:
+            stats = self._stats[tool_name]
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            if failed:
+                stats.errors += 1
+
+    def invoke(self, tool_name: str, tool_args: Dict[str, Any]) -> Any:
+        """Validar los argumentos y ejecutar una herramienta registrando sus estadísticas."""
+        tool = self.get(tool_name)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            arguments = self.validate(tool_name, tool_args)
+            # Las herramientas sin función propia (subclases de BaseTool) se ejecutan con invoke
+            result = tool.func(**arguments) if getattr(tool, "func", None) else tool.invoke(arguments)
+            failed = False
+            return result
+        finally:
+            self._record(tool_name, time.perf_counter() - start, failed)
+
+    async def ainvoke(self, tool_name: str, tool_args: Dict[str, Any]) -> Any:
+        """Versión asíncrona de invoke: usa tool.coroutine o ejecuta tool.func en un hilo."""
+        tool = self.get(tool_name)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            arguments = self.validate(tool_name, tool_args)
+            if getattr(tool, "coroutine", None):
+                result = await tool.coroutine(**arguments)
+            elif getattr(tool, "func", None):
+                result = await asyncio.to_thread(tool.func, **arguments)
+            else:
+                result = await tool.ainvoke(arguments)
+            failed = False
+            return result
+        finally:
+            self._record(tool_name, time.perf_counter() - start, failed)
+
+    def stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
+        """Obtener las estadísticas de ejecución de una herramienta o de todas."""
+        with self._stats_lock:
+            if tool_name is not None:
+                return self._stats[tool_name].as_dict()
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        """Reiniciar las estadísticas de todas las herramientas."""
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = ToolStats()
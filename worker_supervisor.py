@@ -0,0 +1,372 @@
+"""
+Supervisor multiproceso del servicio de soporte
+Arranca N workers (servidor HTTP + WebSocket) y reparte las sesiones por hash consistente del session_id
+Así cada sesión vuelve siempre al mismo worker y sus cachés en proceso siguen calientes
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import aiohttp
+from aiohttp import WSMsgType, web
+from dotenv import load_dotenv
+
+from config import CHECKPOINT_CONFIG, LOGGING_CONFIG, SERVER_CONFIG, SUPERVISOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras que no se reenvían entre el supervisor y los workers
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+def stable_hash(key: str) -> int:
+    """Hash de 64 bits estable entre procesos (hash() de Python cambia en cada proceso)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Anillo de hash consistente con nodos virtuales.
+
+    Cada nodo ocupa `replicas` puntos del anillo; una clave pertenece al
+    primer punto a su derecha. Si un nodo cae, solo sus claves pasan al
+    siguiente nodo del anillo; las demás sesiones no cambian de worker.
+    """
+
+    def __init__(self, nodes: List[int], replicas: int = 128):
+        points = sorted((stable_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+        self.size = len(set(nodes))
+
+    def nodes_for(self, key: str) -> Iterator[int]:
+        """Nodos en orden de preferencia para la clave: el primero es su dueño."""
+        start = bisect.bisect(self._hashes, stable_hash(key))
+        seen = set()
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == self.size:
+                    return
+
+
+def _worker_main(index: int, port: int) -> None:
+    """Punto de entrada de un worker: servidor HTTP + WebSocket en 127.0.0.1:port."""
+    # Los módulos del proyecto se importan aquí y no antes del fork: abren conexiones SQLite e
+    # hilos que no deben compartirse entre procesos
+    from ws_gateway import create_gateway_app, run_server
+
+    logger.info(f"Worker {index} (pid {os.getpid()}) listening on 127.0.0.1:{port}")
+    run_server(host="127.0.0.1", port=port, web_app=create_gateway_app())
+
+
+class WorkerProcess:
+    """Un worker supervisado: proceso, puerto interno y estado de salud."""
+
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.port = port
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.healthy = False
+        self.failures = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.started_at = 0.0
+        self.next_start = 0.0
+        self.ready = False
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process else None,
+            "port": self.port,
+            "alive": self.alive(),
+            "healthy": self.healthy,
+            "restarts": self.restarts,
+        }
+
+
+class Supervisor:
+    """
+    Arranca y vigila los workers, y enruta cada sesión al suyo.
+
+    Los workers salen de un proceso forkserver que ya tiene cargadas las
+    librerías pesadas (`preload_modules`): arrancan rápido y comparten
+    esas páginas de memoria, sin heredar el event loop ni los hilos del
+    supervisor. Un worker que muere o deja de responder a /health se
+    reinicia con espera exponencial.
+
+    Mientras un worker está caído sus sesiones van al siguiente del anillo,
+    que solo puede reanudarlas si los checkpoints están en un almacén
+    compartido: con el backend `memory` empezaría la conversación de cero
+    sin avisar, así que el supervisor exige el backend `sqlite`.
+    """
+
+    def __init__(self, supervisor_config: Optional[Dict[str, Any]] = None,
+                 checkpoint_config: Optional[Dict[str, Any]] = None):
+        checkpoint_config = checkpoint_config or CHECKPOINT_CONFIG
+        if not checkpoint_config["enabled"] or checkpoint_config["backend"] != "sqlite":
+            raise ValueError("The supervisor needs shared checkpoints so another worker can resume a session: "
+                             "set CHECKPOINT_CONFIG['enabled'] = True and CHECKPOINT_CONFIG['backend'] = 'sqlite'")
+        self.config = dict(SUPERVISOR_CONFIG, **(supervisor_config or {}))
+        count = self.config["workers"] or os.cpu_count() or 1
+        base_port = self.config["worker_base_port"]
+        self.workers = [WorkerProcess(i, base_port + i) for i in range(count)]
+        self.ring = HashRing([worker.index for worker in self.workers], self.config["hash_replicas"])
+        self.stopping = False
+        self._context = self._mp_context()
+        self.client: Optional[aiohttp.ClientSession] = None
+        self._monitor: Optional[asyncio.Task] = None
+
+    def _mp_context(self):
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("spawn")
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(self.config["preload_modules"])
+        return context
+
+    def start_worker(self, worker: WorkerProcess) -> None:
+        worker.process = self._context.Process(target=_worker_main, args=(worker.index, worker.port),
+                                               name=f"support-worker-{worker.index}")
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.healthy = False
+        worker.ready = False
+        worker.failures = 0
+        logger.info(f"Started worker {worker.index} (pid {worker.process.pid})")
+
+    def worker_for(self, session_id: str) -> WorkerProcess:
+        """Worker de la sesión: su dueño en el anillo o, si no está sano, el siguiente sano."""
+        fallback = None
+        for index in self.ring.nodes_for(session_id):
+            worker = self.workers[index]
+            if worker.healthy:
+                return worker
+            fallback = fallback or worker
+        return fallback
+
+    def mark_unhealthy(self, worker: WorkerProcess) -> None:
+        worker.healthy = False
+        worker.failures += 1
+
+    async def _check(self, worker: WorkerProcess) -> None:
+        """Comprobar un worker: reiniciarlo si murió o si no responde a /health."""
+        if not worker.alive():
+            worker.healthy = False
+            if self.stopping:
+                return
+            if worker.process is not None:
+                # Espera exponencial entre reinicios de un worker que vuelve a caer
+                delay = min(self.config["restart_backoff"] * 2 ** worker.crashes, self.config["max_restart_backoff"])
+                logger.warning(f"Worker {worker.index} exited with code {worker.process.exitcode}; "
+                               f"restarting in {delay:.1f}s")
+                worker.crashes += 1
+                worker.restarts += 1
+                worker.process = None
+                worker.next_start = time.monotonic() + delay
+            if time.monotonic() >= worker.next_start:
+                self.start_worker(worker)
+            return
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.config["health_timeout"])
+            async with self.client.get(f"{worker.url}/health", timeout=timeout) as response:
+                ok = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+
+        if ok:
+            if not worker.healthy:
+                logger.info(f"Worker {worker.index} is healthy")
+            worker.healthy = True
+            worker.ready = True
+            worker.failures = 0
+            worker.crashes = 0
+            return
+
+        self.mark_unhealthy(worker)
+        # Mientras arranca (aún sin responder) el worker no cuenta como colgado
+        starting = not worker.ready and time.monotonic() - worker.started_at < self.config["startup_timeout"]
+        if worker.failures >= self.config["max_health_failures"] and not starting:
+            logger.warning(f"Worker {worker.index} failed {worker.failures} health checks; killing it")
+            worker.process.kill()
+
+    async def monitor(self) -> None:
+        """Bucle de comprobaciones de salud."""
+        while not self.stopping:
+            await asyncio.gather(*(self._check(worker) for worker in self.workers))
+            await asyncio.sleep(self.config["health_interval"])
+
+    async def start(self) -> None:
+        """Arrancar los workers y esperar a que estén sanos (hasta `startup_timeout`)."""
+        self.client = aiohttp.ClientSession(auto_decompress=False,
+                                             connector=aiohttp.TCPConnector(limit=0, force_close=False))
+        for worker in self.workers:
+            self.start_worker(worker)
+
+        deadline = time.monotonic() + self.config["startup_timeout"]
+        while time.monotonic() < deadline and not all(worker.healthy for worker in self.workers):
+            await asyncio.gather(*(self._check(worker) for worker in self.workers if not worker.healthy))
+            await asyncio.sleep(0.1)
+        ready = sum(worker.healthy for worker in self.workers)
+        logger.info(f"{ready}/{len(self.workers)} workers ready")
+        self._monitor = asyncio.create_task(self.monitor())
+
+    async def stop(self, timeout: float) -> None:
+        """Apagado ordenado: SIGTERM a los workers (vacían sus turnos) y SIGKILL si no terminan."""
+        self.stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for worker in self.workers:
+            if worker.alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            await asyncio.to_thread(worker.process.join, max(deadline - time.monotonic(), 0))
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop in {timeout}s; killing it")
+                worker.process.kill()
+        if self.client is not None:
+            await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        healthy = sum(worker.healthy for worker in self.workers)
+        return {
+            "status": "ok" if healthy else "unavailable",
+            "healthy_workers": healthy,
+            "workers": [worker.stats() for worker in self.workers],
+        }
+
+
+def _forward_headers(headers) -> Dict[str, str]:
+    return {key: value for key, value in headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+async def _proxy_http(request: web.Request) -> web.StreamResponse:
+    """Reenviar una petición al worker de su sesión, transmitiendo la respuesta (SSE incluido)."""
+    supervisor: Supervisor = request.app["supervisor"]
+    session_id = request.match_info["session_id"]
+    body = await request.read()
+
+    for _ in range(len(supervisor.workers)):
+        worker = supervisor.worker_for(session_id)
+        try:
+            async with supervisor.client.request(request.method, f"{worker.url}{request.rel_url}",
+                                                  headers=_forward_headers(request.headers), data=body,
+                                                  timeout=aiohttp.ClientTimeout(total=None)) as upstream:
+                response = web.StreamResponse(status=upstream.status, headers=_forward_headers(upstream.headers))
+                response.headers["X-Support-Worker"] = str(worker.index)
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+        except aiohttp.ClientConnectorError:
+            # El worker no aceptó la conexión (la petición no llegó): probar el siguiente del anillo
+            supervisor.mark_unhealthy(worker)
+    return web.json_response({"error": "no healthy workers"}, status=502)
+
+
+async def _pipe(source, target) -> None:
+    async for msg in source:
+        if msg.type == WSMsgType.TEXT:
+            await target.send_str(msg.data)
+        elif msg.type == WSMsgType.BINARY:
+            await target.send_bytes(msg.data)
+
+
+async def _proxy_websocket(request: web.Request) -> web.StreamResponse:
+    """Conectar el WebSocket del cliente con el del worker de su sesión."""
+    supervisor: Supervisor = request.app["supervisor"]
+    # Una sesión nueva recibe aquí su id para poder enrutarla (y reconectar al mismo worker)
+    session_id = request.match_info.get("session_id") or uuid.uuid4().hex
+    worker = supervisor.worker_for(session_id)
+    try:
+        upstream = await supervisor.client.ws_connect(f"{worker.url}/ws/sessions/{session_id}", autoping=True)
+    except aiohttp.ClientError:
+        supervisor.mark_unhealthy(worker)
+        return web.json_response({"error": "worker unavailable"}, status=502)
+
+    # El heartbeat del cliente lo hace el supervisor; el envío espera al socket, así que la
+    # contrapresión del cliente llega hasta el worker
+    ws = web.WebSocketResponse(heartbeat=SERVER_CONFIG["ws_heartbeat_seconds"])
+    await ws.prepare(request)
+    try:
+        pipes = [asyncio.create_task(_pipe(ws, upstream)), asyncio.create_task(_pipe(upstream, ws))]
+        done, pending = await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+    finally:
+        await upstream.close()
+        await ws.close(code=upstream.close_code or aiohttp.WSCloseCode.OK)
+    return ws
+
+
+async def _health(request: web.Request) -> web.Response:
+    stats = request.app["supervisor"].stats()
+    return web.json_response(stats, status=200 if stats["healthy_workers"] else 503)
+
+
+def create_supervisor_app(supervisor_config: Optional[Dict[str, Any]] = None) -> web.Application:
+    """Aplicación del supervisor: arranca los workers y enruta /sessions y /ws por session_id."""
+    supervisor = Supervisor(supervisor_config)
+    web_app = web.Application(client_max_size=1024 ** 2)
+    web_app["supervisor"] = supervisor
+    web_app.router.add_route("*", "/sessions/{session_id}", _proxy_http)
+    web_app.router.add_route("*", "/sessions/{session_id}/{tail:.*}", _proxy_http)
+    web_app.router.add_get("/ws", _proxy_websocket)
+    web_app.router.add_get("/ws/sessions/{session_id}", _proxy_websocket)
+    web_app.router.add_get("/health", _health)
+
+    async def on_startup(app: web.Application) -> None:
+        await supervisor.start()
+
+    async def on_shutdown(app: web.Application) -> None:
+        await supervisor.stop(SERVER_CONFIG["shutdown_timeout"])
+
+    web_app.on_startup.append(on_startup)
+    web_app.on_shutdown.append(on_shutdown)
+    return web_app
+
+
+def run_supervisor(host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None) -> None:
+    """Arrancar el supervisor con sus workers; SIGINT/SIGTERM los apagan de forma ordenada."""
+    logging.basicConfig(level=getattr(logging, LOGGING_CONFIG["level"]), format=LOGGING_CONFIG["format"])
+    web_app = create_supervisor_app({"workers": workers} if workers else None)
+    web.run_app(web_app, host=host or SERVER_CONFIG["host"], port=port or SERVER_CONFIG["port"],
+                shutdown_timeout=SERVER_CONFIG["shutdown_timeout"], print=lambda message: print(f"🚀 {message}"))
+
+
+if __name__ == "__main__":
+    # Verificar configuración (los workers heredan el entorno, .env incluido)
+    load_dotenv()
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ Error: OPENAI_API_KEY environment variable not set.")
+        print("Please create a .env file with your OpenAI API key:")
+        print("OPENAI_API_KEY=your_api_key_here")
+    elif not CHECKPOINT_CONFIG["enabled"] or CHECKPOINT_CONFIG["backend"] != "sqlite":
+        print("❌ Error: the supervisor needs the sqlite checkpoint backend.")
+        print("Set CHECKPOINT_CONFIG['backend'] = 'sqlite' in config.py so any worker can resume a session")
+    else:
+        run_supervisor()
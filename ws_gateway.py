@@ -0,0 +1,176 @@
+"""
+Pasarela WebSocket del chatbot de soporte
+Una conexión por cliente del chat: tokens y progreso de herramientas se envían según ocurren
+La sesión vive en el checkpointer, así que al reconectar con el mismo id se reanuda la conversación
+"""
+
+import asyncio
+import uuid
+import weakref
+from typing import Any, Dict, Optional
+
+from aiohttp import WSCloseCode, WSMsgType, web
+
+from async_customer_support import env_config, logger
+from checkpointing import aresume_state, thread_config
+from http_server import INTERNAL_ERROR, ServerBusyError, reply_payload, session_turn_input, create_web_app, run_server
+from message_state import last_reply
+from streaming import astream_turn
+
+# Protocolo (JSON por mensaje)
+#   cliente → {"type": "message", "message": "..."} | {"type": "ping"}
+#   servidor → {"type": "session", "session_id", "resumed", "last_reply"} al conectar
+#              {"type": "token", "delta"} | {"type": "progress", ...} | {"type": "done", "reply", ...}
+#              {"type": "error", "error"} | {"type": "pong"}
+
+
+class SlowClientError(Exception):
+    """El cliente no lee sus mensajes a tiempo (el buffer de envío no se vacía)."""
+
+
+class _Connection:
+    """Estado de una conexión: envío con control de flujo y cola de mensajes del cliente."""
+
+    def __init__(self, ws: web.WebSocketResponse, session_id: str, cfg: Dict[str, Any]):
+        self.ws = ws
+        self.session_id = session_id
+        self.send_timeout = cfg["ws_send_timeout"]
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=cfg["ws_max_pending_messages"])
+        self.closing = False
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        """
+        Enviar un evento esperando a que el socket lo acepte.
+
+        send_json espera a que se vacíe el buffer del transporte, así que un
+        cliente lento frena el stream del grafo (y la lectura del LLM) en
+        lugar de acumular eventos en memoria. Si no lee en `send_timeout`
+        segundos se le desconecta.
+        """
+        if self.closing or self.ws.closed:
+            return
+        try:
+            await asyncio.wait_for(self.ws.send_json(payload), self.send_timeout)
+        except asyncio.TimeoutError:
+            raise SlowClientError(f"client did not read for {self.send_timeout}s")
+
+
+async def _run_turn(server: Dict[str, Any], conn: _Connection, message: str) -> None:
+    """Procesar un mensaje del cliente emitiendo tokens y progreso de herramientas."""
+    graph = server["graph"]
+    try:
+        async with server["pool"].turn(conn.session_id):
+            turn_state = session_turn_input(graph, message)
+            async for kind, payload in astream_turn(graph, turn_state, config=thread_config(conn.session_id)):
+                if kind == "token":
+                    await conn.send({"type": "token", "delta": payload})
+                elif kind == "progress":
+                    await conn.send(dict(payload, type="progress"))
+                else:
+                    await conn.send(dict(reply_payload(conn.session_id, payload), type="done"))
+    except ServerBusyError as e:
+        await conn.send({"type": "error", "error": str(e), "retry": True})
+    except (SlowClientError, ConnectionResetError):
+        raise
+    except Exception as e:
+        logger.error(f"Error in websocket session {conn.session_id}: {str(e)}")
+        await conn.send({"type": "error", "error": INTERNAL_ERROR})
+
+
+async def _process_inbox(server: Dict[str, Any], conn: _Connection) -> None:
+    """Ejecutar en orden los mensajes encolados por el cliente; None marca el final."""
+    while True:
+        message = await conn.inbox.get()
+        if message is None:
+            return
+        try:
+            await _run_turn(server, conn, message)
+        except (SlowClientError, ConnectionResetError) as e:
+            logger.warning(f"Closing websocket session {conn.session_id}: {str(e)}")
+            conn.closing = True
+            await conn.ws.close(code=WSCloseCode.POLICY_VIOLATION, message=b"slow consumer")
+
+
+async def websocket_session(request: web.Request) -> web.WebSocketResponse:
+    """GET /ws/sessions/{id} (o /ws para una sesión nueva): chat en vivo por WebSocket."""
+    server = request.app["support"]
+    cfg = server["config"]
+    session_id = request.match_info.get("session_id") or uuid.uuid4().hex
+
+    # heartbeat: aiohttp envía ping periódicos y cierra la conexión si no llega el pong
+    ws = web.WebSocketResponse(heartbeat=cfg["ws_heartbeat_seconds"], max_msg_size=cfg["max_message_chars"] * 4 + 1024)
+    await ws.prepare(request)
+    server["sockets"].add(ws)
+
+    conn = _Connection(ws, session_id, cfg)
+    state = await aresume_state(server["graph"], session_id)
+    await conn.send({
+        "type": "session",
+        "session_id": session_id,
+        "resumed": state is not None,
+        "last_reply": last_reply(state) if state else "",
+    })
+    worker = asyncio.create_task(_process_inbox(server, conn))
+
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = msg.json()
+            except ValueError:
+                await conn.send({"type": "error", "error": "messages must be JSON"})
+                continue
+            kind = data.get("type") if isinstance(data, dict) else None
+            if kind == "ping":
+                await conn.send({"type": "pong"})
+                continue
+            text = data.get("message") if kind == "message" else None
+            if not isinstance(text, str) or not text.strip():
+                await conn.send({"type": "error", "error": "expected {\"type\": \"message\", \"message\": \"...\"}"})
+            elif len(text) > cfg["max_message_chars"]:
+                await conn.send({"type": "error", "error": f"message longer than {cfg['max_message_chars']} characters"})
+            else:
+                try:
+                    conn.inbox.put_nowait(text.strip())
+                except asyncio.QueueFull:
+                    # Backpressure de entrada: no se acumulan turnos sin límite por conexión
+                    await conn.send({"type": "error", "error": "too many pending messages", "retry": True})
+    except SlowClientError as e:
+        logger.warning(f"Closing websocket session {session_id}: {str(e)}")
+    finally:
+        # Los mensajes ya recibidos se procesan igualmente (sin enviar nada): quedan en el
+        # checkpoint y el cliente ve la última respuesta al reconectar
+        conn.closing = True
+        await conn.inbox.put(None)
+        await worker
+        await ws.close()
+        server["sockets"].discard(ws)
+    return ws
+
+
+async def _close_sockets(web_app: web.Application) -> None:
+    """Al apagar (tras terminar los turnos en curso), cerrar los WebSocket abiertos con 1001."""
+    for ws in list(web_app["support"]["sockets"]):
+        await ws.close(code=WSCloseCode.GOING_AWAY, message=b"server shutdown")
+
+
+def create_gateway_app(graph=None, server_config: Optional[Dict[str, Any]] = None) -> web.Application:
+    """Aplicación del servidor HTTP con las rutas WebSocket añadidas."""
+    web_app = create_web_app(graph, server_config)
+    web_app["support"]["sockets"] = weakref.WeakSet()
+    web_app.router.add_get("/ws", websocket_session)
+    web_app.router.add_get("/ws/sessions/{session_id}", websocket_session)
+    # Después del vaciado del pool registrado por create_web_app
+    web_app.on_shutdown.append(_close_sockets)
+    return web_app
+
+
+if __name__ == "__main__":
+    # Verificar configuración
+    if not env_config["openai_api_key"]:
+        print("❌ Error: OPENAI_API_KEY environment variable not set.")
+        print("Please create a .env file with your OpenAI API key:")
+        print("OPENAI_API_KEY=your_api_key_here")
+    else:
+        run_server(web_app=create_gateway_app())